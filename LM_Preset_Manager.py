@@ -1,134 +1,131 @@
 import os
 import json
+import time
 import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 from tkinter import ttk
-import git
-from git import Repo
-
-CONFIG_PRESETS_DIR = r"C:\Users\Admin\.cache\lm-studio\config-presets"
-DATABASE_FILE = "database.json"
-MODEL_LIST_FILE = "model_list.txt"
-GITHUB_REPO_URL = "https://github.com/your-username/lmstudio.git"
-GITHUB_REPO_DIR = "lmstudio"
-
-def load_database():
-    if os.path.exists(DATABASE_FILE):
-        with open(DATABASE_FILE, "r") as file:
-            return json.load(file)
-    else:
-        return {"presets": {}, "models": []}
-
-def save_database(database):
-    with open(DATABASE_FILE, "w") as file:
-        json.dump(database, file, indent=2)
-
-def backup_database():
-    backup_file = f"{DATABASE_FILE}.bak"
-    shutil.copyfile(DATABASE_FILE, backup_file)
-
-def backup_model_list():
-    backup_file = f"{MODEL_LIST_FILE}.bak"
-    shutil.copyfile(MODEL_LIST_FILE, backup_file)
+from preset_db import MODEL_LIST_FILE, load_database, save_changes, find_preset
+from preset_actions import apply_watch_changes, delete_unused, import_preset_mapping, scan_models, scan_summary
+from preset_actions import export_preset_bundle, import_preset_bundle, install_marketplace_presets
+from preset_actions import patch_preset, record_revision
+from preset_bundle import BUNDLE_SUFFIX, format_import
+from preset_watcher import CatalogWatcher
+from task_runner import TaskExecutor
+from preset_cache import PresetRepository
+from preset_diff import FlatPresetCache, diff_presets, diff_rows, format_table
+from preset_store import PresetStore
+from preset_index import PresetIndex
+from preset_listview import VirtualListbox
+from preset_validate import validate_presets
+from preset_batch import BatchError, apply_patch, recover_journals
+from preset_sync import PresetSync, SyncError
+from preset_history import PresetHistory, HistoryError, format_patch
+from preset_compat import check_catalog, does_not_fit, format_result, largest_model, load_host_profile, model_paths_by_type
+from preset_tuner import optimize_preset as tune_preset, tuned_fields
+from preset_recommend import PresetRecommender, benchmark_scores
+from preset_scheduler import Scheduler, ScheduleError, catalog_resolver, format_job, make_runner
+from preset_market import MarketplaceClient, format_stats as format_market_stats
+import preset_bench
+import preset_chain
+from preset_settings import CONFIG_PRESETS_DIR, INCREMENTAL_SCAN, SCAN_WORKERS, SCAN_MAX_DEPTH, SCAN_EXCLUDE, PRESET_STORAGE, GITHUB_REPO_DIR, GITHUB_REPO_URL
+from preset_settings import SYNC_AUTO_COMMIT, SYNC_COMMIT_THRESHOLD, SYNC_COMMIT_INTERVAL, SYNC_AUTO_PUSH, TUNING_BACKEND
+from preset_settings import BENCH_MODEL, BENCH_SERVER_PID, BENCH_SERVER_PROCESS
+from preset_settings import BENCH_BACKEND, BENCH_SERVER_URL, SCHEDULE_RUNNER, SCHEDULE_WORKERS, SCHEDULE_WARM_MODELS
+from preset_settings import MARKETPLACE_URL, MARKETPLACE_CACHE_BYTES
+
+FILTER_DELAY_MS = 150
+BUNDLE_FILETYPES = [("Preset Bundles", "*.jsonl *.jsonl.gz *.jsonl.zst")]
+RECOMMEND_COUNT = 5
+
+preset_repository = PresetRepository()
+flat_presets = FlatPresetCache(preset_repository)
+preset_index = PresetIndex()
+preset_history = PresetHistory()
+preset_recommender = PresetRecommender.load()
+marketplace_client = MarketplaceClient(MARKETPLACE_URL, cache_bytes=MARKETPLACE_CACHE_BYTES)
+catalog_watcher = None
+
+def show_task_error(error):
+    messagebox.showerror("Task Failed", str(error))
+
+def record_history(preset_name, preset_file):
+    # Called before and after each write; an unchanged preset adds no revision.
+    record_revision(preset_history, preset_name, preset_file, preset_repository)
+
+def reload_database():
+    global database
+    database = load_database()
+    update_preset_listbox()
 
 def search_files():
     directory = filedialog.askdirectory(title="Select Directory")
     if directory:
-        database = load_database()
-        gguf_files = []
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if file.endswith(".gguf"):
-                    gguf_files.append(os.path.join(root, file))
-
-        new_models = []
-        for file in gguf_files:
-            model_name = os.path.splitext(os.path.basename(file))[0]
-            if model_name not in database["models"]:
-                new_models.append(model_name)
-
-        presets_created = 0
-        for model_name in new_models:
-            model_type = model_name.split("-")[0]
-            preset_file = os.path.join(CONFIG_PRESETS_DIR, f"{model_type}.preset.json")
-            if not os.path.exists(preset_file):
-                default_preset = {
-                    "name": f"{model_type} Preset",
-                    "load_params": {
-                        "n_ctx": 1500,
-                        "n_batch": 512,
-                        "rope_freq_base": 0,
-                        "rope_freq_scale": 0,
-                        "n_gpu_layers": 10,
-                        "use_mlock": True,
-                        "main_gpu": 0,
-                        "tensor_split": [0],
-                        "seed": -1,
-                        "f16_kv": True,
-                        "use_mmap": True
-                    },
-                    "inference_params": {
-                        "n_threads": 4,
-                        "n_predict": -1,
-                        "top_k": 40,
-                        "top_p": 0.95,
-                        "temp": 0.8,
-                        "repeat_penalty": 1.1,
-                        "input_prefix": "### Instruction:\n",
-                        "input_suffix": "\n### Response:\n",
-                        "antiprompt": ["### Instruction:"],
-                        "pre_prompt": "You are a helpful AI assistant.",
-                        "seed": -1,
-                        "tfs_z": 1,
-                        "typical_p": 1,
-                        "repeat_last_n": 64,
-                        "frequency_penalty": 0,
-                        "presence_penalty": 0,
-                        "n_keep": 0,
-                        "logit_bias": {},
-                        "mirostat": 0,
-                        "mirostat_tau": 5,
-                        "mirostat_eta": 0.1,
-                        "memory_f16": True,
-                        "multiline_input": False,
-                        "penalize_nl": True
-                    }
-                }
-                with open(preset_file, "w") as file:
-                    json.dump(default_preset, file, indent=2)
-                presets_created += 1
-                database["presets"][model_type] = preset_file
-
-        database["models"].extend(new_models)
-        save_database(database)
-        backup_database()
-
-        with open(MODEL_LIST_FILE, "w") as file:
-            file.write("\n".join(database["models"]))
-        backup_model_list()
-
-        messagebox.showinfo("Search Results", f"Found {len(gguf_files)} .gguf files.\n"
-                                               f"Created {presets_created} presets.\n"
-                                               f"{len(new_models)} new models found.")
+        def show_results(summary):
+            reload_database()
+            mark_for_sync(summary.get("preset_files", []))
+            messagebox.showinfo("Search Results", scan_summary(summary))
+        task_executor.submit("Scanning models", scan_models, directory, CONFIG_PRESETS_DIR, INCREMENTAL_SCAN,
+                             SCAN_WORKERS, SCAN_MAX_DEPTH, SCAN_EXCLUDE, on_done=show_results, on_error=show_task_error)
+
+def toggle_watch_mode():
+    global catalog_watcher
+    if catalog_watcher is not None:
+        catalog_watcher.stop()
+        catalog_watcher = None
+        watch_button.configure(text="Watch Folders")
+        status_var.set("")
+        return
+    directory = filedialog.askdirectory(title="Select Model Directory to Watch")
+    if directory:
+        catalog_watcher = CatalogWatcher([directory], CONFIG_PRESETS_DIR, apply_watch_batch)
+        catalog_watcher.start()
+        watch_button.configure(text="Stop Watching")
+        status_var.set(f"Watching {directory} ({catalog_watcher.mode})")
+
+def apply_watch_batch(events):
+    # Runs on the watcher's thread: the stored catalog is updated there, and
+    # the result is handed to the Tk thread.
+    try:
+        catalog, modified_presets = apply_watch_changes(events, CONFIG_PRESETS_DIR)
+    except Exception as error:
+        task_executor.call_soon(show_task_error, error)
+        return
+    task_executor.call_soon(show_watch_batch, events, catalog, modified_presets)
+
+def show_watch_batch(events, catalog, modified_presets):
+    global database
+    if catalog_watcher is None:
+        return
+    for preset_file in modified_presets:
+        preset_repository.invalidate(preset_file)
+    if catalog is not None:
+        database = catalog
+        update_preset_listbox()
+    catalog_watcher.record_applied(events)
+    report = catalog_watcher.latency_report()
+    status_var.set(f"Watching ({report['mode']}): applied {len(events)} changes, change-to-UI latency "
+                   f"p50 {report['p50_ms']:.0f} ms, p95 {report['p95_ms']:.0f} ms")
 
 def search_preset():
     model_name = preset_entry.get()
-    database = load_database()
-    preset_file = database["presets"].get(model_name)
+    preset_file = find_preset(model_name)
     if preset_file:
         messagebox.showinfo("Preset Found", f"Preset for {model_name} found at:\n{preset_file}")
     else:
-        messagebox.showinfo("Preset Not Found", f"No preset found for {model_name}.")
+        matches = preset_index.search(model_name)
+        if matches:
+            messagebox.showinfo("Preset Not Found", f"No preset named {model_name}; "
+                                                    f"{len(matches)} presets contain it and are listed.")
+        else:
+            messagebox.showinfo("Preset Not Found", f"No preset found for {model_name}.")
 
 def delete_unused_presets():
-    database = load_database()
-    unused_presets = set(database["presets"].keys()) - set(database["models"])
-    for model_type in unused_presets:
-        preset_file = database["presets"].pop(model_type)
-        os.remove(preset_file)
-    save_database(database)
-    messagebox.showinfo("Unused Presets Deleted", f"Deleted {len(unused_presets)} unused presets.")
+    def show_results(deleted):
+        reload_database()
+        messagebox.showinfo("Unused Presets Deleted", f"Deleted {deleted} unused presets.")
+    task_executor.submit("Deleting unused presets", delete_unused, on_done=show_results, on_error=show_task_error,
+                         on_cancelled=reload_database)
 
 def export_model_list():
     export_format = export_var.get()
@@ -141,24 +138,42 @@ def export_model_list():
         with open("model_list.json", "w") as file:
             json.dump(database["models"], file, indent=2)
         messagebox.showinfo("Model List Exported", "Model list exported as model_list.json")
+    elif export_format == "Bundle":
+        # Presets and models in one streamed bundle for another host to import.
+        bundle_file = filedialog.asksaveasfilename(title="Export Preset Bundle", defaultextension=".jsonl.gz",
+                                                   initialfile=f"presets{BUNDLE_SUFFIX}.gz", filetypes=BUNDLE_FILETYPES)
+        if bundle_file:
+            def show_results(summary):
+                skipped = f"\n{len(summary['unreadable'])} unreadable presets skipped." if summary["unreadable"] else ""
+                messagebox.showinfo("Presets Exported", f"{summary['presets']} presets and {summary['models']} models "
+                                                        f"exported to {bundle_file} ({summary['bytes'] / 1024:.0f} KiB)."
+                                                        f"{skipped}")
+            task_executor.submit("Exporting presets", export_preset_bundle, bundle_file, on_done=show_results,
+                                 on_error=show_task_error)
 
 def import_presets():
-    preset_file = filedialog.askopenfilename(title="Select Preset JSON File", filetypes=[("JSON Files", "*.json")])
-    if preset_file:
-        with open(preset_file, "r") as file:
-            presets = json.load(file)
-        database = load_database()
-        database["presets"].update(presets)
-        save_database(database)
-        messagebox.showinfo("Presets Imported", f"Presets imported from {preset_file}")
-        update_preset_listbox()
+    preset_file = filedialog.askopenfilename(title="Select Preset Bundle or JSON File",
+                                             filetypes=BUNDLE_FILETYPES + [("JSON Files", "*.json")])
+    if preset_file and ".jsonl" in os.path.basename(preset_file):
+        def show_bundle_results(counters):
+            reload_database()
+            messagebox.showinfo("Presets Imported", f"Presets imported from {preset_file}\n{format_import(counters)}")
+        # An interrupted import continues from its last checkpoint when started again.
+        task_executor.submit("Importing presets", import_preset_bundle, preset_file, CONFIG_PRESETS_DIR,
+                             on_done=show_bundle_results, on_error=show_task_error, on_cancelled=reload_database)
+    elif preset_file:
+        def show_results(imported):
+            reload_database()
+            messagebox.showinfo("Presets Imported", f"Presets imported from {preset_file}")
+        task_executor.submit("Importing presets", import_preset_mapping, preset_file, on_done=show_results,
+                             on_error=show_task_error)
 
 def edit_preset():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
+        preset_data = preset_repository.load(preset_file)
+        record_history(selected_preset, preset_file)
         preset_editor_window = tk.Toplevel(root)
         preset_editor_window.title(f"Editing Preset: {selected_preset}")
         # Create and populate widgets for editing preset parameters
@@ -166,151 +181,338 @@ def edit_preset():
         def save_preset():
             # Get the updated preset parameters from the widgets
             # ...
-            with open(preset_file, "w") as file:
-                json.dump(preset_data, file, indent=2)
+            preset_repository.save(preset_file, preset_data)
+            record_history(selected_preset, preset_file)
+            mark_for_sync([preset_file])
             preset_editor_window.destroy()
         save_button = tk.Button(preset_editor_window, text="Save", command=save_preset)
         save_button.pack(padx=20, pady=10)
 
 def duplicate_preset():
+    global database
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
         new_preset_name = f"{selected_preset}_copy"
         new_preset_file = os.path.join(CONFIG_PRESETS_DIR, f"{new_preset_name}.preset.json")
+        if PRESET_STORAGE == "dedup":
+            # The copy shares its parameter body with the original in the store.
+            # The original is stored again first in case it changed since it was
+            # last stored.
+            store = PresetStore()
+            store.add_file(preset_file, selected_preset)
+            store.duplicate(selected_preset, new_preset_name, overlay={})
+        # LM Studio's file for the copy is a real copy, not a hard link, since
+        # LM Studio may write a preset in place and would change both.
         shutil.copyfile(preset_file, new_preset_file)
         database["presets"][new_preset_name] = new_preset_file
-        save_database(database)
+        database = save_changes(database)
+        mark_for_sync([new_preset_file])
         update_preset_listbox()
 
 def update_preset_listbox():
-    preset_listbox.delete(0, tk.END)
-    for preset_name in database["presets"]:
-        preset_listbox.insert(tk.END, preset_name)
+    preset_index.update(database["presets"])
+    preset_listbox.set_items(preset_index.search(preset_filter_var.get()))
+
+def schedule_preset_filter(*args):
+    # Debounce type-ahead so a burst of keystrokes filters the list once.
+    global preset_filter_job
+    if preset_filter_job is not None:
+        root.after_cancel(preset_filter_job)
+    preset_filter_job = root.after(FILTER_DELAY_MS, apply_preset_filter)
+
+def apply_preset_filter():
+    global preset_filter_job
+    preset_filter_job = None
+    preset_listbox.set_items(preset_index.search(preset_filter_var.get()))
+
+def show_git_error(title):
+    def show_error(error):
+        messagebox.showerror(title, str(error))
+    return show_error
+
+def mark_for_sync(preset_files):
+    # Queues changed presets for the next commit; presets the repository
+    # cannot hold are noted in the status bar rather than silently left out.
+    try:
+        preset_sync.mark_changed(preset_files)
+    except SyncError as error:
+        status_var.set(str(error))
+
+def report_background_sync(future):
+    # Called on the sync thread after a timed or threshold commit.
+    error = future.exception()
+    if error is not None:
+        task_executor.call_soon(show_git_error("Sync Error"), error)
 
 def sync_presets_with_github():
-    try:
-        repo = Repo(GITHUB_REPO_DIR)
-        repo.git.pull()
-        messagebox.showinfo("Sync Complete", "Presets synced with GitHub repository.")
-    except git.exc.InvalidGitRepositoryError:
-        messagebox.showerror("Sync Error", "Invalid GitHub repository.")
+    # git itself runs on the sync thread, queued behind any timed commit.
+    task_executor.submit("Syncing with GitHub", lambda task: preset_sync.submit(preset_sync.pull).result(),
+                         on_done=lambda result: messagebox.showinfo("Sync Complete", "Presets synced with GitHub repository."),
+                         on_error=show_git_error("Sync Error"))
 
 def push_presets_to_github():
-    try:
-        repo = Repo(GITHUB_REPO_DIR)
-        repo.git.add(update=True)
-        repo.index.commit("Update presets")
-        repo.git.push()
-        messagebox.showinfo("Push Complete", "Presets pushed to GitHub repository.")
-    except git.exc.InvalidGitRepositoryError:
-        messagebox.showerror("Push Error", "Invalid GitHub repository.")
+    task_executor.submit("Pushing to GitHub", lambda task: preset_sync.submit(preset_sync.sync, True).result(),
+                         on_done=lambda committed: messagebox.showinfo("Push Complete", f"Presets pushed to GitHub repository ({committed} changed files)."),
+                         on_error=show_git_error("Push Error"))
 
 def categorize_presets():
     category = simpledialog.askstring("Categorize Presets", "Enter a category for the selected presets:")
     if category:
-        selected_presets = preset_listbox.curselection()
-        for index in selected_presets:
-            preset_name = preset_listbox.get(index)
-            preset_file = database["presets"][preset_name]
-            with open(preset_file, "r") as file:
-                preset_data = json.load(file)
-            preset_data["category"] = category
-            with open(preset_file, "w") as file:
-                json.dump(preset_data, file, indent=2)
+        selected_presets = [preset_listbox.get(index) for index in preset_listbox.curselection()]
+        preset_files = [database["presets"][name] for name in selected_presets]
+        for name, preset_file in zip(selected_presets, preset_files):
+            record_history(name, preset_file)
+        try:
+            apply_patch(preset_files, {"category": category}, repository=preset_repository)
+        except BatchError as error:
+            messagebox.showerror("Categorization Failed", f"No presets were changed.\n{error}")
+            return
+        for name, preset_file in zip(selected_presets, preset_files):
+            record_history(name, preset_file)
+        mark_for_sync(preset_files)
         messagebox.showinfo("Categorization Complete", f"Selected presets have been categorized as '{category}'.")
 
 def compare_presets():
     selected_presets = preset_listbox.curselection()
-    if len(selected_presets) == 2:
-        preset1_name = preset_listbox.get(selected_presets[0])
-        preset2_name = preset_listbox.get(selected_presets[1])
-        preset1_file = database["presets"][preset1_name]
-        preset2_file = database["presets"][preset2_name]
-        with open(preset1_file, "r") as file:
-            preset1_data = json.load(file)
-        with open(preset2_file, "r") as file:
-            preset2_data = json.load(file)
-        # Compare the preset data and display the differences
-        # ...
-        messagebox.showinfo("Preset Comparison", "Preset comparison complete.")
+    if len(selected_presets) >= 2:
+        # The first selected preset is the baseline the others are compared against.
+        preset_names = [preset_listbox.get(index) for index in selected_presets]
+        flat = [flat_presets.get(database["presets"][preset_name]) for preset_name in preset_names]
+        keys = diff_presets(flat[0], flat[1:])
+        if not keys:
+            messagebox.showinfo("Preset Comparison", f"All selected presets match {preset_names[0]}.")
+            return
+        table = format_table(preset_names, keys, diff_rows(flat[0], flat[1:], keys))
+        comparison_window = tk.Toplevel(root)
+        comparison_window.title(f"Compared with {preset_names[0]}: {len(keys)} differing keys")
+        comparison_text = tk.Text(comparison_window, wrap=tk.NONE, font="TkFixedFont")
+        x_scrollbar = ttk.Scrollbar(comparison_window, orient="horizontal", command=comparison_text.xview)
+        y_scrollbar = ttk.Scrollbar(comparison_window, orient="vertical", command=comparison_text.yview)
+        comparison_text.configure(xscrollcommand=x_scrollbar.set, yscrollcommand=y_scrollbar.set)
+        x_scrollbar.pack(side=tk.BOTTOM, fill="x")
+        y_scrollbar.pack(side=tk.RIGHT, fill="y")
+        comparison_text.pack(side=tk.LEFT, fill="both", expand=True)
+        comparison_text.insert("1.0", table)
+        comparison_text.configure(state=tk.DISABLED)
     else:
-        messagebox.showinfo("Preset Comparison", "Please select two presets to compare.")
+        messagebox.showinfo("Preset Comparison", "Please select at least two presets to compare.")
+
+def run_benchmarks(title, preset_names, on_done):
+    # Benchmarks the presets on the task executor and records the results.
+    presets = {name: preset_repository.load(database["presets"][name]) for name in preset_names}
+    def benchmark(task):
+        backend = preset_bench.make_backend(BENCH_BACKEND, BENCH_SERVER_URL, BENCH_MODEL,
+                                            BENCH_SERVER_PID or preset_bench.find_process(BENCH_SERVER_PROCESS))
+        results = preset_bench.benchmark_presets(presets, backend, task=task)
+        preset_bench.save_results(results)
+        return results
+    task_executor.submit(title, benchmark, on_done=on_done, on_error=show_task_error)
 
 def track_preset_metrics():
-    selected_preset = preset_listbox.get(preset_listbox.curselection())
-    if selected_preset:
-        preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
-        # Track and display performance metrics for the selected preset
-        # ...
-        messagebox.showinfo("Preset Metrics", "Preset metrics tracked.")
+    selected_presets = [preset_listbox.get(index) for index in preset_listbox.curselection()]
+    if selected_presets:
+        def show_results(results):
+            messagebox.showinfo("Preset Metrics", "\n\n".join(preset_bench.format_result(result) for result in results))
+        run_benchmarks("Benchmarking presets", selected_presets, show_results)
 
 def version_control_presets():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        # Implement version control for the selected preset
-        # ...
-        messagebox.showinfo("Version Control", "Preset version control implemented.")
+        record_history(selected_preset, preset_file)
+        revisions = preset_history.revisions(selected_preset)
+        if len(revisions) < 2:
+            messagebox.showinfo("Version Control", f"Preset {selected_preset} has no earlier revisions.")
+            return
+        first, latest = revisions[0][0], revisions[-1][0]
+        rev = simpledialog.askinteger("Version Control",
+                                      f"Preset {selected_preset} is at revision {latest}.\n"
+                                      f"Enter a revision to restore ({first}-{latest - 1}):",
+                                      minvalue=first, maxvalue=latest)
+        if rev is not None and rev != latest:
+            try:
+                preset_history.restore(selected_preset, rev, preset_file, repository=preset_repository)
+            except (HistoryError, OSError) as error:
+                messagebox.showerror("Version Control", str(error))
+                return
+            mark_for_sync([preset_file])
+            messagebox.showinfo("Version Control", f"Preset {selected_preset} restored to revision {rev}.")
 
 def recommend_presets():
-    # Implement preset recommendation logic based on user preferences, model types, or popular presets
-    # ...
-    recommended_presets = ["Preset 1", "Preset 2", "Preset 3"]
-    messagebox.showinfo("Recommended Presets", f"Recommended Presets:\n{', '.join(recommended_presets)}")
+    # Presets whose settings suit the selected preset's model, ranked by
+    # feature distance with faster benchmark results pulled forward.
+    selected_presets = [preset_listbox.get(index) for index in preset_listbox.curselection()]
+    if not selected_presets:
+        messagebox.showinfo("Recommended Presets", "Please select a preset to get recommendations for.")
+        return
+    selected_preset = selected_presets[0]
+    def recommend(task):
+        catalog = load_database()
+        preset_recommender.sync(catalog, preset_repository.load_shared, task=task)
+        preset_recommender.set_scores(benchmark_scores(preset_bench.load_results()))
+        preset_recommender.save()
+        save_changes(catalog)
+        metadata_cache = catalog["gguf_metadata"]
+        model = largest_model(model_paths_by_type(metadata_cache).get(selected_preset, []), metadata_cache)
+        model_size, _, metadata = model if model is not None else (None, None, None)
+        return (preset_recommender.recommend_for_model(selected_preset, model_size, metadata, RECOMMEND_COUNT,
+                                                       exclude=(selected_preset,)),
+                preset_recommender.similar_presets(selected_preset, RECOMMEND_COUNT))
+    def show_results(outcome):
+        for_model, similar = outcome
+        def describe(recommendations):
+            return "\n".join(f"  {name} (distance {distance:.2f})" for name, distance in recommendations) or "  none"
+        messagebox.showinfo("Recommended Presets", f"Presets for models like {selected_preset}:\n{describe(for_model)}\n\n"
+                                                   f"Presets with similar settings:\n{describe(similar)}")
+    task_executor.submit("Recommending presets", recommend, on_done=show_results, on_error=show_task_error)
 
 def test_preset():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
-        preset_file = database["presets"][selected_preset]
-        # Test the selected preset on a sample input and display the generated output
-        # ...
-        messagebox.showinfo("Preset Testing", "Preset testing complete.")
+        def show_results(results):
+            result = results[0]
+            messagebox.showinfo("Preset Testing", f"{preset_bench.format_result(result)}\n\n"
+                                                  f"Prompt: {preset_bench.PROMPT_SUITE[0]}\n"
+                                                  f"Output: {result['sample_output']}")
+        run_benchmarks("Testing preset", [selected_preset], show_results)
 
 def browse_preset_marketplace():
-    # Implement a marketplace or repository for browsing and downloading presets
-    # ...
-    messagebox.showinfo("Preset Marketplace", "Browse and download presets from the marketplace.")
+    # Lists the registry's presets, from the response cache when it can't be
+    # reached, and installs the selected ones into LM Studio's presets.
+    def show_listing(entries):
+        by_name = {entry["name"]: entry for entry in entries}
+        market_index = PresetIndex(by_name)
+        offline = " (offline)" if marketplace_client.offline else ""
+        market_window = tk.Toplevel(root)
+        market_window.title(f"Preset Marketplace: {len(entries)} presets{offline}")
+        market_filter_var = tk.StringVar()
+        market_filter_entry = tk.Entry(market_window, textvariable=market_filter_var)
+        market_filter_entry.pack(padx=10, pady=(10, 0), fill="x")
+        market_listbox = VirtualListbox(market_window, height=20, width=50, selectmode=tk.EXTENDED)
+        market_listbox.pack(padx=10, pady=10, fill="both", expand=True)
+        market_listbox.set_items(market_index.search(""))
+        market_filter_var.trace_add("write", lambda *args: market_listbox.set_items(market_index.search(market_filter_var.get())))
+        def install_selected():
+            selected = [by_name[market_listbox.get(index)] for index in market_listbox.curselection()]
+            if not selected:
+                messagebox.showinfo("Preset Marketplace", "Please select presets to install.", parent=market_window)
+                return
+            def show_results(counters):
+                reload_database()
+                messagebox.showinfo("Presets Installed", f"{format_import(counters)}\n{format_market_stats(marketplace_client)}",
+                                    parent=market_window)
+            task_executor.submit("Installing presets", install_marketplace_presets, marketplace_client, selected,
+                                 CONFIG_PRESETS_DIR, on_done=show_results, on_error=show_task_error,
+                                 on_cancelled=reload_database)
+        install_button = ttk.Button(market_window, text="Install Selected", command=install_selected)
+        install_button.pack(pady=(0, 10))
+    task_executor.submit("Loading marketplace", lambda task: marketplace_client.listing(task=task), on_done=show_listing,
+                         on_error=show_task_error)
 
 def check_preset_compatibility():
-    selected_preset = preset_listbox.get(preset_listbox.curselection())
-    if selected_preset:
-        preset_file = database["presets"][selected_preset]
-        # Check the compatibility of the selected preset with the selected model
-        # ...
-        messagebox.showinfo("Compatibility Check", "Preset compatibility check complete.")
+    # Checks the selected presets, or the whole catalog when none is selected.
+    selected_presets = [preset_listbox.get(index) for index in preset_listbox.curselection()] or None
+    def check(task):
+        # Works on its own copy of the catalog; new model metadata is saved with it.
+        catalog = load_database()
+        results = check_catalog(catalog, load_host_profile(), preset_repository.load_shared, selected_presets,
+                                adjust=True, task=task)
+        save_changes(catalog)
+        return results
+    def show_results(results):
+        failing = [result for result in results if does_not_fit(result)]
+        report = "\n\n".join(format_result(result) for result in (failing if selected_presets is None else results))
+        if not failing:
+            messagebox.showinfo("Compatibility Check", report if selected_presets else f"All {len(results)} presets fit this host.")
+            return
+        adjustable = [result for result in failing if result.adjusted]
+        if not adjustable:
+            messagebox.showwarning("Compatibility Check", report)
+            return
+        if messagebox.askyesno("Compatibility Check", f"{report}\n\nAdjust {len(adjustable)} presets to the suggested settings?"):
+            for result in adjustable:
+                preset_file = database["presets"][result.preset]
+                try:
+                    patch_preset(preset_history, result.preset, preset_file,
+                                 {f"load_params.{key}": value for key, value in result.adjusted.items()}, preset_repository)
+                except BatchError as error:
+                    messagebox.showerror("Compatibility Check", str(error))
+                    return
+                mark_for_sync([preset_file])
+            messagebox.showinfo("Compatibility Check", f"{len(adjustable)} presets adjusted.")
+    task_executor.submit("Checking compatibility", check, on_done=show_results, on_error=show_task_error)
 
 def validate_preset():
-    selected_preset = preset_listbox.get(preset_listbox.curselection())
-    if selected_preset:
-        preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
-        # Validate the preset parameters and provide warnings or suggestions for invalid or suboptimal settings
-        # ...
-        messagebox.showinfo("Preset Validation", "Preset validation complete.")
+    selected_presets = preset_listbox.curselection()
+    if selected_presets:
+        preset_names = [preset_listbox.get(index) for index in selected_presets]
+        presets = [preset_repository.load_shared(database["presets"][preset_name]) for preset_name in preset_names]
+        issues = validate_presets(presets)
+        if issues:
+            report = "\n".join(f"{preset_names[row]}: {severity}: {message}" for row, severity, code, message in issues)
+            messagebox.showwarning("Preset Validation", f"Found {len(issues)} issues:\n{report}")
+        else:
+            messagebox.showinfo("Preset Validation", "Preset validation complete. No issues found.")
 
 def enable_preset_collaboration():
     # Implement real-time collaboration features for multiple users to work on the same preset
     # ...
     messagebox.showinfo("Preset Collaboration", "Preset collaboration enabled.")
 
+def resolve_scheduled_preset(preset_name):
+    # Runs on the scheduler's threads, so it reads its own copy of the catalog.
+    return catalog_resolver(load_database(), preset_repository.load_shared)(preset_name)
+
+def report_scheduled_result(result):
+    # Called on a scheduler thread after each run.
+    if result["status"] == "failed":
+        task_executor.call_soon(status_var.set, f"Scheduled run of {result['preset']} failed: {result['error']}")
+
+def report_scheduler_error(error):
+    # Called on the scheduler thread; it keeps running and tries again.
+    task_executor.call_soon(status_var.set, f"Scheduler error: {error}")
+
 def schedule_preset_execution():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
-        preset_file = database["presets"][selected_preset]
-        # Implement a scheduling system to execute the selected preset at specific times or intervals
-        # ...
-        messagebox.showinfo("Preset Scheduling", "Preset execution scheduled.")
+        trigger = simpledialog.askstring("Preset Scheduling",
+                                         f"When should {selected_preset} run?\n"
+                                         "e.g. 'every 30m', 'every 6h', '0 3 * * *' (cron) or @daily:")
+        if not trigger:
+            return
+        try:
+            job_id = preset_scheduler.add_job(selected_preset, trigger)
+        except ScheduleError as error:
+            messagebox.showerror("Preset Scheduling", str(error))
+            return
+        note = "" if scheduler_error is None else f"\n\nScheduled runs are paused: {scheduler_error}"
+        messagebox.showinfo("Preset Scheduling", f"Preset execution scheduled.\n{format_job(preset_scheduler.jobs[job_id])}{note}")
 
 def chain_presets():
-    selected_presets = preset_listbox.curselection()
+    selected_presets = [preset_listbox.get(index) for index in preset_listbox.curselection()]
     if len(selected_presets) > 1:
-        # Implement preset chaining to create a pipeline of transformations or processing steps
-        # ...
-        messagebox.showinfo("Preset Chaining", "Presets chained successfully.")
+        # Each selected preset is a stage, in list order; documents stream through them.
+        input_file = filedialog.askopenfilename(title="Select Documents (one per line)",
+                                                filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+        if not input_file:
+            return
+        output_file = os.path.splitext(input_file)[0] + preset_chain.CHAIN_OUTPUT_SUFFIX
+        stages = [(name, preset_repository.load(database["presets"][name]), preset_chain.STAGE_CONCURRENCY)
+                  for name in selected_presets]
+        def run(task):
+            start = time.perf_counter()
+            results, stats = preset_chain.run_chain(stages, preset_chain.load_documents(input_file),
+                                                    preset_chain.make_backend(BENCH_BACKEND, BENCH_SERVER_URL), task=task)
+            preset_chain.save_outputs(results, output_file)
+            return results, preset_chain.format_stats(stats, time.perf_counter() - start)
+        def show_results(outcome):
+            results, report = outcome
+            failed = sum(1 for result in results if result is not None and "error" in result)
+            messagebox.showinfo("Preset Chaining", f"{len(results)} documents processed through "
+                                                   f"{' -> '.join(selected_presets)}, {failed} failed.\n"
+                                                   f"Results saved to {output_file}\n\n{report}")
+        task_executor.submit("Chaining presets", run, on_done=show_results, on_error=show_task_error)
     else:
         messagebox.showinfo("Preset Chaining", "Please select multiple presets to chain.")
 
@@ -318,8 +520,7 @@ def visualize_preset():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
+        preset_data = preset_repository.load_shared(preset_file)
         # Provide visual representations of preset parameters, such as graphs or charts
         # ...
         messagebox.showinfo("Preset Visualization", "Preset visualization generated.")
@@ -329,11 +530,15 @@ def perform_ab_testing():
     if len(selected_presets) == 2:
         preset1_name = preset_listbox.get(selected_presets[0])
         preset2_name = preset_listbox.get(selected_presets[1])
-        preset1_file = database["presets"][preset1_name]
-        preset2_file = database["presets"][preset2_name]
-        # Perform A/B testing by generating outputs using the selected presets and comparing the results
-        # ...
-        messagebox.showinfo("A/B Testing", "A/B testing complete.")
+        def show_results(results):
+            changes = preset_bench.compare_results(results[0], results[1])
+            lines = [preset_bench.format_result(result) for result in results]
+            for metric, change in changes.items():
+                if change is not None:
+                    better = preset2_name if change > 0 else preset1_name
+                    lines.append(f"{metric}: {better} is better by {abs(change):.0%}")
+            messagebox.showinfo("A/B Testing", "\n\n".join(lines))
+        run_benchmarks("A/B testing presets", [preset1_name, preset2_name], show_results)
     else:
         messagebox.showinfo("A/B Testing", "Please select two presets for A/B testing.")
 
@@ -341,27 +546,50 @@ def mark_preset_favorite():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
-        preset_data["favorite"] = True
-        with open(preset_file, "w") as file:
-            json.dump(preset_data, file, indent=2)
+        record_history(selected_preset, preset_file)
+        try:
+            apply_patch([preset_file], {"favorite": True}, repository=preset_repository)
+        except BatchError as error:
+            messagebox.showerror("Favorite Preset", str(error))
+            return
+        record_history(selected_preset, preset_file)
+        mark_for_sync([preset_file])
         messagebox.showinfo("Favorite Preset", f"Preset '{selected_preset}' marked as favorite.")
         
 def view_preset_history():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        # Implement preset history tracking and display the history of the selected preset
-        # ...
-        messagebox.showinfo("Preset History", "Preset history displayed.")
+        record_history(selected_preset, preset_file)
+        lines = []
+        for rev, timestamp, kind, changes in reversed(preset_history.revisions(selected_preset)):
+            lines.append(f"Revision {rev}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))}")
+            if rev > 1 and kind == "patch":
+                lines.append(format_patch(preset_history.diff(selected_preset, rev - 1, rev)))
+            lines.append("")
+        history_window = tk.Toplevel(root)
+        history_window.title(f"Preset History: {selected_preset}")
+        history_text = tk.Text(history_window, wrap=tk.NONE, width=100, height=30)
+        history_text.insert(tk.END, "\n".join(lines))
+        history_text.config(state=tk.DISABLED)
+        history_text.pack(fill=tk.BOTH, expand=True)
 
 def preset_analytics():
-    # Implement analytics and reporting features to provide insights into preset usage and performance trends
-    # ...
-    messagebox.showinfo("Preset Analytics", "Preset analytics generated.")
+    history = preset_bench.load_results()
+    if not history:
+        messagebox.showinfo("Preset Analytics", "No benchmark results yet. Use Track Metrics or A/B Testing first.")
+        return
+    analytics_window = tk.Toplevel(root)
+    analytics_window.title("Preset Analytics")
+    analytics_text = tk.Text(analytics_window, wrap=tk.NONE, width=110, height=30, font=("Courier", 10))
+    analytics_text.insert(tk.END, preset_bench.format_trends(history))
+    analytics_text.config(state=tk.DISABLED)
+    analytics_text.pack(fill=tk.BOTH, expand=True)
 
 def apply_preset_shortcuts(event):
+    # Bound on the root window; keys typed into a text field are not shortcuts.
+    if isinstance(event.widget, (tk.Entry, tk.Text)):
+        return
     if event.keysym == "n":
         # Create a new preset
         pass
@@ -375,149 +603,197 @@ def optimize_preset():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
-        # Perform optimization logic here based on the preset parameters
-        # Update the preset_data with optimized values
-        with open(preset_file, "w") as file:
-            json.dump(preset_data, file, indent=2)
-        messagebox.showinfo("Optimization Complete", f"Preset {selected_preset} has been optimized.")
+        def tune(task):
+            catalog = load_database()
+            result, cached = tune_preset(selected_preset, preset_repository.load(preset_file), catalog,
+                                         TUNING_BACKEND, task=task)
+            save_changes(catalog)
+            return result, cached
+        def apply_result(outcome):
+            result, cached = outcome
+            try:
+                patch_preset(preset_history, selected_preset, preset_file, tuned_fields(result), preset_repository)
+            except BatchError as error:
+                messagebox.showerror("Optimization Failed", str(error))
+                return
+            mark_for_sync([preset_file])
+            settings = ", ".join(f"{key.split('.')[-1]}={value}" for key, value in tuned_fields(result).items())
+            rate = result["rates"].get("tokens_per_second")
+            measured = f"\n{rate:.1f} tokens/s measured with {result['backend']}." if rate else ""
+            source = " (stored result for this machine)" if cached else ""
+            messagebox.showinfo("Optimization Complete",
+                                f"Preset {selected_preset} has been optimized{source}.\n{settings}{measured}")
+        task_executor.submit("Optimizing preset", tune, on_done=apply_result, on_error=show_task_error)
 
 def add_preset_notes():
     selected_preset = preset_listbox.get(preset_listbox.curselection())
     if selected_preset:
         preset_file = database["presets"][selected_preset]
-        with open(preset_file, "r") as file:
-            preset_data = json.load(file)
         notes = simpledialog.askstring("Preset Notes", "Enter notes for the preset:")
         if notes:
-            preset_data["notes"] = notes
-            with open(preset_file, "w") as file:
-                json.dump(preset_data, file, indent=2)
+            record_history(selected_preset, preset_file)
+            try:
+                apply_patch([preset_file], {"notes": notes}, repository=preset_repository)
+            except BatchError as error:
+                messagebox.showerror("Preset Notes", str(error))
+                return
+            record_history(selected_preset, preset_file)
+            mark_for_sync([preset_file])
             messagebox.showinfo("Notes Added", f"Notes added to preset {selected_preset}.")
 
-root = tk.Tk()
-root.title("GGUF Preset Manager")
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("GGUF Preset Manager")
 
-search_button = tk.Button(root, text="Search Directory", command=search_files)
-search_button.pack(padx=20, pady=10)
+    search_button = tk.Button(root, text="Search Directory", command=search_files)
+    search_button.pack(padx=20, pady=10)
 
-preset_frame = tk.Frame(root)
-preset_frame.pack(padx=20, pady=10)
+    watch_button = tk.Button(root, text="Watch Folders", command=toggle_watch_mode)
+    watch_button.pack(padx=20, pady=(0, 10))
 
-preset_listbox = tk.Listbox(preset_frame)
-preset_listbox.pack(side=tk.LEFT)
+    preset_frame = tk.Frame(root)
+    preset_frame.pack(padx=20, pady=10)
 
-preset_scrollbar = ttk.Scrollbar(preset_frame, orient="vertical", command=preset_listbox.yview)
-preset_scrollbar.pack(side=tk.RIGHT, fill="y")
+    preset_listbox = VirtualListbox(preset_frame, selectmode=tk.EXTENDED)
+    preset_listbox.pack(side=tk.LEFT, fill="y")
 
-preset_listbox.configure(yscrollcommand=preset_scrollbar.set)
+    preset_button_frame = ttk.Frame(preset_frame)
+    preset_button_frame.pack(side=tk.RIGHT)
 
-preset_button_frame = ttk.Frame(preset_frame)
-preset_button_frame.pack(side=tk.RIGHT)
+    edit_preset_button = ttk.Button(preset_button_frame, text="Edit Preset", command=edit_preset)
+    edit_preset_button.pack(pady=5)
 
-edit_preset_button = ttk.Button(preset_button_frame, text="Edit Preset", command=edit_preset)
-edit_preset_button.pack(pady=5)
+    duplicate_preset_button = ttk.Button(preset_button_frame, text="Duplicate Preset", command=duplicate_preset)
+    duplicate_preset_button.pack(pady=5)
 
-duplicate_preset_button = ttk.Button(preset_button_frame, text="Duplicate Preset", command=duplicate_preset)
-duplicate_preset_button.pack(pady=5)
+    categorize_button = ttk.Button(preset_button_frame, text="Categorize Presets", command=categorize_presets)
+    categorize_button.pack(pady=5)
 
-categorize_button = ttk.Button(preset_button_frame, text="Categorize Presets", command=categorize_presets)
-categorize_button.pack(pady=5)
+    compare_button = ttk.Button(preset_button_frame, text="Compare Presets", command=compare_presets)
+    compare_button.pack(pady=5)
 
-compare_button = ttk.Button(preset_button_frame, text="Compare Presets", command=compare_presets)
-compare_button.pack(pady=5)
+    metrics_button = ttk.Button(preset_button_frame, text="Track Preset Metrics", command=track_preset_metrics)
+    metrics_button.pack(pady=5)
 
-metrics_button = ttk.Button(preset_button_frame, text="Track Preset Metrics", command=track_preset_metrics)
-metrics_button.pack(pady=5)
+    version_control_button = ttk.Button(preset_button_frame, text="Version Control", command=version_control_presets)
+    version_control_button.pack(pady=5)
 
-version_control_button = ttk.Button(preset_button_frame, text="Version Control", command=version_control_presets)
-version_control_button.pack(pady=5)
+    recommend_button = ttk.Button(preset_button_frame, text="Recommend Presets", command=recommend_presets)
+    recommend_button.pack(pady=5)
 
-recommend_button = ttk.Button(preset_button_frame, text="Recommend Presets", command=recommend_presets)
-recommend_button.pack(pady=5)
+    test_button = ttk.Button(preset_button_frame, text="Test Preset", command=test_preset)
+    test_button.pack(pady=5)
 
-test_button = ttk.Button(preset_button_frame, text="Test Preset", command=test_preset)
-test_button.pack(pady=5)
+    marketplace_button = ttk.Button(preset_button_frame, text="Browse Marketplace", command=browse_preset_marketplace)
+    marketplace_button.pack(pady=5)
 
-marketplace_button = ttk.Button(preset_button_frame, text="Browse Marketplace", command=browse_preset_marketplace)
-marketplace_button.pack(pady=5)
+    compatibility_button = ttk.Button(preset_button_frame, text="Check Compatibility", command=check_preset_compatibility)
+    compatibility_button.pack(pady=5)
 
-compatibility_button = ttk.Button(preset_button_frame, text="Check Compatibility", command=check_preset_compatibility)
-compatibility_button.pack(pady=5)
+    validation_button = ttk.Button(preset_button_frame, text="Validate Preset", command=validate_preset)
+    validation_button.pack(pady=5)
 
-validation_button = ttk.Button(preset_button_frame, text="Validate Preset", command=validate_preset)
-validation_button.pack(pady=5)
+    collaboration_button = ttk.Button(preset_button_frame, text="Enable Collaboration", command=enable_preset_collaboration)
+    collaboration_button.pack(pady=5)
 
-collaboration_button = ttk.Button(preset_button_frame, text="Enable Collaboration", command=enable_preset_collaboration)
-collaboration_button.pack(pady=5)
+    scheduling_button = ttk.Button(preset_button_frame, text="Schedule Execution", command=schedule_preset_execution)
+    scheduling_button.pack(pady=5)
 
-scheduling_button = ttk.Button(preset_button_frame, text="Schedule Execution", command=schedule_preset_execution)
-scheduling_button.pack(pady=5)
+    chaining_button = ttk.Button(preset_button_frame, text="Chain Presets", command=chain_presets)
+    chaining_button.pack(pady=5)
 
-chaining_button = ttk.Button(preset_button_frame, text="Chain Presets", command=chain_presets)
-chaining_button.pack(pady=5)
+    visualization_button = ttk.Button(preset_button_frame, text="Visualize Preset", command=visualize_preset)
+    visualization_button.pack(pady=5)
 
-visualization_button = ttk.Button(preset_button_frame, text="Visualize Preset", command=visualize_preset)
-visualization_button.pack(pady=5)
+    ab_testing_button = ttk.Button(preset_button_frame, text="Perform A/B Testing", command=perform_ab_testing)
+    ab_testing_button.pack(pady=5)
 
-ab_testing_button = ttk.Button(preset_button_frame, text="Perform A/B Testing", command=perform_ab_testing)
-ab_testing_button.pack(pady=5)
+    favorite_button = ttk.Button(preset_button_frame, text="Mark as Favorite", command=mark_preset_favorite)
+    favorite_button.pack(pady=5)
 
-favorite_button = ttk.Button(preset_button_frame, text="Mark as Favorite", command=mark_preset_favorite)
-favorite_button.pack(pady=5)
+    history_button = ttk.Button(preset_button_frame, text="View Preset History", command=view_preset_history)
+    history_button.pack(pady=5)
 
-history_button = ttk.Button(preset_button_frame, text="View Preset History", command=view_preset_history)
-history_button.pack(pady=5)
+    analytics_button = ttk.Button(preset_button_frame, text="Preset Analytics", command=preset_analytics)
+    analytics_button.pack(pady=5)
 
-analytics_button = ttk.Button(preset_button_frame, text="Preset Analytics", command=preset_analytics)
-analytics_button.pack(pady=5)
+    optimization_button = ttk.Button(preset_button_frame, text="Optimize Preset", command=optimize_preset)
+    optimization_button.pack(pady=5)
 
-optimization_button = ttk.Button(preset_button_frame, text="Optimize Preset", command=optimize_preset)
-optimization_button.pack(pady=5)
+    notes_button = ttk.Button(preset_button_frame, text="Add Notes", command=add_preset_notes)
+    notes_button.pack(pady=5)
 
-notes_button = ttk.Button(preset_button_frame, text="Add Notes", command=add_preset_notes)
-notes_button.pack(pady=5)
+    preset_search_frame = tk.Frame(root)
+    preset_search_frame.pack(padx=20, pady=10)
+    preset_search_label = tk.Label(preset_search_frame, text="Search / Filter Presets:")
+    preset_search_label.pack(side=tk.LEFT)
+    preset_filter_var = tk.StringVar()
+    preset_filter_var.trace_add("write", schedule_preset_filter)
+    preset_filter_job = None
+    preset_entry = tk.Entry(preset_search_frame, textvariable=preset_filter_var)
+    preset_entry.pack(side=tk.LEFT)
+    preset_search_button = tk.Button(preset_search_frame, text="Search", command=search_preset)
+    preset_search_button.pack(side=tk.LEFT)
 
-preset_search_frame = tk.Frame(root)
-preset_search_frame.pack(padx=20, pady=10)
-preset_search_label = tk.Label(preset_search_frame, text="Search Preset:")
-preset_search_label.pack(side=tk.LEFT)
-preset_entry = tk.Entry(preset_search_frame)
-preset_entry.pack(side=tk.LEFT)
-preset_search_button = tk.Button(preset_search_frame, text="Search", command=search_preset)
-preset_search_button.pack(side=tk.LEFT)
+    delete_button = tk.Button(root, text="Delete Unused Presets", command=delete_unused_presets)
+    delete_button.pack(padx=20, pady=10)
 
-delete_button = tk.Button(root, text="Delete Unused Presets", command=delete_unused_presets)
-delete_button.pack(padx=20, pady=10)
+    export_frame = tk.Frame(root)
+    export_frame.pack(padx=20, pady=10)
+    export_label = tk.Label(export_frame, text="Export Model List:")
+    export_label.pack(side=tk.LEFT)
+    export_var = tk.StringVar(value="Text")
+    export_text_radio = tk.Radiobutton(export_frame, text="Text", variable=export_var, value="Text")
+    export_text_radio.pack(side=tk.LEFT)
+    export_json_radio = tk.Radiobutton(export_frame, text="JSON", variable=export_var, value="JSON")
+    export_json_radio.pack(side=tk.LEFT)
+    export_bundle_radio = tk.Radiobutton(export_frame, text="Preset Bundle", variable=export_var, value="Bundle")
+    export_bundle_radio.pack(side=tk.LEFT)
+    export_button = tk.Button(export_frame, text="Export", command=export_model_list)
+    export_button.pack(side=tk.LEFT)
 
-export_frame = tk.Frame(root)
-export_frame.pack(padx=20, pady=10)
-export_label = tk.Label(export_frame, text="Export Model List:")
-export_label.pack(side=tk.LEFT)
-export_var = tk.StringVar(value="Text")
-export_text_radio = tk.Radiobutton(export_frame, text="Text", variable=export_var, value="Text")
-export_text_radio.pack(side=tk.LEFT)
-export_json_radio = tk.Radiobutton(export_frame, text="JSON", variable=export_var, value="JSON")
-export_json_radio.pack(side=tk.LEFT)
-export_button = tk.Button(export_frame, text="Export", command=export_model_list)
-export_button.pack(side=tk.LEFT)
+    import_button = tk.Button(root, text="Import Presets", command=import_presets)
+    import_button.pack(padx=20, pady=10)
 
-import_button = tk.Button(root, text="Import Presets", command=import_presets)
-import_button.pack(padx=20, pady=10)
+    github_frame = ttk.Frame(root)
+    github_frame.pack(padx=20, pady=10)
 
-github_frame = ttk.Frame(root)
-github_frame.pack(padx=20, pady=10)
+    sync_button = ttk.Button(github_frame, text="Sync with GitHub", command=sync_presets_with_github)
+    sync_button.pack(side=tk.LEFT, padx=10)
 
-sync_button = ttk.Button(github_frame, text="Sync with GitHub", command=sync_presets_with_github)
-sync_button.pack(side=tk.LEFT, padx=10)
+    push_button = ttk.Button(github_frame, text="Push to GitHub", command=push_presets_to_github)
+    push_button.pack(side=tk.LEFT)
 
-push_button = ttk.Button(github_frame, text="Push to GitHub", command=push_presets_to_github)
-push_button.pack(side=tk.LEFT)
+    status_frame = ttk.Frame(root)
+    status_frame.pack(padx=20, pady=10, fill="x")
+    status_var = tk.StringVar()
+    status_label = ttk.Label(status_frame, textvariable=status_var)
+    status_label.pack(side=tk.LEFT)
+    cancel_button = ttk.Button(status_frame, text="Cancel", command=lambda: task_executor.cancel())
+    cancel_button.pack(side=tk.RIGHT)
 
-root.bind("<Key>", apply_preset_shortcuts)
-
-database = load_database()
-update_preset_listbox()
+    task_executor = TaskExecutor(root, on_status=status_var.set)
+    preset_sync = PresetSync(GITHUB_REPO_DIR, commit_threshold=SYNC_COMMIT_THRESHOLD if SYNC_AUTO_COMMIT else None,
+                             commit_interval=SYNC_COMMIT_INTERVAL if SYNC_AUTO_COMMIT else None,
+                             auto_push=SYNC_AUTO_PUSH, on_result=report_background_sync, remote_url=GITHUB_REPO_URL)
+    # Jobs are kept even when LM Studio's CLI is missing; they run once a runner is available.
+    try:
+        scheduler_runner, scheduler_error = make_runner(SCHEDULE_RUNNER, BENCH_SERVER_URL), None
+    except ScheduleError as error:
+        scheduler_runner, scheduler_error = None, error
+    preset_scheduler = Scheduler(scheduler_runner, resolve_scheduled_preset, max_concurrency=SCHEDULE_WORKERS,
+                                 pool_size=SCHEDULE_WARM_MODELS, on_result=report_scheduled_result,
+                                 on_error=report_scheduler_error)
+    if scheduler_runner is not None:
+        preset_scheduler.start()
+
+    root.bind("<Key>", apply_preset_shortcuts)
+
+    recover_journals()
+    database = load_database()
+    update_preset_listbox()
 
-root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    preset_scheduler.stop()
+    preset_sync.close(flush=SYNC_AUTO_COMMIT)
+    marketplace_client.close()
\ No newline at end of file
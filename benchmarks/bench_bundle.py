@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_bundle import export_bundle, import_bundle
+from preset_db import ModelList
+from preset_writer import DEFAULT_PRESET
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time streaming preset bundle export and import.")
+    parser.add_argument("--presets", type=int, default=20000)
+    parser.add_argument("--distinct", type=float, default=0.1, help="share of presets with their own parameters")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    root = tempfile.mkdtemp(prefix="bench_bundle_")
+    try:
+        source = os.path.join(root, "source")
+        os.makedirs(source)
+        database = {"presets": {}, "models": ModelList(f"model{index}-7b.Q4_K_M" for index in range(args.presets))}
+        for index in range(args.presets):
+            preset_data = json.loads(json.dumps(DEFAULT_PRESET))
+            preset_data["name"] = f"model{index} Preset"
+            if rng.random() < args.distinct:
+                preset_data["load_params"]["n_ctx"] = rng.choice([2048, 4096, 8192])
+                preset_data["inference_params"]["temp"] = round(rng.uniform(0.1, 1.2), 2)
+            path = os.path.join(source, f"model{index}.preset.json")
+            with open(path, "w") as file:
+                json.dump(preset_data, file, indent=2)
+            database["presets"][f"model{index}"] = path
+        source_bytes = sum(os.path.getsize(path) for path in database["presets"].values())
+
+        def load(path):
+            with open(path, "r") as file:
+                return json.load(file)
+
+        for suffix in (".presets.jsonl", ".presets.jsonl.gz"):
+            bundle_file = os.path.join(root, f"bundle{suffix}")
+            start = time.perf_counter()
+            summary = export_bundle(bundle_file, database, load)
+            print(f"export {suffix}: {summary['presets']} presets in {time.perf_counter() - start:.2f} s, "
+                  f"{summary['bytes'] / 1024:.0f} KiB ({source_bytes / 1024:.0f} KiB of preset files)")
+
+        target = {"presets": {}, "models": ModelList()}
+        start = time.perf_counter()
+        counters = import_bundle(bundle_file, target, os.path.join(root, "target"), lambda database: None)
+        print(f"import: {counters['imported']} presets in {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        counters = import_bundle(bundle_file, target, os.path.join(root, "target"), lambda database: None)
+        print(f"re-import: {counters['unchanged']} unchanged in {time.perf_counter() - start:.2f} s")
+
+        # Memory is measured on a separate run since tracing slows it down.
+        tracemalloc.start()
+        import_bundle(bundle_file, {"presets": {}, "models": ModelList()}, os.path.join(root, "traced"),
+                      lambda database: None)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"import peak traced memory: {peak / 1024 ** 2:.1f} MiB, catalog included")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_chain import AsyncFakeBackend, format_stats, run_chain
+
+
+async def words(text):
+    for word in text.split():
+        yield word + " "
+
+
+async def run_serially(stages, documents, backend):
+    # Baseline: every stage finishes a document before the next stage starts it.
+    outputs = []
+    for text in documents:
+        for _, preset_data, _ in stages:
+            text = "".join([token async for token in backend.stream(preset_data, words(text))])
+        outputs.append(text)
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the streaming chain pipeline with stage-by-stage processing.")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--stages", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--token-ms", type=float, default=0.5, help="simulated time per token")
+    parser.add_argument("--first-token-ms", type=float, default=20, help="simulated time before the first token")
+    parser.add_argument("--serial-documents", type=int, default=50, help="documents timed for the serial baseline")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    documents = [" ".join(f"word{rng.randrange(1000)}" for _ in range(rng.randint(20, 60)))
+                 for _ in range(args.documents)]
+    stages = [(f"stage{index}", {"name": f"stage{index}"}, args.concurrency) for index in range(args.stages)]
+    backend = AsyncFakeBackend(args.token_ms / 1000, args.first_token_ms / 1000)
+
+    sample = documents[:args.serial_documents]
+    start = time.perf_counter()
+    serial_outputs = asyncio.run(run_serially(stages, sample, backend))
+    serial = (time.perf_counter() - start) * len(documents) / len(sample)
+    print(f"serial: ~{serial:.1f} s for {len(documents)} documents (timed on {len(sample)})")
+
+    start = time.perf_counter()
+    results, stats = run_chain(stages, documents, backend)
+    elapsed = time.perf_counter() - start
+    assert [result["output"] for result in results[:len(sample)]] == [output.strip() for output in serial_outputs]
+    print(f"pipelined: {elapsed:.1f} s, {serial / elapsed:.1f}x faster")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_db import ModelList, unused_presets
+
+LIST_SAMPLE = 1000
+
+
+def model_names(count, offset=0):
+    return [f"family{i % 5000}-{i + offset}B-Q4_K_M" for i in range(count)]
+
+
+def bench(size):
+    known = model_names(size)
+    discovered = model_names(size // 2) + model_names(size // 2, offset=size)
+    presets = {f"family{i}": f"family{i}.preset.json" for i in range(0, 10000, 2)}
+
+    # The old list scan is quadratic, so time a sample of lookups and scale it.
+    plain = list(known)
+    start = time.perf_counter()
+    for name in discovered[-LIST_SAMPLE:]:
+        name in plain
+    list_scan = (time.perf_counter() - start) * len(discovered) / LIST_SAMPLE
+
+    start = time.perf_counter()
+    models = ModelList(known)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_models = 0
+    for name in discovered:
+        if name not in models:
+            models.append(name)
+            new_models += 1
+    indexed_scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    unused = unused_presets({"presets": presets, "models": models})
+    unused_time = time.perf_counter() - start
+
+    print(f"{size:>9,} models | list scan (est.) {list_scan:10.3f} s | index build {build * 1000:8.1f} ms | "
+          f"indexed scan {indexed_scan * 1000:8.1f} ms | unused presets {unused_time * 1000:6.2f} ms "
+          f"({new_models} new, {len(unused)} unused)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list membership with the indexed model list.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size)
+
+
+if __name__ == "__main__":
+    main()
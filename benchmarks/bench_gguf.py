@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import struct
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gguf_metadata import cached_metadata, preset_overrides, read_gguf_metadata
+
+CHAT_TEMPLATE = ("{% for message in messages %}{{'<|im_start|>' + message['role'] + '\\n' + message['content'] "
+                 "+ '<|im_end|>' + '\\n'}}{% endfor %}")
+
+
+def _string(value):
+    data = value.encode("utf-8")
+    return struct.pack("<Q", len(data)) + data
+
+
+def _kv(key, value_type, payload):
+    return _string(key) + struct.pack("<I", value_type) + payload
+
+
+def write_model(path, vocab_size, merges, tensor_bytes):
+    # A GGUF v3 header shaped like a llama model, followed by sparse
+    # "tensor data" so the file has a realistic size without using disk.
+    tokens = b"".join(_string(f"tok{i}") for i in range(vocab_size))
+    merge_strings = b"".join(_string(f"t{i} k{i}") for i in range(merges))
+    kvs = [
+        _kv("general.architecture", 8, _string("llama")),
+        _kv("general.name", 8, _string("bench")),
+        _kv("llama.context_length", 4, struct.pack("<I", 8192)),
+        _kv("llama.embedding_length", 4, struct.pack("<I", 4096)),
+        _kv("llama.block_count", 4, struct.pack("<I", 32)),
+        _kv("llama.feed_forward_length", 4, struct.pack("<I", 14336)),
+        _kv("llama.attention.head_count", 4, struct.pack("<I", 32)),
+        _kv("llama.attention.head_count_kv", 4, struct.pack("<I", 8)),
+        _kv("general.file_type", 4, struct.pack("<I", 15)),
+        _kv("tokenizer.ggml.model", 8, _string("gpt2")),
+        _kv("tokenizer.ggml.tokens", 9, struct.pack("<IQ", 8, vocab_size) + tokens),
+        _kv("tokenizer.ggml.scores", 9, struct.pack("<IQ", 6, vocab_size) + b"\0" * 4 * vocab_size),
+        _kv("tokenizer.ggml.merges", 9, struct.pack("<IQ", 8, merges) + merge_strings),
+        _kv("tokenizer.chat_template", 8, _string(CHAT_TEMPLATE)),
+    ]
+    with open(path, "wb") as file:
+        file.write(b"GGUF" + struct.pack("<IQQ", 3, 291, len(kvs)) + b"".join(kvs))
+        file.truncate(file.tell() + tensor_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time GGUF metadata reads on synthetic multi-GB models.")
+    parser.add_argument("--models", type=int, default=20)
+    parser.add_argument("--vocab", type=int, default=128256)
+    parser.add_argument("--merges", type=int, default=280147)
+    parser.add_argument("--tensor-gb", type=float, default=4.0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_gguf_")
+    try:
+        paths = [os.path.join(root, f"model{i}.gguf") for i in range(args.models)]
+        for path in paths:
+            write_model(path, args.vocab, args.merges, int(args.tensor_gb * 1024 ** 3))
+
+        metadata = read_gguf_metadata(paths[0])
+        print({key: value for key, value in metadata.items() if key != "chat_template"})
+        print("preset overrides:", preset_overrides(metadata))
+
+        start = time.perf_counter()
+        for path in paths:
+            read_gguf_metadata(path)
+        cold = (time.perf_counter() - start) / len(paths)
+        cache = {}
+        for path in paths:
+            cached_metadata(cache, path)
+        start = time.perf_counter()
+        for path in paths:
+            cached_metadata(cache, path)
+        warm = (time.perf_counter() - start) / len(paths)
+        print(f"{args.tensor_gb:.0f} GB models, {args.vocab} tokens, {args.merges} merges: "
+              f"{cold * 1000:.1f} ms per header read, {warm * 1e6:.1f} us per catalog hit")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
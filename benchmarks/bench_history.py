@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_history import PresetHistory
+
+REPO_PRESETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config-presets")
+EDITS = [
+    ("load_params", "n_ctx", lambda: random.choice([2048, 4096, 8192, 16384])),
+    ("load_params", "n_gpu_layers", lambda: random.randint(0, 80)),
+    ("inference_params", "temp", lambda: round(random.uniform(0.1, 1.5), 2)),
+    ("inference_params", "top_p", lambda: round(random.uniform(0.5, 1.0), 2)),
+    ("inference_params", "n_threads", lambda: random.randint(1, 32)),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure preset history size and revision lookup time.")
+    parser.add_argument("--revisions", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with open(os.path.join(REPO_PRESETS, "Code.preset.json"), "r") as file:
+        preset_data = json.load(file)
+    full_bytes = len(json.dumps(preset_data, separators=(",", ":")))
+
+    root = tempfile.mkdtemp(prefix="bench_history_")
+    try:
+        history = PresetHistory(root, max_revisions=None)
+        start = time.perf_counter()
+        for _ in range(args.revisions):
+            section, key, value = random.choice(EDITS)
+            preset_data[section][key] = value()
+            history.record("Code", preset_data)
+        record_time = time.perf_counter() - start
+        stats = history.stats("Code")
+        print(f"{stats['revisions']} revisions, {stats['snapshots']} snapshots: {stats['bytes'] / 1024:.1f} KiB "
+              f"(full copies would be {full_bytes * stats['revisions'] / 1024:.1f} KiB), "
+              f"{record_time / args.revisions * 1e6:.0f} us per record")
+
+        history = PresetHistory(root, max_revisions=None)
+        revisions = [random.randint(1, stats["revisions"]) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for rev in revisions:
+            history.get("Code", rev)
+        lookup_time = time.perf_counter() - start
+        print(f"random revision lookup: {lookup_time / args.lookups * 1e6:.0f} us")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
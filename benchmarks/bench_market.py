@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import multiprocessing
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preset_market
+from preset_market import MARKET_API, MarketplaceClient, RegistryServer, format_stats
+from preset_writer import DEFAULT_PRESET
+
+
+def serve(registry_dir, latency, ready):
+    # Runs in its own process so the server doesn't share the client's GIL.
+    class DelayedHandler(preset_market._RegistryHandler):
+        # Adds a fixed round-trip delay, as for a registry across a network.
+        def do_GET(self):
+            time.sleep(latency)
+            super().do_GET()
+    server = RegistryServer(registry_dir, port=0)
+    server.RequestHandlerClass = DelayedHandler
+    ready.put(server.url)
+    server.serve_forever()
+
+
+def browse_uncached(base_url, per_page):
+    # Baseline: one request after another, a new connection each time, no cache.
+    def get(path):
+        with urllib.request.urlopen(base_url + path) as response:
+            return response.read()
+    entries = []
+    page, pages = 1, 1
+    while page <= pages:
+        listing = json.loads(get(f"{MARKET_API}/presets?page={page}&per_page={per_page}"))
+        entries.extend(listing["presets"])
+        pages = listing["pages"]
+        page += 1
+    return {entry["name"]: json.loads(get(f"{MARKET_API}/presets/{urllib.parse.quote(entry['name'], safe='')}"))
+            for entry in entries}
+
+
+def browse(base_url, cache_dir, revalidate=False, cache_bytes=64 * 1024 * 1024):
+    client = MarketplaceClient(base_url, cache_dir, cache_bytes)
+    start = time.perf_counter()
+    presets, failures = client.fetch_presets(client.listing(revalidate=revalidate))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return presets, failures, elapsed, client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time browsing a preset registry with and without the HTTP cache.")
+    parser.add_argument("--presets", type=int, default=5000)
+    parser.add_argument("--per-page", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="delay the server adds to every request")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_market_")
+    try:
+        registry_dir = os.path.join(root, "registry")
+        os.makedirs(registry_dir)
+        for index in range(args.presets):
+            preset_data = json.loads(json.dumps(DEFAULT_PRESET))
+            preset_data["name"] = f"model{index} Preset"
+            preset_data["load_params"]["n_ctx"] = 2048 << (index % 3)
+            with open(os.path.join(registry_dir, f"model{index}.preset.json"), "w") as file:
+                json.dump(preset_data, file, indent=2)
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(registry_dir, args.latency_ms / 1000, ready), daemon=True)
+        server.start()
+        url = ready.get()
+        cache_dir = os.path.join(root, "cache")
+
+        start = time.perf_counter()
+        presets = browse_uncached(url, args.per_page)
+        print(f"uncached, sequential: {len(presets)} presets in {time.perf_counter() - start:.2f} s")
+
+        for label, revalidate in (("cold cache", False), ("repeat visit", False), ("repeat, revalidated", True)):
+            presets, failures, elapsed, client = browse(url, cache_dir, revalidate)
+            print(f"{label}: {len(presets)} presets in {elapsed:.2f} s; {format_stats(client)}")
+
+        # One preset changes: only it and the listing pages are downloaded again.
+        changed_file = os.path.join(registry_dir, "model7.preset.json")
+        with open(changed_file, "r") as file:
+            preset_data = json.load(file)
+        preset_data["notes"] = "updated"
+        with open(changed_file, "w") as file:
+            json.dump(preset_data, file, indent=2)
+        time.sleep(2.1)
+        presets, failures, elapsed, client = browse(url, cache_dir, True)
+        print(f"one preset changed: {len(presets)} presets in {elapsed:.2f} s; {format_stats(client)}")
+
+        server.terminate()
+        server.join()
+        presets, failures, elapsed, client = browse(url, cache_dir)
+        print(f"offline: {len(presets)} presets in {elapsed:.2f} s; {format_stats(client)}")
+
+        cache_bytes = 1024 * 1024
+        client = MarketplaceClient(url, cache_dir, cache_bytes)
+        client.close()
+        print(f"cache capped at {cache_bytes // 1024} KiB: {len(client.cache)} responses, "
+              f"{client.cache.bytes // 1024} KiB kept")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
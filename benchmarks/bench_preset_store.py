@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_store import PresetStore
+from preset_writer import write_presets
+
+REPO_PRESETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config-presets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the flat preset layout with the deduplicated store.")
+    parser.add_argument("--presets", type=int, default=5000, help="synthetic default presets to add")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_store_")
+    try:
+        flat_dir = os.path.join(root, "flat")
+        shutil.copytree(REPO_PRESETS, flat_dir)
+        write_presets({os.path.join(flat_dir, f"family{i}.preset.json"): f"family{i} Preset"
+                       for i in range(args.presets)})
+
+        store = PresetStore(os.path.join(root, "store"))
+        start = time.perf_counter()
+        packed, skipped = store.pack_directory(flat_dir)
+        pack_time = time.perf_counter() - start
+        stats = store.stats(flat_dir)
+        print(f"packed {packed} presets ({len(skipped)} unreadable) into {stats['objects']} bodies "
+              f"in {pack_time * 1000:.0f} ms")
+        print(f"flat layout  {stats['flat_bytes'] / 1024:10.1f} KiB")
+        print(f"dedup store  {stats['store_bytes'] / 1024:10.1f} KiB  "
+              f"(saved {stats['saved_bytes'] / 1024:.1f} KiB, {stats['saved_bytes'] / stats['flat_bytes']:.0%})")
+
+        names = store.names()
+        sample = [names[i * 7919 % len(names)] for i in range(args.lookups)]
+        start = time.perf_counter()
+        for name in sample:
+            with open(os.path.join(flat_dir, f"{name}.preset.json"), "r") as file:
+                json.load(file)
+        flat_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for name in sample:
+            store.get(name)
+        store_time = time.perf_counter() - start
+        print(f"lookup latency: flat {flat_time / args.lookups * 1e6:.1f} us, "
+              f"store {store_time / args.lookups * 1e6:.1f} us")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_writer import DEFAULT_PRESET, write_presets
+
+
+def write_one_by_one(directory, count, fsync):
+    for i in range(count):
+        preset = json.loads(json.dumps(DEFAULT_PRESET))
+        preset["name"] = f"family{i} Preset"
+        with open(os.path.join(directory, f"family{i}.preset.json"), "w") as file:
+            json.dump(preset, file, indent=2)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-file preset writes with the batched writer.")
+    parser.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+
+    runs = [
+        ("one by one, no fsync", lambda d: write_one_by_one(d, args.count, False)),
+        ("one by one, fsync each", lambda d: write_one_by_one(d, args.count, True)),
+        ("batched atomic writer", lambda d: write_presets(
+            {os.path.join(d, f"family{i}.preset.json"): f"family{i} Preset" for i in range(args.count)})),
+    ]
+    for label, run in runs:
+        directory = tempfile.mkdtemp(prefix="bench_presets_")
+        try:
+            start = time.perf_counter()
+            run(directory)
+            elapsed = time.perf_counter() - start
+            assert len(os.listdir(directory)) == args.count
+            print(f"{label:<26}{elapsed * 1000:10.1f} ms for {args.count} presets")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preset_recommend
+from preset_recommend import PresetRecommender, preset_features
+from preset_writer import DEFAULT_PRESET
+from preset_compat import GIB
+
+FAMILIES = ["llama", "mistral", "qwen", "gemma", "phi", "mixtral", "zephyr", "falcon", "yi", "deepseek"]
+QUANTS = ["Q4_K_M", "Q5_K_M", "Q8_0", "Q3_K_M", "F16"]
+
+
+def random_preset(rng):
+    preset_data = json.loads(json.dumps(DEFAULT_PRESET))
+    preset_data["load_params"]["n_ctx"] = rng.choice([2048, 4096, 8192, 32768])
+    preset_data["load_params"]["n_gpu_layers"] = rng.randint(0, 40)
+    preset_data["inference_params"]["temp"] = round(rng.uniform(0.1, 1.2), 2)
+    preset_data["inference_params"]["n_threads"] = rng.choice([4, 8, 16])
+    return preset_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time preset recommendations on a large synthetic catalog.")
+    parser.add_argument("--presets", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--files", type=int, default=5000, help="preset files for the incremental sync timing")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    rows = []
+    for i in range(args.presets):
+        family = rng.choice(FAMILIES)
+        metadata = {"quantization": rng.choice(QUANTS)}
+        rows.append((f"{family}{i}", preset_features(random_preset(rng), family, rng.uniform(1, 40) * GIB, metadata)))
+    for use_numpy in (True, False):
+        if not use_numpy:
+            preset_recommend.np = None
+        elif preset_recommend.np is None:
+            continue
+        recommender = PresetRecommender()
+        start = time.perf_counter()
+        for name, vector in rows:
+            recommender.update(name, vector)
+        build = time.perf_counter() - start
+        queries = args.queries if use_numpy else max(args.queries // 20, 1)
+        start = time.perf_counter()
+        for _ in range(queries):
+            recommender.recommend_for_model(rng.choice(FAMILIES), rng.uniform(1, 40) * GIB,
+                                            {"quantization": rng.choice(QUANTS)}, k=5)
+        query = (time.perf_counter() - start) / queries
+        print(f"{'numpy' if use_numpy else 'pure python'}: indexed {args.presets} presets in {build * 1000:.0f} ms, "
+              f"top-5 query {query * 1000:.2f} ms")
+
+    root = tempfile.mkdtemp(prefix="bench_recommend_")
+    try:
+        database = {"presets": {}, "models": []}
+        for i in range(args.files):
+            path = os.path.join(root, f"preset{i}.preset.json")
+            with open(path, "w") as file:
+                json.dump(random_preset(rng), file)
+            database["presets"][f"preset{i}"] = path
+
+        def load(path):
+            with open(path, "r") as file:
+                return json.load(file)
+        recommender = PresetRecommender()
+        for label in ("first sync", "unchanged rescan"):
+            start = time.perf_counter()
+            updated = recommender.sync(database, load)
+            print(f"{label}: {updated} of {args.files} presets recomputed in {(time.perf_counter() - start) * 1000:.0f} ms")
+        for i in range(10):
+            with open(database["presets"][f"preset{i}"], "w") as file:
+                json.dump(random_preset(rng), file)
+        start = time.perf_counter()
+        updated = recommender.sync(database, load)
+        print(f"after editing 10: {updated} presets recomputed in {(time.perf_counter() - start) * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_scanner import scan_directory
+
+
+def build_tree(root, total_files, files_per_dir, gguf_every):
+    created = 0
+    dir_index = 0
+    while created < total_files:
+        path = os.path.join(root, f"vendor{dir_index % 50}", f"model{dir_index}")
+        os.makedirs(path, exist_ok=True)
+        for i in range(min(files_per_dir, total_files - created)):
+            name = f"part{i}.gguf" if created % gguf_every == 0 else f"blob{i}.bin"
+            with open(os.path.join(path, name), "wb") as file:
+                file.write(b"x")
+            created += 1
+        dir_index += 1
+
+
+def full_walk(directory):
+    gguf_files = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".gguf"):
+                gguf_files.append(os.path.join(root, file))
+    return gguf_files
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and incremental model directory scans.")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--gguf-every", type=int, default=20)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_scan_")
+    try:
+        print(f"Building synthetic tree with {args.files} files in {root}")
+        build_tree(root, args.files, args.files_per_dir, args.gguf_every)
+        # Let directory mtimes age past the racy window so the warm scan can trust them.
+        time.sleep(2.5)
+
+        walked = timed("os.walk full scan", lambda: full_walk(root))
+        cache = {"version": 1, "roots": {}}
+        cold = timed("incremental cold scan", lambda: scan_directory(root, cache))
+        warm = timed("incremental warm rescan", lambda: scan_directory(root, cache))
+        assert sorted(walked) == sorted(cold.files) == sorted(warm.files)
+
+        new_dir = os.path.join(root, "vendor0", "fresh")
+        os.makedirs(new_dir)
+        with open(os.path.join(new_dir, "fresh-Q4_K_M.gguf"), "wb") as file:
+            file.write(b"x")
+        changed = timed("rescan after one add", lambda: scan_directory(root, cache))
+        print(f"{len(warm.files)} .gguf files; warm rescan reported "
+              f"{len(warm.added)} added / {len(warm.removed)} removed / {len(warm.modified)} modified; "
+              f"after add: {len(changed.added)} added")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_scheduler import FakeRunner, Scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scheduled runs with and without the warm pool and batching.")
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--load-ms", type=float, default=200, help="simulated model load time")
+    parser.add_argument("--run-ms", type=float, default=10, help="simulated time per prompt")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    def resolve(name):
+        model = f"model{int(name[6:]) % args.models}"
+        return {"name": name, "load_params": {}, "inference_params": {}}, model, model
+
+    root = tempfile.mkdtemp(prefix="bench_scheduler_")
+    try:
+        # Cold: every job loads its model and unloads it afterwards, one job at a time per worker.
+        cold = FakeRunner(args.load_ms / 1000, args.run_ms / 1000)
+        start = time.perf_counter()
+        for index in range(args.jobs):
+            preset_data, key, model_path = resolve(f"preset{index}")
+            handle = cold.load(key, model_path, preset_data)
+            cold.run(handle, preset_data, "ping")
+            cold.unload(handle)
+        cold_seconds = (time.perf_counter() - start) / args.workers
+        print(f"cold: {cold.loads} loads, ~{cold_seconds:.2f} s with {args.workers} workers")
+
+        for pool_size in (0, args.models // 2, args.models):
+            runner = FakeRunner(args.load_ms / 1000, args.run_ms / 1000)
+            now = [1000.0]
+            scheduler = Scheduler(runner, resolve, os.path.join(root, f"schedule{pool_size}.json"),
+                                  os.path.join(root, "results.jsonl"), args.workers, pool_size, clock=lambda: now[0])
+            for index in range(args.jobs):
+                scheduler.add_job(f"preset{index}", "every 60s")
+            for _ in range(3):
+                now[0] += 60
+                start = time.perf_counter()
+                scheduler.run_pending()
+                elapsed = time.perf_counter() - start
+            scheduler.stop()
+            print(f"batched, warm pool of {pool_size}: {runner.loads} loads over 3 rounds, "
+                  f"last round {elapsed:.2f} s ({scheduler.pool.hits} pool hits)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Roughly what launching the GUI script cost before the headless split: every
+# run imported tkinter and GitPython and created the Tk window.
+GUI_STARTUP = """
+import tkinter
+try:
+    import git
+except ImportError:
+    pass
+import LM_Preset_Manager
+root = tkinter.Tk()
+root.update()
+root.destroy()
+"""
+
+
+def best_of(command, runs, cwd):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+    return min(timings), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold start of the CLI with the GUI script.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        models = os.path.join(work, "models")
+        os.makedirs(os.path.join(models, "vendor"))
+        for i in range(50):
+            open(os.path.join(models, "vendor", f"family{i}-7B-Q4_K_M.gguf"), "wb").close()
+        gui = [sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); exec({GUI_STARTUP!r})"]
+        # Without a display the window can't be created; the imports alone are a lower bound.
+        gui_imports = [sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); "
+                                             f"import tkinter, LM_Preset_Manager"]
+        cli = [sys.executable, os.path.join(ROOT, "preset_cli.py"), "scan", models, "--dry-run",
+               "--presets-dir", os.path.join(work, "presets")]
+        bare = [sys.executable, "-c", "pass"]
+
+        for label, command in (("python -c pass", bare), ("cli scan --dry-run", cli),
+                               ("gui imports only", gui_imports), ("gui startup", gui)):
+            elapsed, error = best_of(command, args.runs, work)
+            if elapsed is None:
+                print(f"{label:<22}  not measured ({error})")
+            else:
+                print(f"{label:<22}{elapsed * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
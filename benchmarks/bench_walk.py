@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_scanner import walk_model_files
+
+
+def build_tree(root, dirs, files_per_dir):
+    for d in range(dirs):
+        path = os.path.join(root, f"vendor{d % 20}", f"model{d}")
+        os.makedirs(path, exist_ok=True)
+        for i in range(files_per_dir):
+            with open(os.path.join(path, f"model{d}-part{i}.gguf"), "wb") as file:
+                file.write(b"x")
+    os.makedirs(os.path.join(root, ".git", "objects"))
+    os.makedirs(os.path.join(root, "blobs", "partial"))
+
+
+def slow_scandir(latency):
+    # Stand-in for a network mount: every directory listing pays a fixed round trip.
+    def scandir(path):
+        time.sleep(latency)
+        return os.scandir(path)
+    return scandir
+
+
+def serial_walk(directory, latency):
+    gguf_files = []
+    for root, dirs, files in os.walk(directory):
+        time.sleep(latency)
+        for file in files:
+            if file.endswith(".gguf"):
+                gguf_files.append(os.path.join(root, file))
+    return gguf_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial os.walk against the parallel scandir walker.")
+    parser.add_argument("--dirs", type=int, default=400)
+    parser.add_argument("--files-per-dir", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    root = tempfile.mkdtemp(prefix="bench_walk_")
+    try:
+        build_tree(root, args.dirs, args.files_per_dir)
+        start = time.perf_counter()
+        expected = serial_walk(root, latency)
+        baseline = time.perf_counter() - start
+        print(f"{'serial os.walk':<26}{baseline * 1000:10.1f} ms")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            first = None
+            found = []
+            for path in walk_model_files(root, max_workers=workers, scandir=slow_scandir(latency)):
+                if first is None:
+                    first = time.perf_counter() - start
+                found.append(path)
+            elapsed = time.perf_counter() - start
+            assert sorted(found) == sorted(expected)
+            print(f"{f'parallel, {workers} workers':<26}{elapsed * 1000:10.1f} ms  "
+                  f"(first result after {first * 1000:.1f} ms, {baseline / elapsed:.1f}x)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_watcher import CatalogWatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure change-to-callback latency of the catalog watcher.")
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--debounce", type=float, default=0.2)
+    parser.add_argument("--polling", action="store_true", help="force the polling fallback")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_watch_")
+    try:
+        models = os.path.join(root, "models")
+        presets = os.path.join(root, "presets")
+        for i in range(200):
+            os.makedirs(os.path.join(models, f"vendor{i}"))
+        os.makedirs(presets)
+        batches = queue.Queue()
+        watcher = CatalogWatcher([models], presets, batches.put, debounce=args.debounce,
+                                 poll_interval=args.poll_interval, native=not args.polling)
+        watcher.start()
+        time.sleep(0.5)
+        for i in range(args.changes):
+            with open(os.path.join(models, f"vendor{i % 200}", f"family{i}-7B-Q4_K_M.gguf"), "wb") as file:
+                file.write(b"x")
+            received = 0
+            while received < 1:
+                events = batches.get(timeout=10)
+                watcher.record_applied(events)
+                received += len(events)
+            time.sleep(0.05)
+        watcher.stop()
+        report = watcher.latency_report()
+        print(f"mode={report['mode']} events={report['events']} p50={report['p50_ms']:.0f} ms "
+              f"p95={report['p95_ms']:.0f} ms max={report['max_ms']:.0f} ms "
+              f"(debounce {args.debounce * 1000:.0f} ms, poll interval {args.poll_interval * 1000:.0f} ms)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import os
+import mmap
+import struct
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor
+
+GGUF_MAGIC = b"GGUF"
+# Used when the file cannot be memory-mapped; the metadata section of real
+# models (vocabulary included) fits well inside this.
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+# Upper bound for the context length written into a generated preset.
+PRESET_MAX_CONTEXT = 4096
+# Header reads running at once when filling the metadata cache.
+METADATA_WORKERS = 8
+
+# GGUF value types: fixed-size ones map to their struct format.
+_SCALAR_FORMATS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+_STRING = 8
+_ARRAY = 9
+
+# llama.cpp's LLAMA_FTYPE values for general.file_type.
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1", 10: "Q2_K", 11: "Q3_K_S",
+    12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K",
+    19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL",
+    26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+# Keys read as-is, and per-architecture keys ("<arch>.<suffix>") read for
+# whatever architecture the file declares.
+GENERAL_KEYS = {
+    "general.architecture": "architecture",
+    "general.name": "name",
+    "general.file_type": "file_type",
+    "tokenizer.chat_template": "chat_template",
+}
+ARCHITECTURE_KEYS = {
+    "context_length": "context_length",
+    "block_count": "block_count",
+    "embedding_length": "embedding_length",
+    "feed_forward_length": "feed_forward_length",
+    "attention.head_count": "head_count",
+    "attention.head_count_kv": "head_count_kv",
+    "attention.key_length": "key_length",
+    "attention.value_length": "value_length",
+}
+VOCABULARY_KEY = "tokenizer.ggml.tokens"
+
+# Chat template markers and the LM Studio prompt fields they imply, checked
+# in order. Templates that match none keep the default Alpaca format.
+PROMPT_FORMATS = [
+    ("<|start_header_id|>", {
+        "input_prefix": "<|start_header_id|>user<|end_header_id|>\n\n",
+        "input_suffix": "<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n",
+        "antiprompt": ["<|eot_id|>", "<|start_header_id|>"],
+    }),
+    ("<|im_start|>", {
+        "input_prefix": "<|im_end|>\n<|im_start|>user\n",
+        "input_suffix": "<|im_end|>\n<|im_start|>assistant\n",
+        "antiprompt": ["<|im_start|>", "<|im_end|>"],
+    }),
+    ("<start_of_turn>", {
+        "input_prefix": "<start_of_turn>user\n",
+        "input_suffix": "<end_of_turn>\n<start_of_turn>model\n",
+        "antiprompt": ["<start_of_turn>user", "<end_of_turn>"],
+    }),
+    ("[INST]", {
+        "input_prefix": "[INST] ",
+        "input_suffix": " [/INST]",
+        "antiprompt": ["[INST]"],
+    }),
+]
+
+
+class GGUFError(ValueError):
+    pass
+
+
+class _Reader:
+    # Walks the metadata section of a buffer (an mmap or bytes) by offset.
+
+    def __init__(self, buffer, offset, count_format):
+        self.buffer = buffer
+        self.offset = offset
+        self.count_format = count_format
+
+    def unpack(self, fmt):
+        try:
+            (value,) = struct.unpack_from(fmt, self.buffer, self.offset)
+        except struct.error:
+            raise GGUFError("Truncated GGUF header.")
+        self.offset += struct.calcsize(fmt)
+        return value
+
+    def string(self):
+        length = self.unpack(self.count_format)
+        end = self.offset + length
+        if end > len(self.buffer):
+            raise GGUFError("Truncated GGUF header.")
+        value = self.buffer[self.offset:end]
+        self.offset = end
+        return value.decode("utf-8", errors="replace")
+
+    def skip_strings(self, count):
+        # The vocabulary arrays hold 100k+ strings; step over them using only
+        # their length prefixes.
+        buffer = self.buffer
+        offset = self.offset
+        length = struct.Struct(self.count_format)
+        unpack_from = length.unpack_from
+        count_size = length.size
+        try:
+            for _ in repeat(None, count):
+                offset += count_size + unpack_from(buffer, offset)[0]
+        except struct.error:
+            raise GGUFError("Truncated GGUF header.")
+        if offset > len(buffer):
+            raise GGUFError("Truncated GGUF header.")
+        self.offset = offset
+
+    def value(self, value_type, keep=True):
+        if value_type in _SCALAR_FORMATS:
+            return self.unpack(_SCALAR_FORMATS[value_type])
+        if value_type == _STRING:
+            if keep:
+                return self.string()
+            self.skip_strings(1)
+            return None
+        if value_type == _ARRAY:
+            item_type = self.unpack("<I")
+            count = self.unpack(self.count_format)
+            if keep:
+                return [self.value(item_type) for _ in range(count)]
+            if item_type in _SCALAR_FORMATS:
+                self.offset += count * struct.calcsize(_SCALAR_FORMATS[item_type])
+            elif item_type == _STRING:
+                self.skip_strings(count)
+            else:
+                for _ in range(count):
+                    self.value(item_type, keep=False)
+            # Unread arrays are reported by length, e.g. the vocabulary size.
+            return count
+        raise GGUFError(f"Unknown GGUF value type {value_type}.")
+
+
+def _parse(buffer):
+    if len(buffer) < 24 or buffer[:4] != GGUF_MAGIC:
+        raise GGUFError("Not a GGUF file.")
+    (version,) = struct.unpack_from("<I", buffer, 4)
+    if version not in (1, 2, 3):
+        raise GGUFError(f"Unsupported GGUF version {version}.")
+    # Version 1 used 32-bit counts and string lengths.
+    reader = _Reader(buffer, 8, "<I" if version == 1 else "<Q")
+    tensor_count = reader.unpack(reader.count_format)
+    kv_count = reader.unpack(reader.count_format)
+
+    raw = {}
+    for _ in range(kv_count):
+        key = reader.string()
+        value_type = reader.unpack("<I")
+        wanted = key in GENERAL_KEYS or key.split(".", 1)[-1] in ARCHITECTURE_KEYS
+        value = reader.value(value_type, keep=wanted)
+        if wanted or key == VOCABULARY_KEY:
+            raw[key] = value
+
+    metadata = {"version": version, "tensor_count": tensor_count}
+    for key, field in GENERAL_KEYS.items():
+        if key in raw:
+            metadata[field] = raw[key]
+    architecture = metadata.get("architecture")
+    for suffix, field in ARCHITECTURE_KEYS.items():
+        value = raw.get(f"{architecture}.{suffix}")
+        if isinstance(value, list):
+            # Some architectures give head counts per layer.
+            value = max(value) if value else None
+        if value is not None:
+            metadata[field] = value
+    if VOCABULARY_KEY in raw:
+        metadata["vocab_size"] = raw[VOCABULARY_KEY]
+    if "file_type" in metadata:
+        metadata["quantization"] = FILE_TYPES.get(metadata["file_type"], f"type {metadata['file_type']}")
+    return metadata
+
+
+def read_gguf_metadata(path):
+    # Reads only the key/value section at the start of the file; tensor data
+    # is never touched. Raises GGUFError for files that are not valid GGUF.
+    with open(path, "rb") as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and file systems without mmap support.
+            buffer = file.read(MAX_HEADER_BYTES)
+        try:
+            return _parse(buffer)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+
+def _cacheable(metadata):
+    # Chat templates run to kilobytes per model and would bloat the catalog;
+    # only the marker preset_overrides looks for is kept.
+    chat_template = metadata.get("chat_template") if metadata else None
+    if not chat_template:
+        return metadata
+    marker = next((marker for marker, _ in PROMPT_FORMATS if marker in chat_template), "")
+    return dict(metadata, chat_template=marker)
+
+
+def _lookup(cache, path):
+    # (entry, stored) for path, where entry is the cache entry that is current
+    # and stored tells whether the cache already holds it; entry is None for a
+    # missing file. Reads only; the caller updates the cache.
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None, True
+    entry = cache.get(path)
+    if entry is not None and entry[0] == stat_result.st_size and entry[1] == stat_result.st_mtime_ns:
+        return entry, True
+    try:
+        metadata = _cacheable(read_gguf_metadata(path))
+    except (OSError, GGUFError):
+        metadata = None
+    return [stat_result.st_size, stat_result.st_mtime_ns, metadata], False
+
+
+def cached_metadata(cache, path):
+    # cache maps path -> [size, mtime_ns, metadata] and lives in the catalog
+    # (database["gguf_metadata"]). Unreadable or invalid files cache None.
+    entry, stored = _lookup(cache, path)
+    if entry is None:
+        return None
+    if not stored:
+        cache[path] = entry
+    return entry[2]
+
+
+def cached_metadata_many(cache, paths, workers=METADATA_WORKERS):
+    # cached_metadata for many files, with uncached headers read in parallel.
+    # The cache is only updated on the calling thread. Returns {path: metadata}.
+    paths = list(paths)
+    if len(paths) <= 1 or workers <= 1:
+        return {path: cached_metadata(cache, path) for path in paths}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        for path, (entry, stored) in zip(paths, executor.map(lambda path: _lookup(cache, path), paths)):
+            if entry is not None and not stored:
+                cache[path] = entry
+            results[path] = entry[2] if entry is not None else None
+    return results
+
+
+def preset_overrides(metadata):
+    # Preset fields derived from model metadata, as {section: {field: value}}
+    # to be laid over the default preset.
+    load_params = {}
+    inference_params = {}
+    if metadata.get("context_length"):
+        load_params["n_ctx"] = min(metadata["context_length"], PRESET_MAX_CONTEXT)
+    chat_template = metadata.get("chat_template") or ""
+    for marker, prompt_format in PROMPT_FORMATS:
+        if marker in chat_template:
+            inference_params.update(prompt_format)
+            break
+    overrides = {}
+    if load_params:
+        overrides["load_params"] = load_params
+    if inference_params:
+        overrides["inference_params"] = inference_params
+    return overrides
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import fnmatch
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+SCAN_CACHE_FILE = "scan_cache.json"
+MODEL_EXTENSION = ".gguf"
+
+# Directories whose mtime is this close to the scan time are listed again on
+# the next run, since a change in the same timestamp tick would go unnoticed.
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+DEFAULT_WALK_WORKERS = 8
+DEFAULT_EXCLUDE = (".git", "blobs/partial")
+
+ScanResult = namedtuple("ScanResult", ["files", "added", "removed", "modified"])
+
+
+def load_scan_cache(cache_file=SCAN_CACHE_FILE):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as file:
+                cache = json.load(file)
+            if isinstance(cache.get("roots"), dict):
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {"version": 1, "roots": {}}
+
+
+def save_scan_cache(cache, cache_file=SCAN_CACHE_FILE):
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(cache, file, separators=(",", ":"))
+    os.replace(temp_file, cache_file)
+
+
+def _file_signature(stat_result):
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+
+def _list_directory(path, extension):
+    files = {}
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.endswith(extension) and entry.is_file():
+                    files[entry.name] = _file_signature(entry.stat())
+            except OSError:
+                continue
+    return files, subdirs
+
+
+def _is_excluded(relative_path, exclude):
+    if not exclude:
+        return False
+    relative_path = relative_path.replace(os.sep, "/")
+    name = relative_path.rsplit("/", 1)[-1]
+    for pattern in exclude:
+        if (fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern)
+                or fnmatch.fnmatch(relative_path, f"*/{pattern}")):
+            return True
+    return False
+
+
+def _restat_files(path, known_files):
+    files = {}
+    for name in known_files:
+        try:
+            files[name] = _file_signature(os.stat(os.path.join(path, name)))
+        except OSError:
+            continue
+    return files
+
+
+def scan_directory(directory, cache=None, incremental=True, max_depth=None, exclude=(), task=None,
+                   extension=MODEL_EXTENSION):
+    root = os.path.abspath(directory)
+    if cache is None:
+        cache = {"version": 1, "roots": {}}
+    old_dirs = cache["roots"].get(root, {}) if incremental else {}
+    new_dirs = {}
+    scan_started_ns = time.time_ns()
+
+    stack = [(root, 0)]
+    while stack:
+        if task is not None:
+            task.check()
+            if len(new_dirs) % 500 == 0:
+                task.report(directories_scanned=len(new_dirs))
+        path, depth = stack.pop()
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        cached = old_dirs.get(path)
+        if cached is not None and cached["mtime"] == dir_mtime:
+            # The listing is unchanged, so only the known model files need a
+            # stat to pick up in-place modifications.
+            files = _restat_files(path, cached["files"])
+            subdirs = cached["subdirs"]
+        else:
+            try:
+                files, subdirs = _list_directory(path, extension)
+            except OSError:
+                continue
+        if scan_started_ns - dir_mtime < RACY_MTIME_WINDOW_NS:
+            dir_mtime = None
+        new_dirs[path] = {"mtime": dir_mtime, "files": files, "subdirs": subdirs}
+        if max_depth is None or depth < max_depth:
+            for name in subdirs:
+                subdir = os.path.join(path, name)
+                if not (exclude and _is_excluded(os.path.relpath(subdir, root), exclude)):
+                    stack.append((subdir, depth + 1))
+
+    old_files = {}
+    for path, entry in old_dirs.items():
+        for name, signature in entry["files"].items():
+            file_path = os.path.join(path, name)
+            if not (exclude and _is_excluded(os.path.relpath(file_path, root), exclude)):
+                old_files[file_path] = signature
+
+    gguf_files = []
+    added = []
+    modified = []
+    for path, entry in new_dirs.items():
+        for name, signature in entry["files"].items():
+            file_path = os.path.join(path, name)
+            if exclude and _is_excluded(os.path.relpath(file_path, root), exclude):
+                continue
+            gguf_files.append(file_path)
+            previous = old_files.pop(file_path, None)
+            if previous is None:
+                added.append(file_path)
+            elif previous != signature:
+                modified.append(file_path)
+    removed = list(old_files)
+
+    cache["roots"][root] = new_dirs
+    return ScanResult(gguf_files, added, removed, modified)
+
+
+def _scan_one(path, depth, scandir):
+    files = []
+    subdirs = []
+    try:
+        with scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.endswith(MODEL_EXTENSION) and entry.is_file():
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return depth, files, subdirs
+
+
+def walk_model_files(directory, max_workers=DEFAULT_WALK_WORKERS, max_depth=None, exclude=DEFAULT_EXCLUDE,
+                     scandir=os.scandir):
+    # Directory listings run concurrently on a bounded pool and model files
+    # are yielded as soon as their directory has been listed.
+    root = os.path.abspath(directory)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_one, root, 0, scandir)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth, files, subdirs = future.result()
+                    if max_depth is None or depth < max_depth:
+                        for subdir in subdirs:
+                            if not (exclude and _is_excluded(os.path.relpath(subdir, root), exclude)):
+                                pending.add(executor.submit(_scan_one, subdir, depth + 1, scandir))
+                    for file_path in files:
+                        if not (exclude and _is_excluded(os.path.relpath(file_path, root), exclude)):
+                            yield file_path
+        finally:
+            for future in pending:
+                future.cancel()
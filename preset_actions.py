@@ -0,0 +1,289 @@
+import os
+import json
+
+from gguf_metadata import cached_metadata, cached_metadata_many, preset_overrides
+from model_scanner import DEFAULT_EXCLUDE, load_scan_cache, save_scan_cache, scan_directory, walk_model_files
+from preset_db import MODEL_LIST_FILE, load_database, save_changes, update_database, unused_presets
+from preset_db import backup_database, backup_model_list
+from preset_writer import PresetBatchWriter, write_presets
+from preset_batch import apply_patch
+
+PROGRESS_EVERY = 100
+PRESET_EXTENSION = ".preset.json"
+
+# Catalog operations shared by the GUI scripts. Each takes a task (see
+# task_runner.Task) as its first argument, or None when run synchronously,
+# and never touches Tk so it can run on a worker thread. Each works on its
+# own copy of the catalog and saves it with save_changes, so operations
+# running at the same time keep each other's changes.
+
+
+def scan_models(task, directory, presets_dir, incremental=True, workers=8, max_depth=None, exclude=DEFAULT_EXCLUDE,
+                dry_run=False):
+    # With dry_run nothing is written: not presets, the catalog or the scan cache.
+    database = load_database()
+    # Header metadata of each model, keyed by path and checked against size and mtime.
+    metadata_cache = database.setdefault("gguf_metadata", {})
+    if incremental:
+        scan_cache = load_scan_cache()
+        scan_result = scan_directory(directory, scan_cache, max_depth=max_depth, exclude=exclude, task=task)
+        if not dry_run:
+            save_scan_cache(scan_cache)
+        gguf_files = scan_result.files
+    else:
+        # Stream files from the parallel walker so presets are created while the walk is still running.
+        scan_result = None
+        gguf_files = walk_model_files(directory, workers, max_depth, exclude)
+
+    files_found = 0
+    new_models = []
+    cancelled = False
+    preset_writer = PresetBatchWriter()
+    planned_presets = set()
+    # Every model's header is cached for the compatibility check, tuner and
+    # recommender; headers are read a batch at a time on `workers` threads.
+    # New presets, by model type, wait for the batch holding the model whose
+    # header supplies their settings.
+    unread = []
+    new_presets = {}
+    walked = set()
+
+    def write_unread():
+        metadata = cached_metadata_many(metadata_cache, unread, workers)
+        for model_type, (preset_file, file) in new_presets.items():
+            overrides = preset_overrides(metadata[file]) if metadata[file] else None
+            preset_writer.add(model_type, preset_file, overrides)
+        unread.clear()
+        new_presets.clear()
+
+    for file in gguf_files:
+        if task is not None:
+            if task.cancelled:
+                # Keep what has been found so far; the catalog stays consistent.
+                cancelled = True
+                break
+            if files_found % PROGRESS_EVERY == 0:
+                task.report(files_scanned=files_found, presets_written=len(preset_writer.written))
+        files_found += 1
+        if scan_result is None:
+            walked.add(file)
+        if not dry_run:
+            unread.append(file)
+        model_name = os.path.splitext(os.path.basename(file))[0]
+        if model_name not in database["models"]:
+            new_models.append(model_name)
+            database["models"].append(model_name)
+            model_type = model_name.split("-")[0]
+            preset_file = os.path.join(presets_dir, f"{model_type}.preset.json")
+            # A dry run counts exactly the presets a real run would write.
+            if model_type not in planned_presets and not os.path.exists(preset_file):
+                planned_presets.add(model_type)
+                new_presets[model_type] = (preset_file, file)
+        if len(unread) >= preset_writer.batch_size:
+            write_unread()
+
+    if dry_run:
+        return {
+            "files_found": files_found,
+            "scan_result": scan_result,
+            "presets_created": len(planned_presets),
+            "new_models": new_models,
+            "cancelled": cancelled,
+            "dry_run": True,
+        }
+
+    write_unread()
+    preset_writer.flush()
+    database["presets"].update(preset_writer.written)
+    if scan_result is not None:
+        for file in scan_result.removed:
+            metadata_cache.pop(file, None)
+    elif not cancelled:
+        # A full walk has no list of removed files: entries under the walked
+        # directory for models that are gone are dropped instead.
+        root = os.path.join(os.path.abspath(directory), "")
+        for path in [path for path in metadata_cache if path.startswith(root) and path not in walked]:
+            if not os.path.exists(path):
+                metadata_cache.pop(path)
+    if task is not None:
+        task.report(files_scanned=files_found, presets_written=len(preset_writer.written))
+
+    database = save_changes(database)
+    backup_database()
+
+    with open(MODEL_LIST_FILE, "w") as file:
+        file.write("\n".join(database["models"]))
+    backup_model_list()
+
+    return {
+        "files_found": files_found,
+        "scan_result": scan_result,
+        "presets_created": len(preset_writer.written),
+        "preset_files": list(preset_writer.written.values()),
+        "new_models": new_models,
+        "cancelled": cancelled,
+    }
+
+
+def scan_summary(summary):
+    scan_result = summary["scan_result"]
+    changes = ""
+    if scan_result is not None:
+        changes = (f"{len(scan_result.added)} added, {len(scan_result.removed)} removed, "
+                   f"{len(scan_result.modified)} modified since last scan.\n")
+    cancelled = "Scan cancelled; results so far were saved.\n" if summary["cancelled"] else ""
+    created = "Would create" if summary.get("dry_run") else "Created"
+    return (f"{cancelled}Found {summary['files_found']} .gguf files.\n"
+            f"{changes}"
+            f"{created} {summary['presets_created']} presets.\n"
+            f"{len(summary['new_models'])} new models found.")
+
+
+def delete_unused(task):
+    database = load_database()
+    unused = unused_presets(database)
+    deleted = 0
+    for model_type in unused:
+        if task is not None:
+            if task.cancelled:
+                break
+            task.report(presets_deleted=deleted, presets_unused=len(unused))
+        preset_file = database["presets"].pop(model_type)
+        if os.path.exists(preset_file):
+            os.remove(preset_file)
+        deleted += 1
+    save_changes(database)
+    return deleted
+
+
+def export_preset_bundle(task, bundle_file, names=None):
+    from preset_bundle import export_bundle
+    from preset_cache import PresetRepository
+
+    return export_bundle(bundle_file, load_database(), PresetRepository().load_shared, names, task=task)
+
+
+def import_preset_bundle(task, bundle_file, presets_dir, on_conflict="skip"):
+    from preset_bundle import import_bundle
+
+    return import_bundle(bundle_file, load_database(), presets_dir, save_changes, on_conflict, task=task)
+
+
+def install_marketplace_presets(task, client, entries, presets_dir, on_conflict="skip"):
+    # entries are listing summaries from preset_market.MarketplaceClient.listing().
+    from preset_bundle import MAX_REPORTED_REJECTS, install_presets
+
+    presets, failures = client.fetch_presets(entries, task)
+    database = load_database()
+    counters = install_presets(presets.items(), database, presets_dir, on_conflict, task)
+    save_changes(database)
+    counters["presets"] += len(failures)
+    counters["rejected"] += len(failures)
+    counters["rejects"] = (counters["rejects"] + [[name, error] for name, error in failures])[:MAX_REPORTED_REJECTS]
+    return counters
+
+
+def import_preset_mapping(task, preset_file):
+    with open(preset_file, "r") as file:
+        presets = json.load(file)
+    database = load_database()
+    database["presets"].update(presets)
+    save_changes(database)
+    return len(presets)
+
+
+def record_revision(history, name, preset_file, repository):
+    # An unchanged preset adds no revision; an unreadable one is skipped.
+    try:
+        history.record(name, repository.load_shared(preset_file))
+    except (OSError, ValueError):
+        pass
+
+
+def patch_preset(history, name, preset_file, fields, repository):
+    # Every in-place edit of one preset goes through here so its history has
+    # the revisions before and after the write. Raises BatchError.
+    record_revision(history, name, preset_file, repository)
+    apply_patch([preset_file], fields, repository=repository)
+    record_revision(history, name, preset_file, repository)
+
+
+def apply_watch_changes(events, presets_dir):
+    # apply_watch_events on the stored catalog, under the catalog write lock.
+    # Returns (catalog, modified_presets); catalog is None when only preset
+    # contents changed and the catalog was left alone.
+    if all(event.kind == "modified" for event in events):
+        return None, [event.path for event in events if event.path.endswith(PRESET_EXTENSION)]
+    def apply(catalog):
+        changed, modified_presets = apply_watch_events(catalog, events, presets_dir)
+        return catalog, modified_presets
+    return update_database(apply)
+
+
+def apply_watch_events(database, events, presets_dir):
+    # Applies a batch of preset_watcher.WatchEvents to the catalog. Returns
+    # (changed, modified_presets) where modified_presets lists preset files
+    # whose contents changed on disk.
+    presets_dir = os.path.abspath(presets_dir)
+    preset_names = {os.path.abspath(path): name for name, path in database["presets"].items()}
+    new_presets = {}
+    new_overrides = {}
+    metadata_cache = database.setdefault("gguf_metadata", {})
+    modified_presets = []
+    changed = False
+
+    def add(path):
+        nonlocal changed
+        file_name = os.path.basename(path)
+        if file_name.endswith(".gguf"):
+            model_name = os.path.splitext(file_name)[0]
+            if model_name not in database["models"]:
+                database["models"].append(model_name)
+                changed = True
+            model_type = model_name.split("-")[0]
+            preset_file = os.path.join(presets_dir, f"{model_type}.preset.json")
+            if model_type not in database["presets"] and not os.path.exists(preset_file):
+                new_presets[preset_file] = model_type
+                metadata = cached_metadata(metadata_cache, path)
+                if metadata:
+                    new_overrides[preset_file] = preset_overrides(metadata)
+        elif file_name.endswith(PRESET_EXTENSION) and os.path.dirname(os.path.abspath(path)) == presets_dir:
+            name = file_name[:-len(PRESET_EXTENSION)]
+            if name not in database["presets"]:
+                database["presets"][name] = path
+                preset_names[os.path.abspath(path)] = name
+                changed = True
+
+    def remove(path):
+        nonlocal changed
+        file_name = os.path.basename(path)
+        if file_name.endswith(".gguf"):
+            model_name = os.path.splitext(file_name)[0]
+            if model_name in database["models"]:
+                database["models"].remove(model_name)
+                changed = True
+            if metadata_cache.pop(path, None) is not None:
+                changed = True
+        elif file_name.endswith(PRESET_EXTENSION):
+            name = preset_names.pop(os.path.abspath(path), None)
+            if name is not None:
+                database["presets"].pop(name, None)
+                changed = True
+
+    for event in events:
+        if event.kind == "created":
+            add(event.path)
+        elif event.kind == "deleted":
+            remove(event.path)
+        elif event.kind == "moved":
+            remove(event.path)
+            add(event.dest_path)
+        elif event.kind == "modified" and event.path.endswith(PRESET_EXTENSION):
+            modified_presets.append(event.path)
+
+    if new_presets:
+        write_presets({path: f"{model_type} Preset" for path, model_type in new_presets.items()}, overrides=new_overrides)
+        for path, model_type in new_presets.items():
+            database["presets"][model_type] = path
+        changed = True
+    return changed, modified_presets
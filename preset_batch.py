@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+JOURNAL_DIR = ".preset-journal"
+BATCH_WORKERS = 8
+
+class BatchError(Exception):
+    pass
+
+
+def _set_field(data, key, value):
+    *parents, leaf = key.split(".")
+    for part in parents:
+        data = data.setdefault(part, {})
+    data[leaf] = value
+
+
+def _unset_field(data, key):
+    *parents, leaf = key.split(".")
+    for part in parents:
+        data = data.get(part)
+        if not isinstance(data, dict):
+            return
+    data.pop(leaf, None)
+
+
+def patch_preset(preset_data, set_fields=None, unset_fields=()):
+    for key, value in (set_fields or {}).items():
+        _set_field(preset_data, key, value)
+    for key in unset_fields:
+        _unset_field(preset_data, key)
+    return preset_data
+
+
+def _write_manifest(journal, state, paths):
+    manifest_file = os.path.join(journal, "manifest.json")
+    with open(f"{manifest_file}.tmp", "w") as file:
+        json.dump({"state": state, "paths": paths}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{manifest_file}.tmp", manifest_file)
+
+
+def _prepare(index, path, journal, set_fields, unset_fields):
+    with open(path, "rb") as file:
+        original = file.read()
+    with open(os.path.join(journal, f"{index}.orig"), "wb") as file:
+        file.write(original)
+        file.flush()
+        os.fsync(file.fileno())
+    preset_data = patch_preset(json.loads(original), set_fields, unset_fields)
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(preset_data, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    return f"{path}.tmp"
+
+
+def _restore(original, path):
+    # Copied next to the preset and renamed there, since the journal may be on
+    # another filesystem or drive. The original stays in the journal, so an
+    # interrupted rollback can simply be run again.
+    with open(original, "rb") as source, open(f"{path}.restore", "wb") as file:
+        shutil.copyfileobj(source, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.restore", path)
+
+
+def _rollback(journal, paths, restore):
+    for index, path in enumerate(paths):
+        if index in restore:
+            _restore(os.path.join(journal, f"{index}.orig"), path)
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+
+
+def apply_patch(paths, set_fields=None, unset_fields=(), repository=None, max_workers=BATCH_WORKERS,
+                journal_dir=JOURNAL_DIR):
+    # Applies the same set/unset patch to every preset file, all or nothing.
+    # Originals are journalled first, patched copies are written next to each
+    # file in parallel, and only then are they renamed into place.
+    paths = [os.path.abspath(path) for path in paths]
+    if not paths:
+        return 0
+    journal = os.path.join(journal_dir, f"{time.time_ns()}-{os.getpid()}")
+    os.makedirs(journal)
+    _write_manifest(journal, "prepared", paths)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_prepare, index, path, journal, set_fields, unset_fields)
+                       for index, path in enumerate(paths)]
+            temp_files = [future.result() for future in futures]
+    except Exception as error:
+        _rollback(journal, paths, restore=())
+        _write_manifest(journal, "rolled_back", paths)
+        shutil.rmtree(journal)
+        raise BatchError(f"Could not prepare batch: {error}") from error
+
+    _write_manifest(journal, "committing", paths)
+    replaced = set()
+    try:
+        for index, (temp_file, path) in enumerate(zip(temp_files, paths)):
+            os.replace(temp_file, path)
+            replaced.add(index)
+    except OSError as error:
+        _rollback(journal, paths, restore=replaced)
+        _write_manifest(journal, "rolled_back", paths)
+        shutil.rmtree(journal)
+        raise BatchError(f"Could not commit batch, rolled back {len(replaced)} presets: {error}") from error
+    finally:
+        if repository is not None:
+            for path in paths:
+                repository.invalidate(path)
+    # Recorded before the originals are deleted, so recovery never restores
+    # part of a finished batch.
+    _write_manifest(journal, "committed", paths)
+    shutil.rmtree(journal)
+    return len(paths)
+
+
+def recover_journals(journal_dir=JOURNAL_DIR):
+    # Rolls back any batch that was interrupted before its journal was removed.
+    if not os.path.isdir(journal_dir):
+        return 0
+    recovered = 0
+    for name in sorted(os.listdir(journal_dir)):
+        journal = os.path.join(journal_dir, name)
+        try:
+            with open(os.path.join(journal, "manifest.json"), "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            shutil.rmtree(journal, ignore_errors=True)
+            continue
+        paths = manifest["paths"]
+        if manifest["state"] in ("prepared", "committing"):
+            restore = set()
+            if manifest["state"] == "committing":
+                restore = {index for index in range(len(paths))
+                           if os.path.exists(os.path.join(journal, f"{index}.orig"))}
+            _rollback(journal, paths, restore)
+            _write_manifest(journal, "rolled_back", paths)
+        # "committed" and "rolled_back" batches are finished; only their journal is left.
+        shutil.rmtree(journal)
+        recovered += 1
+    return recovered
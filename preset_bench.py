@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_RESULTS_FILE = "bench_results.jsonl"
+BENCH_WORKERS = 2
+# Upper bound for completions when a preset allows unlimited output (n_predict -1).
+BENCH_MAX_TOKENS = 128
+RSS_SAMPLE_SECONDS = 0.05
+
+PROMPT_SUITE = [
+    "Summarize the plot of Romeo and Juliet in three sentences.",
+    "Write a Python function that returns the n-th Fibonacci number.",
+    "Explain the difference between TCP and UDP to a new developer.",
+    "List five practical tips for writing clear commit messages.",
+    "Translate 'The weather is lovely today' into French, German and Spanish.",
+]
+
+
+class BenchError(Exception):
+    pass
+
+
+def find_process(name):
+    # pid of a running process called name (".exe" ignored), or None; needs psutil.
+    if psutil is None or not name:
+        return None
+    for process in psutil.process_iter(["name"]):
+        if os.path.splitext(process.info["name"] or "")[0].lower() == name.lower():
+            return process.pid
+    return None
+
+
+def percentile(values, fraction):
+    # Linear interpolation between closest ranks, like numpy's default.
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _max_tokens(inference_params):
+    n_predict = inference_params.get("n_predict", -1)
+    return BENCH_MAX_TOKENS if n_predict is None or n_predict < 0 else min(n_predict, BENCH_MAX_TOKENS)
+
+
+class OpenAIBackend:
+    # Streams chat completions from an OpenAI-compatible server such as LM
+    # Studio's local server. Only inference parameters can be sent per
+    # request; load parameters apply to whatever model the server has loaded,
+    # so presets that differ in them are not compared (see benchmark_presets).
+    # Every preset runs on the same server, so they are benchmarked one at a
+    # time; concurrent runs would slow each other down and skew comparisons.
+    name = "openai"
+    concurrent = False
+    applies_load_params = False
+
+    def __init__(self, base_url="http://localhost:1234/v1", model=None, timeout=120, pid=None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        # Process whose memory is sampled, e.g. the server's; None skips RSS.
+        self.pid = pid
+
+    def model_id(self):
+        # The given model, else the first one the server reports as loaded.
+        if self.model is None:
+            with urllib.request.urlopen(f"{self.base_url}/models", timeout=self.timeout) as response:
+                models = json.load(response).get("data", [])
+            if not models:
+                raise ValueError(f"No model is loaded on {self.base_url}.")
+            self.model = models[0]["id"]
+        return self.model
+
+    def stream(self, preset_data, prompt):
+        inference_params = preset_data.get("inference_params", {})
+        messages = []
+        if inference_params.get("pre_prompt"):
+            messages.append({"role": "system", "content": inference_params["pre_prompt"]})
+        messages.append({"role": "user", "content": prompt})
+        body = {
+            "model": self.model_id(),
+            "messages": messages,
+            "stream": True,
+            "max_tokens": _max_tokens(inference_params),
+            "temperature": inference_params.get("temp", 0.8),
+            "top_p": inference_params.get("top_p", 0.95),
+        }
+        if inference_params.get("antiprompt"):
+            body["stop"] = inference_params["antiprompt"][:4]
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                for choice in json.loads(data).get("choices", []):
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        # Servers stream one chunk per token.
+                        yield content
+
+
+class FakeBackend:
+    # Deterministic backend for tests and CI. Output tokens depend only on the
+    # preset and prompt, and timings come from a per-thread virtual clock
+    # driven by the preset's load parameters, so repeated runs give identical
+    # metrics without any model. With realtime=True it sleeps instead.
+    name = "fake"
+    concurrent = True
+    applies_load_params = True
+    WORDS = ("the", "model", "answers", "with", "a", "short", "and", "helpful", "reply", "about", "this", "topic")
+
+    def __init__(self, realtime=False, speedup=1.0):
+        self.realtime = realtime
+        self.speedup = speedup
+        self.pid = os.getpid()
+        self._local = threading.local()
+
+    def clock(self):
+        if self.realtime:
+            return time.perf_counter()
+        return getattr(self._local, "now", 0.0)
+
+    def _advance(self, seconds):
+        if self.realtime:
+            time.sleep(seconds)
+        else:
+            self._local.now = getattr(self._local, "now", 0.0) + seconds
+
+    def rates(self, preset_data):
+        # (prompt tokens/s, generated tokens/s) implied by the load parameters.
+        load_params = preset_data.get("load_params", {})
+        threads = preset_data.get("inference_params", {}).get("n_threads") or 4
+        gpu_share = min(max(load_params.get("n_gpu_layers") or 0, 0), 33) / 33
+        generation = (4 + 2 * min(threads, 16)) * (1 + 4 * gpu_share) * self.speedup
+        prompt = generation * 8 * min(load_params.get("n_batch") or 512, 2048) / 512
+        return prompt, generation
+
+    def stream(self, preset_data, prompt):
+        digest = hashlib.sha256(f"{preset_data.get('name')}\0{prompt}".encode("utf-8")).digest()
+        count = min(_max_tokens(preset_data.get("inference_params", {})), 32 + digest[0] % 64)
+        prompt_rate, generation_rate = self.rates(preset_data)
+        self._advance(len(prompt.split()) * 1.3 / prompt_rate)
+        for index in range(count):
+            if index:
+                self._advance(1 / generation_rate)
+            yield self.WORDS[digest[index % len(digest)] % len(self.WORDS)] + " "
+
+
+def make_backend(name, server_url=None, model=None, pid=None):
+    if name == "fake":
+        return FakeBackend()
+    if name == "openai":
+        options = {"base_url": server_url} if server_url else {}
+        return OpenAIBackend(model=model, pid=pid, **options)
+    raise ValueError(f"Unknown benchmark backend {name}.")
+
+
+class RssSampler:
+    # Tracks the peak resident set size of a process while a benchmark runs.
+    # Uses psutil when available; otherwise falls back to getrusage for this
+    # process, which reports the peak over the process lifetime.
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self, process):
+        while True:
+            try:
+                self.peak = max(self.peak or 0, process.memory_info().rss)
+            except psutil.Error:
+                return
+            if self._stop.wait(RSS_SAMPLE_SECONDS):
+                return
+
+    def __enter__(self):
+        if self.pid is not None and psutil is not None:
+            try:
+                process = psutil.Process(self.pid)
+            except psutil.Error:
+                return self
+            self._thread = threading.Thread(target=self._sample, args=(process,), daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        elif self.pid == os.getpid() and resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux reports kilobytes, macOS bytes.
+            self.peak = peak if sys.platform == "darwin" else peak * 1024
+        return False
+
+
+def run_prompt(backend, preset_data, prompt):
+    clock = getattr(backend, "clock", time.perf_counter)
+    start = clock()
+    first = None
+    tokens = 0
+    text = []
+    for token in backend.stream(preset_data, prompt):
+        if first is None:
+            first = clock()
+        tokens += 1
+        text.append(token)
+    end = clock()
+    ttft = (first if first is not None else end) - start
+    generation_time = end - first if first is not None else 0
+    # The first token's latency is TTFT; throughput counts the tokens after it.
+    rate = (tokens - 1) / generation_time if tokens > 1 and generation_time > 0 else None
+    return {"ttft": ttft, "latency": end - start, "tokens": tokens, "tokens_per_second": rate, "text": "".join(text)}
+
+
+def benchmark_preset(name, preset_data, backend, prompts=PROMPT_SUITE, task=None):
+    samples = []
+    errors = []
+    with RssSampler(getattr(backend, "pid", None)) as sampler:
+        for prompt in prompts:
+            if task is not None:
+                task.check()
+            try:
+                samples.append(run_prompt(backend, preset_data, prompt))
+            except (OSError, ValueError) as error:
+                errors.append(str(error))
+    rates = [sample["tokens_per_second"] for sample in samples if sample["tokens_per_second"]]
+    ttfts = [sample["ttft"] for sample in samples]
+    latencies = [sample["latency"] for sample in samples]
+    return {
+        "preset": name,
+        "time": time.time(),
+        "backend": backend.name,
+        "prompts": len(prompts),
+        "completed": len(samples),
+        "errors": errors,
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p95": percentile(ttfts, 0.95),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "tokens_per_second": sum(rates) / len(rates) if rates else None,
+        "tokens_per_second_p50": percentile(rates, 0.5),
+        "peak_rss_bytes": sampler.peak,
+        "sample_output": samples[0]["text"] if samples else "",
+    }
+
+
+def benchmark_presets(presets, backend, prompts=PROMPT_SUITE, max_workers=BENCH_WORKERS, task=None):
+    # presets maps name -> parsed preset. Presets run concurrently on a
+    # bounded pool when the backend allows it (see backend.concurrent); each
+    # preset's prompts run one after another so its latencies are not skewed
+    # by its own concurrency.
+    if not getattr(backend, "concurrent", True):
+        max_workers = 1
+    if not getattr(backend, "applies_load_params", True):
+        load_params = {json.dumps(preset.get("load_params", {}), sort_keys=True) for preset in presets.values()}
+        if len(load_params) > 1:
+            raise BenchError(f"{', '.join(presets)} differ in load parameters, which the {backend.name} backend "
+                             f"cannot apply per request; compare presets that only differ in inference parameters.")
+    finished = []
+
+    def run(name):
+        result = benchmark_preset(name, presets[name], backend, prompts, task)
+        finished.append(name)
+        if task is not None:
+            task.report(presets_benchmarked=len(finished))
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, list(presets)))
+
+
+def save_results(results, results_file=BENCH_RESULTS_FILE):
+    with open(results_file, "a") as file:
+        for result in results:
+            record = {key: value for key, value in result.items() if key != "sample_output"}
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def load_results(results_file=BENCH_RESULTS_FILE, name=None):
+    # {preset: [result, ...]} in the order they were recorded.
+    history = {}
+    if not os.path.exists(results_file):
+        return history
+    with open(results_file, "r") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if name is None or result["preset"] == name:
+                history.setdefault(result["preset"], []).append(result)
+    return history
+
+
+def compare_results(first, second):
+    # Relative differences for an A/B test; positive favours `second`.
+    def change(key, higher_is_better):
+        if not first.get(key) or second.get(key) is None:
+            return None
+        delta = (second[key] - first[key]) / first[key]
+        return delta if higher_is_better else -delta
+    return {
+        "tokens_per_second": change("tokens_per_second", True),
+        "ttft_p50": change("ttft_p50", False),
+        "latency_p95": change("latency_p95", False),
+    }
+
+
+def _sparkline(values):
+    levels = " .:-=+*#%@"
+    values = [value for value in values if value is not None]
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return levels[len(levels) // 2] * len(values)
+    span = high - low
+    return "".join(levels[int((value - low) / span * (len(levels) - 1))] for value in values)
+
+
+def format_result(result):
+    def seconds(value):
+        return f"{value * 1000:.0f} ms" if value is not None else "n/a"
+    rate = f"{result['tokens_per_second']:.1f}" if result["tokens_per_second"] else "n/a"
+    rss = f"{result['peak_rss_bytes'] / 1024 ** 2:.0f} MiB" if result.get("peak_rss_bytes") else "n/a"
+    lines = [f"{result['preset']} ({result['backend']}, {result['completed']}/{result['prompts']} prompts)",
+             f"  {rate} tokens/s, TTFT p50 {seconds(result['ttft_p50'])} p95 {seconds(result['ttft_p95'])}",
+             f"  latency p50 {seconds(result['latency_p50'])} p95 {seconds(result['latency_p95'])}, peak RSS {rss}"]
+    for error in result["errors"][:3]:
+        lines.append(f"  error: {error}")
+    return "\n".join(lines)
+
+
+def format_trends(history, last=20):
+    lines = []
+    for name in sorted(history):
+        runs = history[name][-last:]
+        rates = [run.get("tokens_per_second") for run in runs]
+        latest = runs[-1]
+        line = f"{name}: {len(history[name])} runs, tokens/s [{_sparkline(rates)}]"
+        if latest.get("tokens_per_second"):
+            line += f" latest {latest['tokens_per_second']:.1f}"
+            previous = [rate for rate in rates[:-1] if rate]
+            if previous:
+                line += f" ({(latest['tokens_per_second'] - previous[-1]) / previous[-1]:+.0%} vs previous)"
+        if latest.get("latency_p95") is not None:
+            line += f", latency p95 {latest['latency_p95'] * 1000:.0f} ms"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,392 @@
+import io
+import os
+import gzip
+import json
+import time
+import platform
+from collections import OrderedDict
+
+from preset_store import OVERLAY_FIELDS, PRESET_SUFFIX, split_preset
+from preset_validate import validate_presets
+from preset_writer import write_preset_texts
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BUNDLE_FORMAT = "lm-preset-bundle"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".presets.jsonl"
+# Presets are streamed in blocks. Parameter bodies repeated within a block
+# are written once and referenced by hash afterwards; both sides forget
+# them at each block boundary, which is also where an import checkpoints,
+# so a resumed import never needs anything from before its restart point.
+BLOCK_RECORDS = 4096
+BODY_CACHE_ENTRIES = 1024
+IMPORT_BATCH = 1024
+READ_CHUNK_BYTES = 1024 * 1024
+MAX_REPORTED_REJECTS = 20
+CONFLICT_POLICIES = ("skip", "replace")
+
+_PLACEHOLDER = "@@bundle-overlay@@"
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class BundleError(ValueError):
+    pass
+
+
+def open_bundle(path, mode="rb"):
+    # Binary stream over a bundle. Writing compresses by suffix (.gz, .zst);
+    # reading detects the compression from the file's first bytes.
+    if mode == "wb":
+        if path.endswith(".gz"):
+            return gzip.open(path, "wb", compresslevel=6)
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise BundleError("Writing .zst bundles needs the zstandard package.")
+            return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+        return open(path, "wb")
+    file = open(path, "rb")
+    magic = file.read(4)
+    file.seek(0)
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=file, mode="rb")
+    if magic == _ZSTD_MAGIC:
+        if zstandard is None:
+            file.close()
+            raise BundleError("Reading .zst bundles needs the zstandard package.")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(file, closefd=True))
+    return file
+
+
+def _line(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class _BodyCache:
+    # Bounded LRU of parameter bodies by hash. The exporter and importer see
+    # the same sequence of bodies, so their caches always agree.
+
+    def __init__(self, size):
+        self.size = size
+        self._bodies = OrderedDict()
+
+    def get(self, digest):
+        body = self._bodies.get(digest)
+        if body is not None:
+            self._bodies.move_to_end(digest)
+        return body
+
+    def put(self, digest, body):
+        self._bodies[digest] = body
+        self._bodies.move_to_end(digest)
+        if len(self._bodies) > self.size:
+            self._bodies.popitem(last=False)
+
+    def clear(self):
+        self._bodies.clear()
+
+
+def export_bundle(bundle_file, database, load_preset, names=None, include_models=True, task=None):
+    # Streams the catalog (or the named presets) to bundle_file. The bundle
+    # is written under a temporary name and renamed when complete. Returns
+    # {"presets", "models", "unreadable", "bytes"}.
+    names = list(database["presets"] if names is None else names)
+    models = list(database["models"]) if include_models else []
+    exported = 0
+    unreadable = []
+    cache = _BodyCache(BODY_CACHE_ENTRIES)
+    # Keep the compression suffix on the temporary file.
+    temp_file = os.path.join(os.path.dirname(os.path.abspath(bundle_file)), f".tmp-{os.path.basename(bundle_file)}")
+    try:
+        with open_bundle(temp_file, "wb") as stream:
+            stream.write(_line({"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, "created": time.time(),
+                                "host": platform.node(), "presets": len(names), "models": len(models),
+                                "block_records": BLOCK_RECORDS, "body_cache": BODY_CACHE_ENTRIES}))
+            for model in models:
+                stream.write(_line({"model": model}))
+            for name in names:
+                if task is not None and exported % IMPORT_BATCH == 0:
+                    task.check()
+                    task.report(presets_exported=exported)
+                try:
+                    preset_data = load_preset(database["presets"][name])
+                except (KeyError, OSError, ValueError) as error:
+                    unreadable.append((name, str(error)))
+                    continue
+                if not isinstance(preset_data, dict):
+                    unreadable.append((name, "preset is not a JSON object"))
+                    continue
+                if exported % BLOCK_RECORDS == 0:
+                    cache.clear()
+                digest, _, overlay = split_preset(preset_data)
+                if cache.get(digest) is not None:
+                    stream.write(_line({"name": name, "body": digest, "overlay": overlay}))
+                else:
+                    cache.put(digest, True)
+                    stream.write(_line({"name": name, "body": digest, "preset": preset_data}))
+                exported += 1
+            stream.write(_line({"end": True, "presets": exported, "models": len(models)}))
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    os.replace(temp_file, bundle_file)
+    return {"presets": exported, "models": len(models), "unreadable": unreadable,
+            "bytes": os.path.getsize(bundle_file)}
+
+
+def _state_file(bundle_file):
+    return f"{bundle_file}.import-state.json"
+
+
+def _load_state(bundle_file):
+    # The saved position is only trusted for the same, unchanged bundle.
+    stat_result = os.stat(bundle_file)
+    try:
+        with open(_state_file(bundle_file), "r") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if state.get("size") != stat_result.st_size or state.get("mtime_ns") != stat_result.st_mtime_ns:
+        return None
+    return state
+
+
+def _save_state(bundle_file, state):
+    stat_result = os.stat(bundle_file)
+    state = dict(state, size=stat_result.st_size, mtime_ns=stat_result.st_mtime_ns)
+    with open(f"{_state_file(bundle_file)}.tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(f"{_state_file(bundle_file)}.tmp", _state_file(bundle_file))
+
+
+def _skip(stream, count):
+    if hasattr(stream, "seekable") and stream.seekable() and not isinstance(stream, gzip.GzipFile):
+        stream.seek(count, os.SEEK_CUR)
+        return
+    # Compressed streams can only be read forward; skipping still avoids parsing.
+    while count > 0:
+        chunk = stream.read(min(count, READ_CHUNK_BYTES))
+        if not chunk:
+            raise BundleError("Bundle is shorter than its saved import position.")
+        count -= len(chunk)
+
+
+def _valid_name(name):
+    return isinstance(name, str) and name not in ("", ".", "..") and os.path.basename(name) == name \
+        and "/" not in name and "\\" not in name
+
+
+class _Importer:
+
+    def __init__(self, database, presets_dir, on_conflict, counters):
+        self.database = database
+        self.presets_dir = presets_dir
+        self.on_conflict = on_conflict
+        self.counters = counters
+        self.batch = []
+        self._templates = {}
+
+    def text(self, preset_data, digest):
+        # Presets sharing a body differ only in their overlay fields, so the
+        # indented JSON (slow to produce in Python) is built once per body and
+        # key order, with placeholders where the overlay values go.
+        overlay = {key: preset_data[key] for key in OVERLAY_FIELDS if key in preset_data}
+        if not all(isinstance(value, (str, int, float, bool)) for value in overlay.values()):
+            return json.dumps(preset_data, indent=2)
+        template_key = (digest, tuple(preset_data))
+        template = self._templates.get(template_key)
+        if template is None:
+            if len(self._templates) >= BODY_CACHE_ENTRIES:
+                self._templates.clear()
+            template = json.dumps(dict(preset_data, **{key: f"{_PLACEHOLDER}{key}" for key in overlay}), indent=2)
+            self._templates[template_key] = template
+        for key, value in overlay.items():
+            template = template.replace(json.dumps(f"{_PLACEHOLDER}{key}"), json.dumps(value), 1)
+        return template
+
+    def reject(self, name, reason):
+        self.counters["rejected"] += 1
+        if len(self.counters["rejects"]) < MAX_REPORTED_REJECTS:
+            self.counters["rejects"].append([str(name), reason])
+
+    def flush(self):
+        if not self.batch:
+            return
+        issues = {}
+        for row, severity, code, message in validate_presets([preset_data for _, preset_data, _ in self.batch]):
+            if severity == "error":
+                issues.setdefault(row, message)
+        texts = {}
+        for row, (name, preset_data, digest) in enumerate(self.batch):
+            if row in issues:
+                self.reject(name, issues[row])
+                continue
+            path = self.database["presets"].get(name) or os.path.join(self.presets_dir, f"{name}{PRESET_SUFFIX}")
+            # ASCII-only, so its size on disk is its length plus any \r added by text mode.
+            text = self.text(preset_data, digest)
+            if path not in texts and os.path.exists(path):
+                # Size first, so unchanged presets are mostly skipped without reading them.
+                size = len(text) + (text.count("\n") if os.linesep == "\r\n" else 0)
+                if os.path.getsize(path) == size and _read(path) == text:
+                    self.counters["unchanged"] += 1
+                    self.database["presets"][name] = path
+                    continue
+                if self.on_conflict == "skip":
+                    self.counters["conflicts"] += 1
+                    continue
+                self.counters["replaced"] += 1
+            else:
+                self.counters["imported"] += 1
+            texts[path] = text
+            self.database["presets"][name] = path
+        write_preset_texts(texts)
+        self.batch = []
+
+
+def _read(path):
+    try:
+        with open(path, "r") as file:
+            return file.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _resolve(record, cache):
+    # (preset_data, None) for a usable record, else (None, reason).
+    digest = record.get("body")
+    if "preset" in record:
+        preset_data = record["preset"]
+        if not isinstance(preset_data, dict) or split_preset(preset_data)[0] != digest:
+            return None, "preset does not match its hash"
+        cache.put(digest, {key: value for key, value in preset_data.items() if key not in OVERLAY_FIELDS})
+    else:
+        body = cache.get(digest)
+        if body is None:
+            return None, "refers to an unknown preset body"
+        preset_data = dict(record.get("overlay") or {}, **body)
+    if not _valid_name(record.get("name")):
+        return None, "invalid preset name"
+    return preset_data, None
+
+
+def import_bundle(bundle_file, database, presets_dir, save, on_conflict="skip", resume=True, task=None):
+    # Streams a bundle into presets_dir and the catalog. Memory stays bounded
+    # by IMPORT_BATCH and BODY_CACHE_ENTRIES whatever the bundle's size.
+    # Presets failing validation are rejected; ones identical to the local
+    # file are left alone; other existing presets are kept or replaced
+    # according to on_conflict. save(database) is called at each checkpoint.
+    # An interrupted import continues from its last checkpoint when run
+    # again. Returns the counters.
+    if on_conflict not in CONFLICT_POLICIES:
+        raise BundleError(f"Conflict policy must be one of {', '.join(CONFLICT_POLICIES)}.")
+    os.makedirs(presets_dir, exist_ok=True)
+    state = _load_state(bundle_file) if resume else None
+    counters = state["counters"] if state else {"models": 0, "imported": 0, "unchanged": 0, "conflicts": 0,
+                                                  "replaced": 0, "rejected": 0, "rejects": []}
+    importer = _Importer(database, presets_dir, on_conflict, counters)
+    with open_bundle(bundle_file) as stream:
+        header = stream.readline()
+        try:
+            manifest = json.loads(header)
+        except ValueError:
+            raise BundleError(f"{bundle_file} is not a preset bundle.")
+        if not isinstance(manifest, dict) or manifest.get("format") != BUNDLE_FORMAT:
+            raise BundleError(f"{bundle_file} is not a preset bundle.")
+        if manifest.get("version") != BUNDLE_VERSION:
+            raise BundleError(f"Unsupported bundle version {manifest.get('version')}.")
+        block_records = manifest.get("block_records") or BLOCK_RECORDS
+        cache = _BodyCache(manifest.get("body_cache") or BODY_CACHE_ENTRIES)
+        offset = len(header)
+        records = 0
+        if state:
+            _skip(stream, state["offset"] - offset)
+            offset, records = state["offset"], state["records"]
+        trailer = None
+        models = database["models"]
+        while True:
+            line = stream.readline()
+            if not line.endswith(b"\n"):
+                # End of data, or a last line cut short by an incomplete copy.
+                break
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise BundleError(f"Corrupt bundle record at byte {offset - len(line)}.")
+            if "end" in record:
+                trailer = record
+                break
+            if "model" in record:
+                if record["model"] not in models:
+                    models.append(record["model"])
+                    counters["models"] += 1
+                continue
+            if records % block_records == 0:
+                cache.clear()
+            records += 1
+            preset_data, reason = _resolve(record, cache)
+            if reason is not None:
+                importer.reject(record.get("name"), reason)
+            else:
+                importer.batch.append((record["name"], preset_data, record["body"]))
+            at_checkpoint = records % block_records == 0
+            if len(importer.batch) >= IMPORT_BATCH or at_checkpoint:
+                importer.flush()
+                if task is not None:
+                    task.check()
+                    task.report(presets_read=records)
+            if at_checkpoint:
+                save(database)
+                _save_state(bundle_file, {"offset": offset, "records": records, "counters": counters})
+        importer.flush()
+    save(database)
+    if trailer is None:
+        raise BundleError(f"{bundle_file} is truncated after {records} presets.")
+    if trailer.get("presets") != records:
+        raise BundleError(f"Bundle declares {trailer.get('presets')} presets but contains {records}.")
+    if os.path.exists(_state_file(bundle_file)):
+        os.remove(_state_file(bundle_file))
+    counters["presets"] = records
+    return counters
+
+
+def install_presets(presets, database, presets_dir, on_conflict="skip", task=None):
+    # Writes (name, preset_data) pairs from another source, such as the
+    # marketplace, with the same validation and conflict handling as a
+    # bundle import. The caller saves the catalog. Returns the counters.
+    if on_conflict not in CONFLICT_POLICIES:
+        raise BundleError(f"Conflict policy must be one of {', '.join(CONFLICT_POLICIES)}.")
+    os.makedirs(presets_dir, exist_ok=True)
+    counters = {"presets": 0, "imported": 0, "unchanged": 0, "conflicts": 0, "replaced": 0, "rejected": 0,
+                "rejects": []}
+    importer = _Importer(database, presets_dir, on_conflict, counters)
+    for name, preset_data in presets:
+        counters["presets"] += 1
+        if not _valid_name(name):
+            importer.reject(name, "invalid preset name")
+        elif not isinstance(preset_data, dict):
+            importer.reject(name, "not a preset")
+        else:
+            importer.batch.append((name, preset_data, split_preset(preset_data)[0]))
+        if len(importer.batch) >= IMPORT_BATCH:
+            importer.flush()
+            if task is not None:
+                task.check()
+                task.report(presets_installed=counters["presets"])
+    importer.flush()
+    return counters
+
+
+def format_import(counters):
+    models = f"; {counters['models']} models added" if "models" in counters else ""
+    lines = [f"{counters.get('presets', 0)} presets read: {counters['imported']} new, {counters['replaced']} replaced, "
+             f"{counters['unchanged']} unchanged, {counters['conflicts']} kept local, {counters['rejected']} rejected"
+             f"{models}."]
+    for name, reason in counters["rejects"]:
+        lines.append(f"  rejected {name}: {reason}")
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+import os
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+PRESET_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _signature(stat_result):
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+class PresetRepository:
+    # LRU cache of parsed preset files. An entry is reused as long as the
+    # file's (mtime, size) is unchanged; the cap is measured in file bytes.
+
+    def __init__(self, max_bytes=PRESET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Values computed from a cached preset, e.g. its flattened form. They
+        # are dropped with the preset, so they stay within the same LRU.
+        self._derived = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _store(self, path, signature, data):
+        self._drop(path)
+        size = signature[1]
+        if size > self.max_bytes:
+            return
+        self._entries[path] = (signature, data)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_path, (old_signature, _) = self._entries.popitem(last=False)
+            self._bytes -= old_signature[1]
+            self._derived.pop(old_path, None)
+
+    def _drop(self, path):
+        entry = self._entries.pop(path, None)
+        self._derived.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry[0][1]
+
+    def load_shared(self, path):
+        # Returns the cached object itself; callers must not mutate it.
+        path = os.path.abspath(path)
+        signature = _signature(os.stat(path))
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        with open(path, "r") as file:
+            data = json.load(file)
+        with self._lock:
+            self._store(path, signature, data)
+        return data
+
+    def load_derived(self, path, kind, compute):
+        # compute(preset) for the cached preset, computed again only when the
+        # file changes. Like load_shared, the result must not be mutated.
+        preset_data = self.load_shared(path)
+        path = os.path.abspath(path)
+        with self._lock:
+            derived = self._derived.get(path, {}).get(kind)
+            if derived is not None and derived[0] is preset_data:
+                return derived[1]
+        value = compute(preset_data)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] is preset_data:
+                self._derived.setdefault(path, {})[kind] = (preset_data, value)
+        return value
+
+    def load(self, path):
+        return copy.deepcopy(self.load_shared(path))
+
+    def save(self, path, data):
+        path = os.path.abspath(path)
+        temp_file = f"{path}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(data, file, indent=2)
+        os.replace(temp_file, path)
+        signature = _signature(os.stat(path))
+        with self._lock:
+            self._store(path, signature, copy.deepcopy(data))
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._derived.clear()
+                self._bytes = 0
+            else:
+                self._drop(os.path.abspath(path))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
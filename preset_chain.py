@@ -0,0 +1,326 @@
+import sys
+import json
+import time
+import asyncio
+import hashlib
+
+from preset_bench import OpenAIBackend, percentile
+
+# Documents waiting at each stage, and tokens buffered between two stages.
+# Both queues are bounded, so a slow stage holds back the ones before it.
+STAGE_QUEUE_SIZE = 16
+TOKEN_BUFFER = 64
+STAGE_CONCURRENCY = 4
+CHAIN_OUTPUT_SUFFIX = ".chain.jsonl"
+
+_END = object()
+
+
+class StageFailed(Exception):
+
+    def __init__(self, stage, error):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class _Failure:
+    # Travels down the token queue in place of the remaining tokens.
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+def _words(text):
+    # Splits text into whitespace-terminated tokens, the way the backends stream them.
+    return [word + " " for word in text.split()]
+
+
+async def _document_tokens(text):
+    for token in _words(text):
+        yield token
+
+
+async def _queue_tokens(queue):
+    while True:
+        token = await queue.get()
+        if token is _END:
+            return
+        if isinstance(token, _Failure):
+            raise StageFailed(token.stage, token.error)
+        yield token
+
+
+class AsyncFakeBackend:
+    # Deterministic local stand-in. It handles its input token by token, so
+    # it can start on a document before the previous stage has finished it.
+    # Each input token is echoed with an occasional marker derived from the
+    # preset name, after `token_delay` seconds of simulated work.
+    name = "fake"
+
+    def __init__(self, token_delay=0.0, first_token_delay=0.0):
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+
+    async def stream(self, preset_data, tokens):
+        marker = hashlib.sha256(str(preset_data.get("name")).encode("utf-8")).hexdigest()[:4]
+        await asyncio.sleep(self.first_token_delay)
+        index = 0
+        async for token in tokens:
+            await asyncio.sleep(self.token_delay)
+            yield token
+            index += 1
+            if index % 16 == 0:
+                yield f"[{marker}] "
+
+
+class AsyncOpenAIBackend:
+    # Runs preset_bench.OpenAIBackend on a thread. A chat completion needs the
+    # whole prompt, so the input is gathered first and only the output streams.
+    name = "openai"
+
+    def __init__(self, base_url="http://localhost:1234/v1", timeout=120):
+        self.backend = OpenAIBackend(base_url, timeout=timeout)
+
+    async def stream(self, preset_data, tokens):
+        prompt = "".join([token async for token in tokens])
+        loop = asyncio.get_running_loop()
+        received = asyncio.Queue()
+
+        def produce():
+            try:
+                for token in self.backend.stream(preset_data, prompt):
+                    loop.call_soon_threadsafe(received.put_nowait, token)
+            except Exception as error:
+                loop.call_soon_threadsafe(received.put_nowait, _Failure(self.name, error))
+            loop.call_soon_threadsafe(received.put_nowait, _END)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            async for token in _queue_tokens(received):
+                yield token
+        except StageFailed as failure:
+            # Report the request's own error, not an upstream stage failure.
+            raise failure.error
+        finally:
+            await producer
+
+
+def make_backend(name, server_url=None):
+    if name == "fake":
+        return AsyncFakeBackend()
+    if name == "openai":
+        return AsyncOpenAIBackend(server_url) if server_url else AsyncOpenAIBackend()
+    raise ValueError(f"Unknown chain backend {name}.")
+
+
+class StageStats:
+    # Per-stage counters. Latency runs from when a worker picks up a document
+    # to its last output token; blocked time is spent waiting for the next
+    # stage to make room.
+
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.documents = 0
+        self.failed = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.latencies = []
+        self.first_token = []
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue = 0
+        self.started = None
+        self.finished = None
+
+    def summary(self):
+        wall = (self.finished - self.started) if self.started is not None and self.finished is not None else 0
+        return {
+            "stage": self.name,
+            "concurrency": self.concurrency,
+            "documents": self.documents,
+            "failed": self.failed,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "latency_p50": percentile(self.latencies, 0.5),
+            "latency_p95": percentile(self.latencies, 0.95),
+            "first_token_p50": percentile(self.first_token, 0.5),
+            "tokens_per_second": self.tokens_out / wall if wall > 0 else None,
+            "utilization": self.busy_seconds / (wall * self.concurrency) if wall > 0 else None,
+            "blocked_seconds": self.blocked_seconds,
+            "max_queue": self.max_queue,
+        }
+
+
+class _Stage:
+
+    def __init__(self, name, preset_data, concurrency, queue_size):
+        self.name = name
+        self.preset_data = preset_data
+        self.concurrency = concurrency
+        self.jobs = asyncio.Queue(maxsize=queue_size)
+        self.stats = StageStats(name, concurrency)
+
+    async def put(self, job):
+        await self.jobs.put(job)
+        self.stats.max_queue = max(self.stats.max_queue, self.jobs.qsize())
+
+
+async def _counted(tokens, stats):
+    async for token in tokens:
+        stats.tokens_in += 1
+        yield token
+
+
+async def _stage_worker(stage, put_next, backend, token_buffer):
+    stats = stage.stats
+    while True:
+        job = await stage.jobs.get()
+        if job is _END:
+            return
+        index, tokens = job
+        output = asyncio.Queue(maxsize=token_buffer)
+        # The next stage gets the document now and reads its tokens as they come.
+        await put_next((index, _queue_tokens(output)))
+        start = time.perf_counter()
+        if stats.started is None:
+            stats.started = start
+        first = None
+        try:
+            async for token in backend.stream(stage.preset_data, _counted(tokens, stats)):
+                if first is None:
+                    first = time.perf_counter()
+                stats.tokens_out += 1
+                if output.full():
+                    blocked = time.perf_counter()
+                    await output.put(token)
+                    stats.blocked_seconds += time.perf_counter() - blocked
+                else:
+                    output.put_nowait(token)
+        except StageFailed as error:
+            # An earlier stage failed on this document; pass its failure on.
+            await output.put(_Failure(error.stage, error.error))
+        except Exception as error:
+            stats.failed += 1
+            await output.put(_Failure(stage.name, error))
+        # Read whatever input the backend left so the previous stage is never
+        # stuck on a full buffer.
+        try:
+            async for _ in tokens:
+                pass
+        except StageFailed:
+            pass
+        await output.put(_END)
+        end = time.perf_counter()
+        stats.documents += 1
+        stats.latencies.append(end - start)
+        if first is not None:
+            stats.first_token.append(first - start)
+        stats.busy_seconds += end - start
+        stats.finished = end
+
+
+async def _sink(jobs, results, on_result):
+    # Fan-in: collects every document's final tokens, whichever worker
+    # finished it, into its slot in `results`.
+    pending = set()
+
+    async def collect(index, tokens):
+        try:
+            results[index] = {"index": index, "output": "".join([token async for token in tokens]).strip()}
+        except StageFailed as error:
+            results[index] = {"index": index, "error": str(error)}
+        if on_result is not None:
+            on_result(results[index])
+
+    while True:
+        job = await jobs.get()
+        if job is _END:
+            break
+        pending.add(asyncio.ensure_future(collect(*job)))
+        pending = {future for future in pending if not future.done()}
+    if pending:
+        await asyncio.gather(*pending)
+
+
+async def run_chain_async(stages, documents, backend, queue_size=STAGE_QUEUE_SIZE, token_buffer=TOKEN_BUFFER,
+                          on_result=None, cancelled=None):
+    # stages: [(name, preset_data, concurrency)]. Each document passes
+    # through every stage in order; a stage's workers each handle one
+    # document at a time (fan-out), and the outputs are gathered back in
+    # document order (fan-in). Returns (results, [stage summary]).
+    pipeline = [_Stage(name, preset_data, concurrency, queue_size) for name, preset_data, concurrency in stages]
+    sink_jobs = asyncio.Queue(maxsize=queue_size)
+    results = [None] * len(documents)
+    sink = asyncio.ensure_future(_sink(sink_jobs, results, on_result))
+    workers = []
+    for position, stage in enumerate(pipeline):
+        put_next = pipeline[position + 1].put if position + 1 < len(pipeline) else sink_jobs.put
+        workers.append([asyncio.ensure_future(_stage_worker(stage, put_next, backend, token_buffer))
+                        for _ in range(stage.concurrency)])
+    try:
+        first = pipeline[0]
+        for index, text in enumerate(documents):
+            if cancelled is not None and cancelled():
+                break
+            await first.put((index, _document_tokens(text)))
+        # Shut the stages down in order once each has drained.
+        for position, stage in enumerate(pipeline):
+            for _ in workers[position]:
+                await stage.jobs.put(_END)
+            await asyncio.gather(*workers[position])
+        await sink_jobs.put(_END)
+        await sink
+    finally:
+        for future in [future for stage_futures in workers for future in stage_futures] + [sink]:
+            future.cancel()
+    return results, [stage.stats.summary() for stage in pipeline]
+
+
+def run_chain(stages, documents, backend, queue_size=STAGE_QUEUE_SIZE, token_buffer=TOKEN_BUFFER, task=None):
+    # Synchronous entry point for the task executor and the CLI.
+    done = [0]
+
+    def on_result(result):
+        done[0] += 1
+        if task is not None:
+            task.report(documents_done=done[0])
+    cancelled = (lambda: task.cancelled) if task is not None else None
+    results, stats = asyncio.run(run_chain_async(stages, documents, backend, queue_size, token_buffer, on_result,
+                                                 cancelled))
+    if task is not None:
+        task.check()
+    return results, stats
+
+
+def load_documents(path):
+    # One document per non-empty line; "-" reads standard input.
+    if path == "-":
+        return [line.strip() for line in sys.stdin if line.strip()]
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def save_outputs(results, path):
+    with open(path, "w", encoding="utf-8") as file:
+        for result in results:
+            if result is not None:
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def format_stats(stats, wall_seconds=None):
+    def seconds(value):
+        return f"{value * 1000:.0f} ms" if value is not None else "n/a"
+    lines = []
+    for stage in stats:
+        rate = f"{stage['tokens_per_second']:.0f} tok/s" if stage["tokens_per_second"] else "n/a"
+        utilization = f"{stage['utilization']:.0%}" if stage["utilization"] is not None else "n/a"
+        lines.append(f"{stage['stage']} (x{stage['concurrency']}): {stage['documents']} docs, {stage['failed']} failed, "
+                     f"{rate}, latency p50 {seconds(stage['latency_p50'])} p95 {seconds(stage['latency_p95'])}, "
+                     f"first token p50 {seconds(stage['first_token_p50'])}, busy {utilization}, "
+                     f"blocked {stage['blocked_seconds']:.1f} s, max queue {stage['max_queue']}")
+    if wall_seconds is not None:
+        lines.append(f"total {wall_seconds:.2f} s")
+    return "\n".join(lines)
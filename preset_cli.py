@@ -0,0 +1,632 @@
+import os
+import sys
+import json
+import argparse
+
+# Headless entry point. Heavy or optional modules (tkinter is never needed,
+# git only for sync) are imported inside the command that uses them so that
+# simple commands start quickly.
+
+
+def mark_for_sync(preset_files):
+    # Recorded so the next `sync --push` stages the changed presets.
+    from preset_settings import GITHUB_REPO_DIR
+    from preset_sync import PresetSync, SyncError
+
+    try:
+        PresetSync(GITHUB_REPO_DIR, commit_threshold=None, commit_interval=None).mark_changed(preset_files)
+    except SyncError as error:
+        print(error, file=sys.stderr)
+
+
+def command_scan(args):
+    from preset_actions import scan_models, scan_summary
+    from preset_settings import SCAN_WORKERS
+
+    summary = scan_models(None, args.directory, args.presets_dir, incremental=not args.full, workers=SCAN_WORKERS,
+                          max_depth=args.max_depth, exclude=args.exclude, dry_run=args.dry_run)
+    print(scan_summary(summary))
+    if summary.get("preset_files"):
+        mark_for_sync(summary["preset_files"])
+    return 0
+
+
+def command_list(args):
+    from preset_db import load_database
+    from preset_index import PresetIndex
+
+    database = load_database()
+    names = database["models"] if args.models else database["presets"]
+    for name in PresetIndex(names).search(args.filter or ""):
+        print(name)
+    return 0
+
+
+def command_search(args):
+    from preset_db import find_preset, load_database
+    from preset_index import PresetIndex
+
+    preset_file = find_preset(args.name)
+    if preset_file:
+        print(preset_file)
+        return 0
+    matches = PresetIndex(load_database()["presets"]).search(args.name)
+    for name in matches:
+        print(name)
+    if not matches:
+        print(f"No preset found for {args.name}.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_validate(args):
+    from preset_validate import main as validate_main
+
+    argv = list(args.paths)
+    if args.strict:
+        argv.append("--strict")
+    if args.quiet:
+        argv.append("--quiet")
+    return validate_main(argv)
+
+
+def command_dedupe(args):
+    from preset_store import PresetStore
+
+    store = PresetStore(args.store)
+    packed, skipped = store.pack_directory(args.presets_dir)
+    for file_name in skipped:
+        print(f"skipped unreadable preset {file_name}", file=sys.stderr)
+    stats = store.stats(args.presets_dir)
+    print(f"Stored {packed} presets as {stats['objects']} distinct bodies: "
+          f"{stats['store_bytes']} bytes instead of {stats['flat_bytes']} ({stats['saved_bytes']} saved).")
+    if args.materialize:
+        written = store.materialize_all(args.materialize)
+        print(f"Materialized {len(written)} presets into {args.materialize}.")
+    return 0
+
+
+def command_export(args):
+    from preset_db import load_database
+
+    if args.format == "bundle":
+        from preset_actions import export_preset_bundle
+        from preset_bundle import BUNDLE_SUFFIX
+
+        bundle_file = args.output or f"presets{BUNDLE_SUFFIX}.gz"
+        summary = export_preset_bundle(None, bundle_file, args.names or None)
+        for name, error in summary["unreadable"]:
+            print(f"skipped {name}: {error}", file=sys.stderr)
+        print(f"Exported {summary['presets']} presets and {summary['models']} models to {bundle_file} "
+              f"({summary['bytes']} bytes).")
+        return 0
+    models = load_database()["models"]
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(list(models), output, indent=2)
+            output.write("\n")
+        else:
+            output.write("\n".join(models) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def command_import(args):
+    from preset_actions import import_preset_mapping
+
+    if ".jsonl" in os.path.basename(args.file):
+        from preset_actions import import_preset_bundle
+        from preset_bundle import BundleError, format_import
+        from preset_settings import CONFIG_PRESETS_DIR
+
+        if args.restart and os.path.exists(f"{args.file}.import-state.json"):
+            os.remove(f"{args.file}.import-state.json")
+        try:
+            counters = import_preset_bundle(None, args.file, args.presets_dir or CONFIG_PRESETS_DIR, args.on_conflict)
+        except BundleError as error:
+            print(error, file=sys.stderr)
+            return 1
+        print(format_import(counters))
+        return 1 if counters["rejected"] else 0
+    imported = import_preset_mapping(None, args.file)
+    print(f"Imported {imported} presets from {args.file}.")
+    return 0
+
+
+def command_sync(args):
+    from preset_settings import GITHUB_REPO_URL
+    from preset_sync import PresetSync, SyncError
+
+    preset_sync = PresetSync(args.repo, commit_threshold=None, commit_interval=None, remote_url=GITHUB_REPO_URL)
+    try:
+        committed = preset_sync.sync(push=args.push)
+    except SyncError as error:
+        print(f"Sync failed: {error}", file=sys.stderr)
+        return 1
+    finally:
+        preset_sync.close(flush=False)
+    if args.push:
+        print(f"Presets synced with GitHub repository ({committed} changed files committed).")
+    else:
+        print("Presets synced with GitHub repository.")
+    return 0
+
+
+def command_history(args):
+    import time
+    from preset_db import find_preset
+    from preset_history import PresetHistory, HistoryError, format_patch
+
+    history = PresetHistory()
+    preset_file = find_preset(args.name)
+    if preset_file and os.path.exists(preset_file):
+        # Picks up edits made outside the manager as a new revision.
+        history.record_file(args.name, preset_file)
+    try:
+        if args.restore is not None:
+            if not preset_file:
+                print(f"No preset found for {args.name}.", file=sys.stderr)
+                return 1
+            history.restore(args.name, args.restore, preset_file)
+            mark_for_sync([preset_file])
+            print(f"Restored {args.name} to revision {args.restore}.")
+        elif args.diff:
+            new_rev = args.diff[1] if len(args.diff) > 1 else None
+            print(format_patch(history.diff(args.name, args.diff[0], new_rev)))
+        else:
+            revisions = history.revisions(args.name)
+            if not revisions:
+                print(f"No history for {args.name}.", file=sys.stderr)
+                return 1
+            for rev, timestamp, kind, changes in revisions:
+                detail = "snapshot" if kind == "snapshot" else f"{changes} change{'' if changes == 1 else 's'}"
+                print(f"{rev:5d}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}  {detail}")
+    except HistoryError as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_check(args):
+    from preset_db import load_database, save_changes
+    from preset_cache import PresetRepository
+    from preset_actions import patch_preset
+    from preset_history import PresetHistory
+    from preset_compat import GIB, check_catalog, does_not_fit, format_result, load_host_profile
+
+    profile = load_host_profile(args.profile)
+    if args.ram_gb is not None:
+        profile["ram_bytes"] = int(args.ram_gb * GIB)
+    if args.vram_gb is not None:
+        profile["gpu_vram_bytes"] = [int(args.vram_gb * GIB)] if args.vram_gb else []
+    database = load_database()
+    metadata_entries = len(database.get("gguf_metadata", {}))
+    repository = PresetRepository()
+    results = check_catalog(database, profile, repository.load_shared, args.names or None,
+                            adjust=args.adjust or args.suggest, maximize_offload=args.maximize_offload)
+    # Metadata read for the first time is kept in the catalog.
+    if len(database.get("gguf_metadata", {})) != metadata_entries:
+        database = save_changes(database)
+    history = PresetHistory()
+    failing = 0
+    for result in results:
+        if does_not_fit(result):
+            failing += 1
+        if result.issues or result.adjusted or not args.quiet:
+            print(format_result(result))
+        if args.adjust and result.adjusted:
+            preset_file = database["presets"][result.preset]
+            patch_preset(history, result.preset, preset_file,
+                         {f"load_params.{key}": value for key, value in result.adjusted.items()}, repository)
+            mark_for_sync([preset_file])
+            print(f"  adjusted {result.preset}")
+    print(f"{len(results)} presets checked, {failing} do not fit this host.")
+    return 1 if failing and not args.adjust else 0
+
+
+def command_tune(args):
+    from preset_db import load_database, save_changes
+    from preset_cache import PresetRepository
+    from preset_actions import patch_preset
+    from preset_history import PresetHistory
+    from preset_tuner import optimize_preset, tuned_fields
+
+    database = load_database()
+    preset_file = database["presets"].get(args.name)
+    if not preset_file:
+        print(f"No preset found for {args.name}.", file=sys.stderr)
+        return 1
+    repository = PresetRepository()
+    result, cached = optimize_preset(args.name, repository.load(preset_file), database, args.backend, args.force)
+    save_changes(database)
+    for measurement in result["measurements"]:
+        print(f"  n_threads={measurement['n_threads']:<3} n_batch={measurement['n_batch']:<5} "
+              f"{measurement.get('tokens_per_second', 0):8.1f} tok/s  "
+              f"{measurement.get('prompt_tokens_per_second', 0):8.1f} prompt tok/s")
+    fields = tuned_fields(result)
+    source = "stored result" if cached else f"tuned with {result['backend']}"
+    print(f"{args.name} ({source}): " + ", ".join(f"{key}={value}" for key, value in fields.items()))
+    if args.apply:
+        patch_preset(PresetHistory(), args.name, preset_file, fields, repository)
+        mark_for_sync([preset_file])
+        print(f"Updated {preset_file}.")
+    return 0
+
+
+def command_bench(args):
+    from preset_db import load_database
+    from preset_cache import PresetRepository
+    from preset_bench import BenchError, benchmark_presets, compare_results, find_process, format_result
+    from preset_bench import make_backend, save_results
+
+    database = load_database()
+    missing = [name for name in args.names if name not in database["presets"]]
+    if missing:
+        print(f"No preset found for {', '.join(missing)}.", file=sys.stderr)
+        return 1
+    repository = PresetRepository()
+    presets = {name: repository.load(database["presets"][name]) for name in args.names}
+    backend = make_backend(args.backend, args.url, args.model, args.server_pid or find_process(args.server_process))
+    try:
+        results = benchmark_presets(presets, backend, max_workers=args.workers)
+    except BenchError as error:
+        print(error, file=sys.stderr)
+        return 1
+    if not args.no_save:
+        save_results(results)
+    for result in results:
+        print(format_result(result))
+    if len(results) == 2:
+        for metric, change in compare_results(results[0], results[1]).items():
+            if change is not None:
+                better = results[1]["preset"] if change > 0 else results[0]["preset"]
+                print(f"{metric}: {better} is better by {abs(change):.0%}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+def command_analytics(args):
+    from preset_bench import format_trends, load_results
+
+    history = load_results(name=args.name)
+    if not history:
+        print("No benchmark results recorded.", file=sys.stderr)
+        return 1
+    print(format_trends(history, args.last))
+    return 0
+
+
+def command_recommend(args):
+    from preset_db import load_database, save_changes, model_type_of
+    from preset_cache import PresetRepository
+    from preset_bench import load_results
+    from preset_compat import largest_model, model_paths_by_type
+    from preset_recommend import PresetRecommender, benchmark_scores
+    from gguf_metadata import cached_metadata
+
+    database = load_database()
+    recommender = PresetRecommender.load()
+    updated = recommender.sync(database, PresetRepository().load_shared)
+    recommender.set_scores(benchmark_scores(load_results()))
+    recommender.save()
+    database = save_changes(database)
+    metadata_cache = database["gguf_metadata"]
+    if args.model:
+        # A model without a preset yet: match on its family, size and quantization.
+        metadata = cached_metadata(metadata_cache, args.model)
+        model_type = model_type_of(os.path.splitext(os.path.basename(args.model))[0])
+        size = os.path.getsize(args.model) if os.path.exists(args.model) else None
+        recommendations = recommender.recommend_for_model(model_type, size, metadata, args.k)
+    elif args.name in database["presets"]:
+        if args.similar:
+            recommendations = recommender.similar_presets(args.name, args.k)
+        else:
+            model = largest_model(model_paths_by_type(metadata_cache).get(args.name, []), metadata_cache)
+            size, _, metadata = model if model is not None else (None, None, None)
+            recommendations = recommender.recommend_for_model(args.name, size, metadata, args.k, exclude=(args.name,))
+    else:
+        print(f"No preset found for {args.name}.", file=sys.stderr)
+        return 1
+    for name, distance in recommendations:
+        score = recommender.scores.get(name)
+        detail = f"  benchmark {score:.0%} of best" if score else ""
+        print(f"{distance:8.3f}  {name}{detail}")
+    print(f"{len(recommender)} presets indexed, {updated} updated.", file=sys.stderr)
+    return 0
+
+
+def command_schedule(args):
+    import time
+    from preset_db import load_database
+    from preset_cache import PresetRepository
+    from preset_scheduler import Scheduler, ScheduleError, catalog_resolver, format_job, make_runner
+
+    database = load_database()
+    if args.action == "add" and args.name not in database["presets"]:
+        print(f"No preset found for {args.name}.", file=sys.stderr)
+        return 1
+    try:
+        runner = make_runner(args.runner, args.url) if args.action == "run" else None
+        scheduler = Scheduler(runner, catalog_resolver(database, PresetRepository().load_shared),
+                              max_concurrency=args.workers, pool_size=args.warm,
+                              on_result=lambda result: print(f"{result['preset']}: {result['status']}"
+                                                             + (f" ({result['error']})" if result.get("error") else "")))
+        if args.action == "add":
+            job_id = scheduler.add_job(args.name, args.trigger, args.prompt, args.misfire, args.retries)
+            print(format_job(scheduler.jobs[job_id]))
+        elif args.action == "remove":
+            if not scheduler.remove_job(args.name):
+                print(f"No scheduled job {args.name}.", file=sys.stderr)
+                return 1
+        elif args.action == "run":
+            if args.once:
+                results = scheduler.run_pending()
+                scheduler.stop()
+                return 1 if any(result["status"] == "failed" for result in results) else 0
+            scheduler.start()
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                scheduler.stop()
+        else:
+            for job in scheduler.jobs.values():
+                print(format_job(job))
+    except ScheduleError as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_chain(args):
+    import time
+    from preset_db import load_database
+    from preset_cache import PresetRepository
+    from preset_chain import format_stats, load_documents, make_backend, run_chain, save_outputs
+
+    database = load_database()
+    missing = [name for name in args.names if name not in database["presets"]]
+    if missing:
+        print(f"No preset found for {', '.join(missing)}.", file=sys.stderr)
+        return 1
+    repository = PresetRepository()
+    stages = [(name, repository.load(database["presets"][name]), args.concurrency) for name in args.names]
+    documents = load_documents(args.input)
+    start = time.perf_counter()
+    results, stats = run_chain(stages, documents, make_backend(args.backend, args.url), args.queue_size,
+                               args.token_buffer)
+    elapsed = time.perf_counter() - start
+    if args.output:
+        save_outputs(results, args.output)
+    else:
+        for result in results:
+            if result is not None:
+                print(json.dumps(result, ensure_ascii=False))
+    print(format_stats(stats, elapsed), file=sys.stderr)
+    return 1 if any(result is not None and "error" in result for result in results) else 0
+
+
+def command_market(args):
+    from preset_market import MarketError, MarketplaceClient, RegistryServer, format_stats
+
+    if args.action == "serve":
+        try:
+            server = RegistryServer(args.directory, args.host, args.port)
+        except MarketError as error:
+            print(error, file=sys.stderr)
+            return 1
+        print(f"Serving presets from {args.directory} at {server.url}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+    from preset_settings import MARKETPLACE_CACHE_BYTES
+
+    status = 0
+    client = MarketplaceClient(args.url, cache_bytes=MARKETPLACE_CACHE_BYTES, offline=args.offline)
+    try:
+        entries = client.listing(revalidate=args.refresh)
+        if args.action == "install":
+            from preset_actions import install_marketplace_presets
+            from preset_bundle import format_import
+            from preset_settings import CONFIG_PRESETS_DIR
+
+            by_name = {entry["name"]: entry for entry in entries}
+            missing = [name for name in args.names if name not in by_name]
+            if missing:
+                print(f"Not on the marketplace: {', '.join(missing)}.", file=sys.stderr)
+                return 1
+            counters = install_marketplace_presets(None, client, [by_name[name] for name in args.names],
+                                                   args.presets_dir or CONFIG_PRESETS_DIR, args.on_conflict)
+            print(format_import(counters))
+            status = 1 if counters["rejected"] else 0
+        else:
+            query = (args.filter or "").lower()
+            for entry in entries:
+                if query in entry["name"].lower():
+                    category = f"  [{entry['category']}]" if entry.get("category") else ""
+                    print(f"{entry['name']}{category}")
+    except MarketError as error:
+        print(error, file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    print(format_stats(client), file=sys.stderr)
+    return status
+
+
+def build_parser():
+    from preset_settings import CONFIG_PRESETS_DIR, GITHUB_REPO_DIR, SCAN_EXCLUDE, SCAN_MAX_DEPTH, TUNING_BACKEND
+    from preset_settings import BENCH_MODEL, BENCH_SERVER_PID, BENCH_SERVER_PROCESS
+    from preset_settings import BENCH_BACKEND, BENCH_SERVER_URL, SCHEDULE_RUNNER, SCHEDULE_WORKERS, SCHEDULE_WARM_MODELS
+    from preset_settings import MARKETPLACE_URL
+
+    parser = argparse.ArgumentParser(prog="preset_cli", description="Manage LM Studio presets without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="scan a model directory and create missing presets")
+    scan.add_argument("directory")
+    scan.add_argument("--dry-run", action="store_true", help="report what would change without writing anything")
+    scan.add_argument("--full", action="store_true", help="walk the whole tree instead of using the scan cache")
+    scan.add_argument("--presets-dir", default=CONFIG_PRESETS_DIR)
+    scan.add_argument("--max-depth", type=int, default=SCAN_MAX_DEPTH)
+    scan.add_argument("--exclude", nargs="*", default=list(SCAN_EXCLUDE))
+    scan.set_defaults(handler=command_scan)
+
+    list_parser = commands.add_parser("list", help="list presets or models")
+    list_parser.add_argument("--models", action="store_true")
+    list_parser.add_argument("--filter", help="only names containing this text")
+    list_parser.set_defaults(handler=command_list)
+
+    search = commands.add_parser("search", help="find the preset file for a name")
+    search.add_argument("name")
+    search.set_defaults(handler=command_search)
+
+    validate = commands.add_parser("validate", help="validate preset files")
+    validate.add_argument("paths", nargs="*", default=[CONFIG_PRESETS_DIR])
+    validate.add_argument("--strict", action="store_true")
+    validate.add_argument("--quiet", action="store_true")
+    validate.set_defaults(handler=command_validate)
+
+    dedupe = commands.add_parser("dedupe", help="pack presets into the content-addressed store")
+    dedupe.add_argument("--presets-dir", default=CONFIG_PRESETS_DIR)
+    dedupe.add_argument("--store", default="preset-store")
+    dedupe.add_argument("--materialize", metavar="DIR", help="write ordinary preset files from the store to DIR")
+    dedupe.set_defaults(handler=command_dedupe)
+
+    export = commands.add_parser("export", help="export the model list, or presets and models as a bundle")
+    export.add_argument("--format", choices=("text", "json", "bundle"), default="text")
+    export.add_argument("--output", help="for bundles, a .gz or .zst suffix compresses")
+    export.add_argument("names", nargs="*", help="presets to put in a bundle (default: all)")
+    export.set_defaults(handler=command_export)
+
+    import_parser = commands.add_parser("import", help="import a preset bundle (.jsonl[.gz|.zst]) or mapping JSON file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--presets-dir", help="where bundled presets are written (default: LM Studio's)")
+    import_parser.add_argument("--on-conflict", choices=("skip", "replace"), default="skip",
+                               help="for presets that differ from the local file")
+    import_parser.add_argument("--restart", action="store_true", help="ignore the position saved by an interrupted import")
+    import_parser.set_defaults(handler=command_import)
+
+    check = commands.add_parser("check", help="check presets against the host's RAM and VRAM")
+    check.add_argument("names", nargs="*", help="presets to check (default: the whole catalog)")
+    check.add_argument("--profile", default="host_profile.json", help="host profile JSON overriding detected values")
+    check.add_argument("--ram-gb", type=float)
+    check.add_argument("--vram-gb", type=float)
+    check.add_argument("--suggest", action="store_true", help="print settings that would fit")
+    check.add_argument("--adjust", action="store_true", help="rewrite presets that do not fit")
+    check.add_argument("--maximize-offload", action="store_true", help="also raise n_gpu_layers to use spare VRAM")
+    check.add_argument("--quiet", action="store_true", help="only report presets that do not fit")
+    check.set_defaults(handler=command_check)
+
+    tune = commands.add_parser("tune", help="pick threads, batch size, offload and mmap/mlock for this machine")
+    tune.add_argument("name")
+    tune.add_argument("--backend", choices=("auto", "llama-bench", "simulated", "none"), default=TUNING_BACKEND)
+    tune.add_argument("--force", action="store_true", help="re-run even if this machine has a stored result")
+    tune.add_argument("--apply", action="store_true", help="write the tuned settings into the preset")
+    tune.set_defaults(handler=command_tune)
+
+    bench = commands.add_parser("bench", help="benchmark presets on a fixed prompt suite (two names = A/B test)")
+    bench.add_argument("names", nargs="+")
+    bench.add_argument("--backend", choices=("openai", "fake"), default=BENCH_BACKEND)
+    bench.add_argument("--url", default=BENCH_SERVER_URL, help="OpenAI-compatible server base URL")
+    bench.add_argument("--model", default=BENCH_MODEL, help="model id to request (default: the loaded model)")
+    bench.add_argument("--server-pid", type=int, default=BENCH_SERVER_PID, help="server process to measure memory of")
+    bench.add_argument("--server-process", default=BENCH_SERVER_PROCESS, help="server process name, if no pid is given")
+    bench.add_argument("--workers", type=int, default=2, help="presets benchmarked at once by the fake backend")
+    bench.add_argument("--no-save", action="store_true", help="do not record the results for analytics")
+    bench.set_defaults(handler=command_bench)
+
+    analytics = commands.add_parser("analytics", help="show benchmark trends per preset")
+    analytics.add_argument("name", nargs="?")
+    analytics.add_argument("--last", type=int, default=20, help="runs shown in each trend")
+    analytics.set_defaults(handler=command_analytics)
+
+    chain = commands.add_parser("chain", help="stream documents through presets in order, one stage per preset")
+    chain.add_argument("names", nargs="+", help="presets, first stage first")
+    chain.add_argument("--input", required=True, help="documents, one per line ('-' for stdin)")
+    chain.add_argument("--output", help="JSONL results (default: stdout)")
+    chain.add_argument("--backend", choices=("openai", "fake"), default=BENCH_BACKEND)
+    chain.add_argument("--url", default=BENCH_SERVER_URL, help="OpenAI-compatible server base URL")
+    chain.add_argument("--concurrency", type=int, default=4, help="documents each stage handles at once")
+    chain.add_argument("--queue-size", type=int, default=16, help="documents waiting at each stage")
+    chain.add_argument("--token-buffer", type=int, default=64, help="tokens buffered between stages")
+    chain.set_defaults(handler=command_chain)
+
+    schedule = commands.add_parser("schedule", help="add, list, remove or run scheduled preset jobs")
+    schedule_actions = schedule.add_subparsers(dest="action", required=True)
+    schedule_add = schedule_actions.add_parser("add", help="schedule a preset")
+    schedule_add.add_argument("name")
+    schedule_add.add_argument("trigger", help="'every 30m', a cron expression like '0 3 * * *', or @daily")
+    schedule_add.add_argument("--prompt", action="append", help="prompt to run (repeatable; default: a health check)")
+    schedule_add.add_argument("--misfire", choices=("run_once", "skip"), default="run_once",
+                              help="what to do with a run missed while the scheduler was not running")
+    schedule_add.add_argument("--retries", type=int, default=2)
+    schedule_actions.add_parser("list", help="list scheduled jobs")
+    schedule_remove = schedule_actions.add_parser("remove", help="remove a job")
+    schedule_remove.add_argument("name", metavar="ID")
+    schedule_run = schedule_actions.add_parser("run", help="run the scheduler in the foreground")
+    schedule_run.add_argument("--once", action="store_true", help="run the jobs that are due and exit")
+    schedule_run.add_argument("--runner", choices=("lms", "fake"), default=SCHEDULE_RUNNER)
+    schedule_run.add_argument("--url", default=BENCH_SERVER_URL, help="OpenAI-compatible server base URL")
+    schedule_run.add_argument("--workers", type=int, default=SCHEDULE_WORKERS, help="job groups run at the same time")
+    schedule_run.add_argument("--warm", type=int, default=SCHEDULE_WARM_MODELS, help="models kept loaded between runs")
+    schedule.set_defaults(handler=command_schedule, workers=SCHEDULE_WORKERS, warm=SCHEDULE_WARM_MODELS,
+                          runner=SCHEDULE_RUNNER, url=BENCH_SERVER_URL)
+
+    market = commands.add_parser("market", help="browse and install presets from a registry, or serve one")
+    market_actions = market.add_subparsers(dest="action", required=True)
+    market_list = market_actions.add_parser("list", help="list the registry's presets")
+    market_list.add_argument("--filter", help="only names containing this text")
+    market_install = market_actions.add_parser("install", help="download presets into the presets directory")
+    market_install.add_argument("names", nargs="+")
+    market_install.add_argument("--presets-dir", help="where presets are written (default: LM Studio's)")
+    market_install.add_argument("--on-conflict", choices=("skip", "replace"), default="skip",
+                                help="for presets that differ from the local file")
+    for action in (market_list, market_install):
+        action.add_argument("--url", default=MARKETPLACE_URL, help="registry base URL")
+        action.add_argument("--offline", action="store_true", help="use only the response cache")
+        action.add_argument("--refresh", action="store_true", help="check the listing with the registry even if cached recently")
+    market_serve = market_actions.add_parser("serve", help="serve a directory of presets as a local registry")
+    market_serve.add_argument("directory")
+    market_serve.add_argument("--host", default="127.0.0.1")
+    market_serve.add_argument("--port", type=int, default=8765)
+    market.set_defaults(handler=command_market)
+
+    recommend = commands.add_parser("recommend", help="suggest presets for a preset's model or a model file")
+    target = recommend.add_mutually_exclusive_group(required=True)
+    target.add_argument("name", nargs="?")
+    target.add_argument("--model", help="GGUF model file to find presets for")
+    recommend.add_argument("--similar", action="store_true", help="rank by all settings, not just the model")
+    recommend.add_argument("-k", type=int, default=5, help="number of presets to suggest")
+    recommend.set_defaults(handler=command_recommend)
+
+    history = commands.add_parser("history", help="list, diff or restore revisions of a preset")
+    history.add_argument("name")
+    history.add_argument("--diff", type=int, nargs="+", metavar="REV", help="changes from REV to a later REV or the latest")
+    history.add_argument("--restore", type=int, metavar="REV")
+    history.set_defaults(handler=command_history)
+
+    sync = commands.add_parser("sync", help="commit changed presets, pull, and optionally push")
+    sync.add_argument("--repo", default=GITHUB_REPO_DIR)
+    sync.add_argument("--push", action="store_true")
+    sync.set_defaults(handler=command_sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as error:
+        print(f"{args.command}: {error}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import platform
+import subprocess
+from collections import namedtuple
+
+from gguf_metadata import cached_metadata
+from preset_db import model_type_of
+
+HOST_PROFILE_FILE = "host_profile.json"
+GIB = 1024 ** 3
+# Memory kept free for the OS and other programs.
+RAM_RESERVE_BYTES = 2 * GIB
+VRAM_RESERVE_BYTES = GIB // 2
+# GPU runtime (driver context, cuBLAS/Metal workspaces) once anything is offloaded.
+GPU_RUNTIME_BYTES = 300 * 1024 ** 2
+# Apple silicon shares RAM with the GPU; Metal allows about this much of it.
+UNIFIED_GPU_FRACTION = 0.67
+MIN_CONTEXT = 512
+MIN_BATCH = 64
+
+Estimate = namedtuple("Estimate", ["ram_bytes", "vram_bytes", "weights_bytes", "kv_bytes", "scratch_bytes",
+                                   "gpu_layers"])
+CompatibilityResult = namedtuple("CompatibilityResult", ["preset", "model_path", "estimate", "issues", "adjusted"])
+
+
+def _total_ram():
+    if hasattr(os, "sysconf"):
+        try:
+            return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError):
+            pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    return 0
+
+
+def _total_vram():
+    # Per-GPU totals from nvidia-smi; an empty list without an NVIDIA driver.
+    try:
+        result = subprocess.run(["nvidia-smi", "--query-gpu=memory.total", "--format=csv,noheader,nounits"],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return []
+    if result.returncode != 0:
+        return []
+    return [int(float(line)) * 1024 ** 2 for line in result.stdout.split() if line.strip()]
+
+
+def detect_host_profile():
+    ram_bytes = _total_ram()
+    unified = sys.platform == "darwin" and platform.machine() == "arm64"
+    if unified:
+        gpus = [int(ram_bytes * UNIFIED_GPU_FRACTION)]
+    else:
+        gpus = _total_vram()
+    return {
+        "ram_bytes": ram_bytes,
+        "gpu_vram_bytes": gpus,
+        "unified_memory": unified,
+        "ram_reserve_bytes": RAM_RESERVE_BYTES,
+        "vram_reserve_bytes": VRAM_RESERVE_BYTES,
+    }
+
+
+def load_host_profile(profile_file=HOST_PROFILE_FILE):
+    # Detected values, overridden by whatever the profile file sets, so a
+    # build machine can check presets for a different target host.
+    profile = detect_host_profile()
+    if os.path.exists(profile_file):
+        with open(profile_file, "r") as file:
+            profile.update(json.load(file))
+    return profile
+
+
+def save_host_profile(profile, profile_file=HOST_PROFILE_FILE):
+    with open(f"{profile_file}.tmp", "w") as file:
+        json.dump(profile, file, indent=2)
+    os.replace(f"{profile_file}.tmp", profile_file)
+
+
+def _budgets(profile, main_gpu=0):
+    ram_budget = max(profile["ram_bytes"] - profile.get("ram_reserve_bytes", RAM_RESERVE_BYTES), 0)
+    gpus = profile.get("gpu_vram_bytes") or []
+    vram = gpus[main_gpu] if 0 <= main_gpu < len(gpus) else (gpus[0] if gpus else 0)
+    vram_budget = max(vram - profile.get("vram_reserve_bytes", VRAM_RESERVE_BYTES), 0) if vram else 0
+    return ram_budget, vram_budget
+
+
+def estimate_memory(metadata, model_size, load_params):
+    # Follows llama.cpp's layout: weights and KV cache are split between host
+    # and GPU by offloaded layer, and the compute buffers live on the GPU
+    # whenever any layer is offloaded.
+    block_count = metadata.get("block_count") or 32
+    embedding = metadata.get("embedding_length") or 4096
+    head_count = metadata.get("head_count") or 32
+    head_count_kv = metadata.get("head_count_kv") or head_count
+    head_dim = metadata.get("key_length") or embedding // head_count
+    value_dim = metadata.get("value_length") or head_dim
+    vocab_size = metadata.get("vocab_size") or 32000
+    n_ctx = load_params.get("n_ctx") or metadata.get("context_length") or 2048
+    n_batch = min(load_params.get("n_batch") or 512, n_ctx)
+    kv_element = 2 if load_params.get("f16_kv", True) else 4
+
+    # The output layer (and embeddings) counts as one more offloadable layer.
+    total_layers = block_count + 1
+    n_gpu_layers = load_params.get("n_gpu_layers", 0)
+    gpu_layers = total_layers if n_gpu_layers is None or n_gpu_layers < 0 else min(n_gpu_layers, total_layers)
+    layer_bytes = model_size / total_layers
+
+    kv_per_layer = n_ctx * head_count_kv * (head_dim + value_dim) * kv_element
+    kv_bytes = kv_per_layer * block_count
+    kv_gpu = kv_per_layer * min(gpu_layers, block_count)
+    # Attention scores for one batch plus activations and logits.
+    scratch_bytes = 4 * n_batch * (n_ctx * head_count + 4 * embedding + vocab_size)
+
+    vram_bytes = layer_bytes * gpu_layers + kv_gpu
+    ram_bytes = layer_bytes * (total_layers - gpu_layers) + (kv_bytes - kv_gpu)
+    if gpu_layers:
+        vram_bytes += scratch_bytes + GPU_RUNTIME_BYTES
+    else:
+        ram_bytes += scratch_bytes
+    return Estimate(int(ram_bytes), int(vram_bytes), int(model_size), int(kv_bytes), int(scratch_bytes), gpu_layers)
+
+
+def _fits(estimate, profile, load_params, unified):
+    ram_budget, vram_budget = _budgets(profile, load_params.get("main_gpu", 0))
+    if unified:
+        # One pool: GPU allocations come out of RAM, within Metal's limit.
+        return (estimate.ram_bytes + estimate.vram_bytes <= ram_budget
+                and estimate.vram_bytes <= vram_budget)
+    return estimate.ram_bytes <= ram_budget and estimate.vram_bytes <= vram_budget
+
+
+def check_load_params(metadata, model_size, load_params, profile):
+    # Returns (estimate, issues) where issues are human-readable strings.
+    estimate = estimate_memory(metadata, model_size, load_params)
+    ram_budget, vram_budget = _budgets(profile, load_params.get("main_gpu", 0))
+    issues = []
+    ram_needed = estimate.ram_bytes
+    if profile.get("unified_memory"):
+        ram_needed += estimate.vram_bytes
+    if ram_needed > ram_budget:
+        issues.append(f"needs {ram_needed / GIB:.1f} GiB RAM, {ram_budget / GIB:.1f} GiB available")
+    if estimate.vram_bytes > vram_budget:
+        if vram_budget:
+            issues.append(f"needs {estimate.vram_bytes / GIB:.1f} GiB VRAM, {vram_budget / GIB:.1f} GiB available")
+        else:
+            issues.append(f"offloads {estimate.gpu_layers} layers but no GPU memory is available")
+    context_length = metadata.get("context_length")
+    if context_length and (load_params.get("n_ctx") or 0) > context_length:
+        issues.append(f"n_ctx {load_params['n_ctx']} exceeds the model's trained context of {context_length}")
+    return estimate, issues
+
+
+def fit_load_params(metadata, model_size, load_params, profile, maximize_offload=False):
+    # Returns adjusted load_params (only the changed fields) that fit the host,
+    # or None if even the smallest settings do not. Offload is reduced first,
+    # then the KV cache is shrunk by switching to f16 and halving n_ctx, then
+    # n_batch is reduced. With maximize_offload, spare VRAM is used for more
+    # GPU layers.
+    unified = profile.get("unified_memory", False)
+    params = dict(load_params)
+    total_layers = (metadata.get("block_count") or 32) + 1
+    context_length = metadata.get("context_length")
+    if context_length and (params.get("n_ctx") or 0) > context_length:
+        params["n_ctx"] = context_length
+    if params.get("n_gpu_layers") is None or params["n_gpu_layers"] < 0:
+        params["n_gpu_layers"] = total_layers
+
+    def fits():
+        return _fits(estimate_memory(metadata, model_size, params), profile, params, unified)
+
+    def most_gpu_layers():
+        # VRAM use grows with every offloaded layer, so bisect for the most that fit.
+        low, high = 0, total_layers
+        while low < high:
+            middle = (low + high + 1) // 2
+            params["n_gpu_layers"] = middle
+            if estimate_memory(metadata, model_size, params).vram_bytes <= vram_budget:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    requested_layers = params["n_gpu_layers"]
+    _, vram_budget = _budgets(profile, params.get("main_gpu", 0))
+    if maximize_offload or estimate_memory(metadata, model_size, params).vram_bytes > vram_budget:
+        best = most_gpu_layers()
+        params["n_gpu_layers"] = best if maximize_offload else min(best, requested_layers)
+    if not fits() and not params.get("f16_kv", True):
+        params["f16_kv"] = True
+    while not fits() and (params.get("n_ctx") or 2048) > MIN_CONTEXT:
+        params["n_ctx"] = max((params.get("n_ctx") or 2048) // 2, MIN_CONTEXT)
+        params["n_batch"] = min(params.get("n_batch") or 512, params["n_ctx"])
+    while not fits() and (params.get("n_batch") or 512) > MIN_BATCH:
+        params["n_batch"] = max((params.get("n_batch") or 512) // 2, MIN_BATCH)
+    if not fits():
+        return None
+    return {key: value for key, value in params.items() if load_params.get(key) != value}
+
+
+def model_paths_by_type(metadata_cache):
+    models = {}
+    for path in metadata_cache:
+        model_name = os.path.splitext(os.path.basename(path))[0]
+        models.setdefault(model_type_of(model_name), []).append(path)
+    return models
+
+
+def largest_model(model_paths, metadata_cache):
+    # (size, path, metadata) of the largest readable model, or None.
+    candidates = []
+    for path in model_paths:
+        metadata = cached_metadata(metadata_cache, path)
+        if metadata is not None:
+            candidates.append((metadata_cache[path][0], path, metadata))
+    return max(candidates, key=lambda candidate: candidate[0]) if candidates else None
+
+
+def check_preset(name, preset_data, model_paths, metadata_cache, profile, adjust=False, maximize_offload=False):
+    # Checks a preset against the largest known model it applies to. Returns
+    # a CompatibilityResult; adjusted holds the load_params changes that make
+    # it fit (None if not requested or impossible).
+    load_params = preset_data.get("load_params", {})
+    model = largest_model(model_paths, metadata_cache)
+    if model is None:
+        return CompatibilityResult(name, None, None, ["no readable model file for this preset"], None)
+    model_size, path, metadata = model
+    estimate, issues = check_load_params(metadata, model_size, load_params, profile)
+    adjusted = None
+    if adjust and (issues or maximize_offload):
+        adjusted = fit_load_params(metadata, model_size, load_params, profile, maximize_offload)
+        if adjusted is None:
+            issues.append("does not fit even with the smallest context and no GPU offload")
+    return CompatibilityResult(name, path, estimate, issues, adjusted)
+
+
+def check_catalog(database, profile, load_preset, names=None, adjust=False, maximize_offload=False, task=None):
+    # Batch mode: checks every preset (or the given names) in the catalog.
+    # load_preset(path) returns the parsed preset, e.g. PresetRepository.load_shared.
+    metadata_cache = database.setdefault("gguf_metadata", {})
+    models = model_paths_by_type(metadata_cache)
+    results = []
+    for name in (names if names is not None else sorted(database["presets"])):
+        if task is not None:
+            task.check()
+            task.report(presets_checked=len(results))
+        try:
+            preset_data = load_preset(database["presets"][name])
+        except (OSError, ValueError):
+            results.append(CompatibilityResult(name, None, None, ["preset file is unreadable"], None))
+            continue
+        results.append(check_preset(name, preset_data, models.get(name, []), metadata_cache, profile, adjust,
+                                    maximize_offload))
+    return results
+
+
+def does_not_fit(result):
+    # Presets without a readable model are reported but not counted as failing.
+    return result.estimate is not None and bool(result.issues)
+
+
+def format_result(result):
+    if result.estimate is None:
+        status = "not checked"
+    else:
+        status = "does not fit" if result.issues else "OK"
+    lines = [f"{result.preset}: {status}"]
+    if result.estimate is not None:
+        estimate = result.estimate
+        lines.append(f"  model {os.path.basename(result.model_path)}: weights {estimate.weights_bytes / GIB:.1f} GiB, "
+                     f"KV cache {estimate.kv_bytes / GIB:.2f} GiB, scratch {estimate.scratch_bytes / GIB:.2f} GiB")
+        lines.append(f"  RAM {estimate.ram_bytes / GIB:.1f} GiB, VRAM {estimate.vram_bytes / GIB:.1f} GiB "
+                     f"({estimate.gpu_layers} layers offloaded)")
+    for issue in result.issues:
+        lines.append(f"  - {issue}")
+    if result.adjusted:
+        lines.append("  suggested: " + ", ".join(f"{key}={value}" for key, value in sorted(result.adjusted.items())))
+    return "\n".join(lines)
@@ -0,0 +1,488 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+
+DATABASE_FILE = "database.json"
+MODEL_LIST_FILE = "model_list.txt"
+SQLITE_DATABASE_FILE = "database.sqlite"
+# "json" keeps everything in database.json, "sqlite" uses SQLITE_DATABASE_FILE.
+DATABASE_BACKEND = os.environ.get("PRESET_DB_BACKEND", "json")
+
+
+def model_type_of(model_name):
+    return model_name.split("-")[0]
+
+
+class ModelList(list):
+    # Behaves like the plain "models" list stored in database.json, but keeps a
+    # set of names and a count per model type so lookups don't scan the list.
+
+    def __init__(self, models=()):
+        super().__init__()
+        self._names = set()
+        self._types = {}
+        self._changes = None
+        self.extend(models)
+
+    def track_changes(self):
+        # From now on, names added and removed are recorded for changes().
+        self._changes = (set(), set())
+
+    def changes(self):
+        # (added, removed) since track_changes() or mark_saved(), or None when untracked.
+        return self._changes
+
+    def mark_saved(self):
+        if self._changes is not None:
+            self.track_changes()
+
+    def _index(self, name):
+        self._names.add(name)
+        model_type = model_type_of(name)
+        self._types[model_type] = self._types.get(model_type, 0) + 1
+        if self._changes is not None:
+            self._changes[1].discard(name)
+            self._changes[0].add(name)
+
+    def _unindex(self, name):
+        if self._changes is not None:
+            self._changes[0].discard(name)
+            self._changes[1].add(name)
+        self._names.discard(name)
+        model_type = model_type_of(name)
+        count = self._types.get(model_type, 0) - 1
+        if count > 0:
+            self._types[model_type] = count
+        else:
+            self._types.pop(model_type, None)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def has_type(self, model_type):
+        return model_type in self._types
+
+    def append(self, name):
+        if name not in self._names:
+            self._index(name)
+            super().append(name)
+
+    def extend(self, names):
+        for name in names:
+            self.append(name)
+
+    def __iadd__(self, names):
+        self.extend(names)
+        return self
+
+    def insert(self, position, name):
+        if name not in self._names:
+            self._index(name)
+            super().insert(position, name)
+
+    def remove(self, name):
+        super().remove(name)
+        self._unindex(name)
+
+    def pop(self, position=-1):
+        name = super().pop(position)
+        self._unindex(name)
+        return name
+
+    def clear(self):
+        if self._changes is not None:
+            self._changes[0].clear()
+            self._changes[1].update(self._names)
+        super().clear()
+        self._names.clear()
+        self._types.clear()
+
+    def __setitem__(self, position, value):
+        # Names stay unique: a name already elsewhere in the list is refused.
+        old_names = list.__getitem__(self, position)
+        if not isinstance(position, slice):
+            old_names, value = [old_names], [value]
+        value = list(value)
+        kept = self._names.difference(old_names)
+        if len(set(value)) != len(value) or not kept.isdisjoint(value):
+            raise ValueError("ModelList names must be unique.")
+        super().__setitem__(position, value if isinstance(position, slice) else value[0])
+        for name in old_names:
+            self._unindex(name)
+        for name in value:
+            self._index(name)
+
+    def __delitem__(self, position):
+        names = list.__getitem__(self, position)
+        super().__delitem__(position)
+        for name in names if isinstance(position, slice) else [names]:
+            self._unindex(name)
+
+
+class PresetMap(dict):
+    # The "presets" mapping (and the "gguf_metadata" cache) of a loaded
+    # catalog. It records which names were set or deleted, so a save only
+    # writes those rows and save_changes() can merge them.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._changed = set()
+        self._deleted = set()
+
+    def changes(self):
+        # (changed, deleted) names since loading or the last mark_saved().
+        return self._changed, self._deleted
+
+    def mark_saved(self):
+        self._changed = set()
+        self._deleted = set()
+
+    def _set(self, name):
+        self._deleted.discard(name)
+        self._changed.add(name)
+
+    def _unset(self, name):
+        self._changed.discard(name)
+        self._deleted.add(name)
+
+    def __setitem__(self, name, path):
+        super().__setitem__(name, path)
+        self._set(name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._unset(name)
+
+    def pop(self, name, *default):
+        if name in self:
+            self._unset(name)
+        return super().pop(name, *default)
+
+    def popitem(self):
+        name, path = super().popitem()
+        self._unset(name)
+        return name, path
+
+    def setdefault(self, name, path=None):
+        if name not in self:
+            self[name] = path
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, path in dict(*args, **kwargs).items():
+            self[name] = path
+
+    def clear(self):
+        self._changed.clear()
+        self._deleted.update(self)
+        super().clear()
+
+
+def new_database():
+    return {"presets": {}, "models": ModelList()}
+
+
+class SqliteCatalog:
+    # Stores the same {"presets": {...}, "models": [...]} structure in SQLite so
+    # a save only touches the rows that changed instead of rewriting the file.
+    # The "gguf_metadata" cache has a row per model file as well.
+
+    def __init__(self, path=SQLITE_DATABASE_FILE):
+        self.path = path
+        self._local = threading.local()
+        # The stored extras as JSON text, to write only the ones that changed.
+        self._extras = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS presets (name TEXT PRIMARY KEY, path TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+                CREATE TABLE IF NOT EXISTS extras (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+                                                     metadata TEXT);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def needs_import(self):
+        # True only for a new database file; one emptied by the user stays empty.
+        conn = self.connect()
+        return (conn.execute("PRAGMA user_version").fetchone()[0] == 0
+                and conn.execute("SELECT 1 FROM presets LIMIT 1").fetchone() is None
+                and conn.execute("SELECT 1 FROM models LIMIT 1").fetchone() is None)
+
+    def mark_initialized(self):
+        self.connect().execute("PRAGMA user_version = 1")
+
+    def load(self):
+        conn = self.connect()
+        extras = dict(conn.execute("SELECT key, value FROM extras"))
+        with self._lock:
+            self._extras = dict(extras)
+        database = {key: json.loads(value) for key, value in extras.items()}
+        database["presets"] = PresetMap(conn.execute("SELECT name, path FROM presets"))
+        database["models"] = ModelList(name for (name,) in conn.execute("SELECT name FROM models ORDER BY id"))
+        database["models"].track_changes()
+        database["gguf_metadata"] = PresetMap(
+            (path, [size, mtime_ns, json.loads(metadata)])
+            for path, size, mtime_ns, metadata in conn.execute("SELECT path, size, mtime_ns, metadata FROM metadata"))
+        return database
+
+    def _save_rows(self, database, conn):
+        # Presets, models and metadata from load() write only the rows changed
+        # since they were loaded or last saved; any other mapping is compared
+        # with the stored rows.
+        presets = database["presets"]
+        if isinstance(presets, PresetMap):
+            changed, deleted = presets.changes()
+            self.upsert_presets([(name, presets[name]) for name in changed], conn)
+            self.delete_presets(deleted, conn)
+        else:
+            stored_presets = dict(conn.execute("SELECT name, path FROM presets"))
+            self.upsert_presets([(name, path) for name, path in presets.items()
+                                 if stored_presets.get(name) != path], conn)
+            self.delete_presets([name for name in stored_presets if name not in presets], conn)
+
+        models = database["models"]
+        if not isinstance(models, ModelList):
+            models = ModelList(models)
+        if models.changes() is not None:
+            added, removed = models.changes()
+        else:
+            stored_models = {name for (name,) in conn.execute("SELECT name FROM models")}
+            added = [name for name in models if name not in stored_models]
+            removed = [name for name in stored_models if name not in models]
+        self.add_models(added, conn)
+        self.remove_models(removed, conn)
+
+        metadata = database.get("gguf_metadata", {})
+        if isinstance(metadata, PresetMap):
+            changed, deleted = metadata.changes()
+            self.upsert_metadata([(path, metadata[path]) for path in changed], conn)
+            self.delete_metadata(deleted, conn)
+        else:
+            stored_metadata = {path: [size, mtime_ns, json.loads(value)] for path, size, mtime_ns, value
+                               in conn.execute("SELECT path, size, mtime_ns, metadata FROM metadata")}
+            self.upsert_metadata([(path, entry) for path, entry in metadata.items()
+                                  if stored_metadata.get(path) != list(entry)], conn)
+            self.delete_metadata([path for path in stored_metadata if path not in metadata], conn)
+
+    def save(self, database):
+        conn = self.connect()
+        with self._lock, conn:
+            self._save_rows(database, conn)
+            if self._extras is None:
+                self._extras = dict(conn.execute("SELECT key, value FROM extras"))
+            extras = {key: json.dumps(value) for key, value in database.items()
+                      if key not in ("presets", "models", "gguf_metadata")}
+            conn.executemany("INSERT INTO extras (key, value) VALUES (?, ?) "
+                             "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                             [(key, value) for key, value in extras.items() if self._extras.get(key) != value])
+            conn.executemany("DELETE FROM extras WHERE key = ?",
+                             [(key,) for key in self._extras if key not in extras])
+            self._extras = extras
+        for key in ("presets", "models", "gguf_metadata"):
+            if hasattr(database.get(key), "mark_saved"):
+                database[key].mark_saved()
+
+    def save_changes(self, database):
+        # Writes the changes tracked in a catalog from load() in one
+        # transaction, without reading the stored catalog first.
+        conn = self.connect()
+        with self._lock, conn:
+            self._save_rows(database, conn)
+        for key in ("presets", "models", "gguf_metadata"):
+            database[key].mark_saved()
+
+    # Row writers; given conn they join the caller's transaction instead of committing.
+
+    def _write_rows(self, sql, rows, conn):
+        if conn is not None:
+            conn.executemany(sql, rows)
+            return
+        with self.connect() as conn:
+            conn.executemany(sql, rows)
+
+    def upsert_presets(self, items, conn=None):
+        self._write_rows("INSERT INTO presets (name, path) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET path = excluded.path", items, conn)
+
+    def delete_presets(self, names, conn=None):
+        self._write_rows("DELETE FROM presets WHERE name = ?", [(name,) for name in names], conn)
+
+    def add_models(self, names, conn=None):
+        self._write_rows("INSERT OR IGNORE INTO models (name) VALUES (?)", [(name,) for name in names], conn)
+
+    def remove_models(self, names, conn=None):
+        self._write_rows("DELETE FROM models WHERE name = ?", [(name,) for name in names], conn)
+
+    def upsert_metadata(self, items, conn=None):
+        # items are (path, [size, mtime_ns, metadata]) as in database["gguf_metadata"].
+        self._write_rows("INSERT INTO metadata (path, size, mtime_ns, metadata) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                         "metadata = excluded.metadata",
+                         [(path, size, mtime_ns, json.dumps(metadata)) for path, (size, mtime_ns, metadata) in items],
+                         conn)
+
+    def delete_metadata(self, paths, conn=None):
+        self._write_rows("DELETE FROM metadata WHERE path = ?", [(path,) for path in paths], conn)
+
+    def find_preset(self, name):
+        row = self.connect().execute("SELECT path FROM presets WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def backup(self, backup_file=None):
+        backup_file = backup_file or f"{self.path}.bak"
+        target = sqlite3.connect(backup_file)
+        try:
+            self.connect().backup(target)
+        finally:
+            target.close()
+
+    def import_json(self, database_file=DATABASE_FILE, model_list_file=MODEL_LIST_FILE):
+        database = new_database()
+        if os.path.exists(database_file):
+            with open(database_file, "r") as file:
+                database.update(json.load(file))
+        database["models"] = ModelList(database.get("models", []))
+        if os.path.exists(model_list_file):
+            with open(model_list_file, "r") as file:
+                database["models"].extend(line.strip() for line in file if line.strip())
+        with self.connect() as conn:
+            self.upsert_presets(list(database["presets"].items()), conn)
+            self.add_models(database["models"], conn)
+            self.upsert_metadata(list(database.get("gguf_metadata", {}).items()), conn)
+        return database
+
+
+_catalogs = {}
+# Held while a writer loads, changes and saves the catalog, so worker tasks
+# and the GUI never save over each other's changes.
+_write_lock = threading.RLock()
+
+
+def sqlite_catalog(path=SQLITE_DATABASE_FILE):
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        catalog = _catalogs[path] = SqliteCatalog(path)
+        if catalog.needs_import() and (os.path.exists(DATABASE_FILE) or os.path.exists(MODEL_LIST_FILE)):
+            catalog.import_json()
+        catalog.mark_initialized()
+    return catalog
+
+
+def load_database(database_file=None):
+    if DATABASE_BACKEND == "sqlite":
+        return sqlite_catalog(database_file or SQLITE_DATABASE_FILE).load()
+    database_file = database_file or DATABASE_FILE
+    if os.path.exists(database_file):
+        with open(database_file, "r") as file:
+            database = json.load(file)
+    else:
+        database = new_database()
+    database["presets"] = PresetMap(database.get("presets", {}))
+    database["models"] = ModelList(database.get("models", []))
+    database["models"].track_changes()
+    database["gguf_metadata"] = PresetMap(database.get("gguf_metadata", {}))
+    return database
+
+
+def save_database(database, database_file=None):
+    if DATABASE_BACKEND == "sqlite":
+        sqlite_catalog(database_file or SQLITE_DATABASE_FILE).save(database)
+    else:
+        # Written aside and swapped in, so readers never see a partial file.
+        database_file = database_file or DATABASE_FILE
+        with open(f"{database_file}.tmp", "w") as file:
+            json.dump(database, file, indent=2)
+        os.replace(f"{database_file}.tmp", database_file)
+    for key in ("presets", "models", "gguf_metadata"):
+        if hasattr(database.get(key), "mark_saved"):
+            database[key].mark_saved()
+
+
+def update_database(apply, database_file=None):
+    # Loads the catalog, calls apply(catalog) and saves it, all under the write
+    # lock, and returns what apply returned. Other writers wait meanwhile, so
+    # apply should not do slow work.
+    with _write_lock:
+        catalog = load_database(database_file)
+        result = apply(catalog)
+        save_database(catalog, database_file)
+        return result
+
+
+def save_changes(database, database_file=None):
+    # Saves what changed in a catalog from load_database() since it was loaded
+    # or last passed here: presets and model metadata set or deleted, models
+    # added or removed. They are applied to the stored catalog under the write
+    # lock, so changes other writers saved in the meantime are kept. Returns
+    # the stored catalog with them applied; with SQLite the changed rows are
+    # written directly and the given catalog is returned, so other writers'
+    # changes show up on the next load_database().
+    if DATABASE_BACKEND == "sqlite":
+        with _write_lock:
+            sqlite_catalog(database_file or SQLITE_DATABASE_FILE).save_changes(database)
+        return database
+    models = database["models"]
+    def merge(catalog):
+        for key in ("presets", "gguf_metadata"):
+            source, target = database[key], catalog[key]
+            changed, deleted = source.changes()
+            for name in deleted:
+                target.pop(name, None)
+            for name in changed:
+                target[name] = source[name]
+        added, removed = models.changes()
+        for name in removed:
+            if name in catalog["models"]:
+                catalog["models"].remove(name)
+        catalog["models"].extend(name for name in models if name in added)
+        return catalog
+    catalog = update_database(merge, database_file)
+    for key in ("presets", "models", "gguf_metadata"):
+        database[key].mark_saved()
+    return catalog
+
+
+def backup_database(database_file=None):
+    if DATABASE_BACKEND == "sqlite":
+        sqlite_catalog(database_file or SQLITE_DATABASE_FILE).backup()
+        return
+    database_file = database_file or DATABASE_FILE
+    backup_file = f"{database_file}.bak"
+    shutil.copyfile(database_file, backup_file)
+
+
+def backup_model_list(model_list_file=MODEL_LIST_FILE):
+    backup_file = f"{model_list_file}.bak"
+    shutil.copyfile(model_list_file, backup_file)
+
+
+def find_preset(name, database_file=None):
+    if DATABASE_BACKEND == "sqlite":
+        return sqlite_catalog(database_file or SQLITE_DATABASE_FILE).find_preset(name)
+    return load_database(database_file)["presets"].get(name)
+
+
+def unused_presets(database):
+    # Presets are keyed by model type (the part of the model name before the
+    # first "-"), so a preset is in use if any known model has that name or type.
+    models = database["models"]
+    if not isinstance(models, ModelList):
+        models = ModelList(models)
+    return [name for name in database["presets"] if name not in models and not models.has_type(name)]
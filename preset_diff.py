@@ -0,0 +1,59 @@
+MISSING = "<missing>"
+
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+
+class FlatPresetCache:
+    # The flattened form of each preset, kept in the preset repository next to
+    # the parsed preset, so it is evicted with it under the repository's cap.
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def get(self, path):
+        return self.repository.load_derived(path, "flat", flatten)
+
+
+def diff_presets(baseline, others, ignore=("name",)):
+    # baseline is a flattened preset, others a list of flattened presets.
+    # Returns the sorted key paths where at least one preset differs.
+    differing = set()
+    for flat in others:
+        for key, value in flat.items():
+            if key not in differing and baseline.get(key, MISSING) != value:
+                differing.add(key)
+        for key in baseline.keys() - flat.keys():
+            differing.add(key)
+    differing.difference_update(ignore)
+    return sorted(differing)
+
+
+def diff_rows(baseline, others, keys):
+    return [[baseline.get(key, MISSING) for key in keys]] + [[flat.get(key, MISSING) for key in keys] for flat in others]
+
+
+def _cell(value, max_width):
+    text = value if isinstance(value, str) else repr(value)
+    text = text.replace("\n", "\\n")
+    return text if len(text) <= max_width else f"{text[:max_width - 1]}~"
+
+
+def format_table(labels, keys, rows, max_width=24):
+    header = ["preset"] + keys
+    cells = [header] + [[_cell(value, max_width) for value in [label] + values] for label, values in zip(labels, rows)]
+    widths = [max(len(row[column]) for row in cells) for column in range(len(header))]
+    lines = []
+    for index, row in enumerate(cells):
+        lines.append("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+        if index == 0:
+            lines.append("  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,247 @@
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+from bisect import bisect_right
+
+HISTORY_DIR = "preset-history"
+# Every Nth revision is stored whole, so reading any revision applies at most
+# N - 1 patches on top of the nearest earlier snapshot.
+SNAPSHOT_INTERVAL = 32
+MAX_REVISIONS = 100
+
+
+class HistoryError(Exception):
+    pass
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old, new, path=""):
+    # A JSON patch (RFC 6902 add/remove/replace) turning old into new. Objects
+    # are compared key by key; lists and scalars are replaced whole.
+    if old == new:
+        return []
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [{"op": "replace", "path": path, "value": new}]
+    patch = []
+    for key, value in old.items():
+        if key not in new:
+            patch.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        else:
+            patch.extend(make_patch(value, new[key], f"{path}/{_escape(key)}"))
+    for key, value in new.items():
+        if key not in old:
+            patch.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+    return patch
+
+
+def apply_patch(document, patch):
+    return _apply_in_place(copy.deepcopy(document), patch)
+
+
+def _apply_in_place(document, patch):
+    for operation in patch:
+        if operation["path"] == "":
+            document = copy.deepcopy(operation["value"])
+            continue
+        tokens = [_unescape(token) for token in operation["path"].split("/")[1:]]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        key = int(tokens[-1]) if isinstance(parent, list) else tokens[-1]
+        if operation["op"] == "remove":
+            del parent[key]
+        elif operation["op"] in ("add", "replace"):
+            parent[key] = copy.deepcopy(operation["value"])
+        else:
+            raise HistoryError(f"Unsupported patch operation: {operation['op']}")
+    return document
+
+
+class PresetHistory:
+    # Revision log per preset, one JSON line per revision in
+    # <history_dir>/<name>-<hash>.jsonl. A line holds either a full snapshot
+    # or a patch against the previous revision.
+
+    def __init__(self, history_dir=HISTORY_DIR, snapshot_interval=SNAPSHOT_INTERVAL, max_revisions=MAX_REVISIONS):
+        self.history_dir = history_dir
+        self.snapshot_interval = snapshot_interval
+        self.max_revisions = max_revisions
+        self._logs = {}
+        self._files = {}
+        os.makedirs(history_dir, exist_ok=True)
+
+    def _history_file(self, name):
+        history_file = self._files.get(name)
+        if history_file is not None:
+            return history_file
+        # The readable part alone is not unique ("a b" and "a_b", or names
+        # differing in case on Windows), so a hash of the exact name follows it.
+        readable = re.sub(r"[^\w.-]", "_", name)
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+        history_file = os.path.join(self.history_dir, f"{readable}-{digest}.jsonl")
+        self._files[name] = history_file
+        return history_file
+
+    def _log(self, name):
+        # Parsed log, reused while the file is unchanged on disk.
+        history_file = self._history_file(name)
+        try:
+            stat_result = os.stat(history_file)
+        except FileNotFoundError:
+            return {"signature": None, "entries": [], "snapshots": [], "latest": None}
+        signature = (stat_result.st_mtime_ns, stat_result.st_size)
+        log = self._logs.get(name)
+        if log is not None and log["signature"] == signature:
+            return log
+        entries = []
+        with open(history_file, "r") as file:
+            for line in file:
+                if line.strip():
+                    entries.append(json.loads(line))
+        log = {"signature": signature, "entries": entries, "latest": None,
+               "snapshots": [entry["rev"] for entry in entries if "snapshot" in entry]}
+        self._logs[name] = log
+        return log
+
+    def _remember(self, name, log):
+        stat_result = os.stat(self._history_file(name))
+        log["signature"] = (stat_result.st_mtime_ns, stat_result.st_size)
+        self._logs[name] = log
+
+    def revisions(self, name):
+        # [(rev, timestamp, "snapshot" | "patch", size of the stored change)]
+        return [(entry["rev"], entry["time"], "snapshot" if "snapshot" in entry else "patch",
+                 len(entry.get("patch", ())))
+                for entry in self._log(name)["entries"]]
+
+    def latest_revision(self, name):
+        entries = self._log(name)["entries"]
+        return entries[-1]["rev"] if entries else None
+
+    def get(self, name, rev=None):
+        log = self._log(name)
+        entries = log["entries"]
+        if not entries:
+            raise HistoryError(f"No history for preset {name}.")
+        if rev is None:
+            rev = entries[-1]["rev"]
+            if log["latest"] is not None:
+                return copy.deepcopy(log["latest"])
+        first = entries[0]["rev"]
+        if not first <= rev <= entries[-1]["rev"]:
+            raise HistoryError(f"Revision {rev} of preset {name} is not in the history.")
+        # Revisions are contiguous, so rev maps straight to a position; the
+        # base snapshot is found by bisection.
+        base = log["snapshots"][bisect_right(log["snapshots"], rev) - 1]
+        preset_data = copy.deepcopy(entries[base - first]["snapshot"])
+        for entry in entries[base - first + 1:rev - first + 1]:
+            preset_data = _apply_in_place(preset_data, entry["patch"])
+        return preset_data
+
+    def record(self, name, preset_data):
+        # Returns the new revision number, or None if nothing changed.
+        preset_data = copy.deepcopy(preset_data)
+        log = self._log(name)
+        entries = log["entries"]
+        if entries:
+            previous = log["latest"] if log["latest"] is not None else self.get(name)
+            patch = make_patch(previous, preset_data)
+            if not patch:
+                return None
+            rev = entries[-1]["rev"] + 1
+            if rev - log["snapshots"][-1] >= self.snapshot_interval:
+                entry = {"rev": rev, "time": int(time.time()), "snapshot": preset_data}
+            else:
+                entry = {"rev": rev, "time": int(time.time()), "patch": patch}
+        else:
+            rev = 1
+            entry = {"rev": rev, "time": int(time.time()), "snapshot": preset_data}
+        with open(self._history_file(name), "a") as file:
+            file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        entries.append(entry)
+        if "snapshot" in entry:
+            log["snapshots"].append(rev)
+        log["latest"] = preset_data
+        self._remember(name, log)
+        # Trimming waits for a further snapshot interval of slack so the log
+        # is rewritten once per interval rather than on every revision.
+        if self.max_revisions is not None and len(entries) >= self.max_revisions + self.snapshot_interval:
+            self.prune(name, self.max_revisions)
+        return rev
+
+    def record_file(self, name, path):
+        with open(path, "r") as file:
+            return self.record(name, json.load(file))
+
+    def prune(self, name, keep=None):
+        # Drops all but the newest `keep` revisions; the oldest kept revision
+        # becomes a snapshot. Returns how many revisions were removed.
+        keep = self.max_revisions if keep is None else keep
+        log = self._log(name)
+        entries = log["entries"]
+        if len(entries) <= keep:
+            return 0
+        if keep <= 0:
+            os.remove(self._history_file(name))
+            self._logs.pop(name, None)
+            return len(entries)
+        removed = len(entries) - keep
+        first = entries[removed]
+        if "snapshot" not in first:
+            first = {"rev": first["rev"], "time": first["time"], "snapshot": self.get(name, first["rev"])}
+        kept = [first] + entries[removed + 1:]
+        history_file = self._history_file(name)
+        with open(f"{history_file}.tmp", "w") as file:
+            for entry in kept:
+                file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(f"{history_file}.tmp", history_file)
+        latest = log["latest"]
+        log = {"signature": None, "entries": kept, "latest": latest,
+               "snapshots": [entry["rev"] for entry in kept if "snapshot" in entry]}
+        self._remember(name, log)
+        return removed
+
+    def diff(self, name, old_rev, new_rev=None):
+        return make_patch(self.get(name, old_rev), self.get(name, new_rev))
+
+    def restore(self, name, rev, path, repository=None):
+        # Writes revision rev back to path and records it as a new revision.
+        preset_data = self.get(name, rev)
+        if repository is not None:
+            repository.save(path, preset_data)
+        else:
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(preset_data, file, indent=2)
+            os.replace(f"{path}.tmp", path)
+        self.record(name, preset_data)
+        return preset_data
+
+    def stats(self, name):
+        history_file = self._history_file(name)
+        return {
+            "revisions": len(self._log(name)["entries"]),
+            "snapshots": len(self._log(name)["snapshots"]),
+            "bytes": os.path.getsize(history_file) if os.path.exists(history_file) else 0,
+        }
+
+
+def format_patch(patch):
+    lines = []
+    for operation in patch:
+        path = operation["path"] or "/"
+        if operation["op"] == "remove":
+            lines.append(f"- {path}")
+        else:
+            sign = "+" if operation["op"] == "add" else "~"
+            lines.append(f"{sign} {path} = {json.dumps(operation['value'])}")
+    return "\n".join(lines)
@@ -0,0 +1,88 @@
+import bisect
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PresetIndex:
+    # Case-insensitive substring index over preset names. Queries of three or
+    # more characters intersect trigram postings; shorter ones scan the names.
+
+    def __init__(self, names=()):
+        self._names = []
+        self._keys = {}
+        self._postings = {}
+        self._last_query = None
+        self._last_results = None
+        self.update(names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def names(self):
+        return list(self._names)
+
+    def add(self, name):
+        if name in self._keys:
+            return
+        key = name.lower()
+        self._keys[name] = key
+        bisect.insort(self._names, name)
+        for trigram in _trigrams(key):
+            self._postings.setdefault(trigram, set()).add(name)
+        self._last_query = None
+
+    def remove(self, name):
+        key = self._keys.pop(name, None)
+        if key is None:
+            return
+        del self._names[bisect.bisect_left(self._names, name)]
+        for trigram in _trigrams(key):
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(name)
+                if not posting:
+                    del self._postings[trigram]
+        self._last_query = None
+
+    def update(self, names):
+        # Applies the difference between the indexed names and the given ones.
+        names = set(names)
+        for name in [name for name in self._keys if name not in names]:
+            self.remove(name)
+        added = [name for name in names if name not in self._keys]
+        if len(added) > len(self._names):
+            # Bulk load: one sort beats many insort calls.
+            for name in added:
+                key = name.lower()
+                self._keys[name] = key
+                for trigram in _trigrams(key):
+                    self._postings.setdefault(trigram, set()).add(name)
+            self._names = sorted(self._keys)
+            self._last_query = None
+        else:
+            for name in added:
+                self.add(name)
+        return added
+
+    def search(self, query):
+        query = query.strip().lower()
+        if not query:
+            return list(self._names)
+        if self._last_query is not None and query.startswith(self._last_query):
+            # Type-ahead: a longer query can only narrow the previous results.
+            candidates = self._last_results
+        elif len(query) >= 3:
+            postings = sorted((self._postings.get(trigram, set()) for trigram in _trigrams(query)), key=len)
+            matches = set.intersection(*postings) if postings and postings[0] else set()
+            candidates = sorted(matches)
+        else:
+            candidates = self._names
+        results = [name for name in candidates if query in self._keys[name]]
+        self._last_query = query
+        self._last_results = results
+        return results
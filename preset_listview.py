@@ -0,0 +1,163 @@
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+
+class VirtualListbox(tk.Frame):
+    # A Listbox replacement that only draws the rows currently in view, so
+    # replacing or filtering tens of thousands of items costs a list
+    # assignment instead of one Tk insert per item. It keeps the parts of the
+    # Listbox API the preset manager uses (get, curselection, size, ...).
+
+    def __init__(self, master, height=10, width=30, selectmode=tk.EXTENDED, font="TkDefaultFont",
+                 background="white", foreground="black", selectbackground="#0078d7", selectforeground="white",
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.selectmode = selectmode
+        self.font = tkfont.nametofont(font)
+        self.row_height = self.font.metrics("linespace") + 2
+        self.colors = (background, foreground, selectbackground, selectforeground)
+        self.canvas = tk.Canvas(self, width=width * self.font.measure("0"), height=height * self.row_height,
+                                background=background, highlightthickness=0, takefocus=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.canvas.pack(side=tk.LEFT, fill="both", expand=True)
+
+        self.items = []
+        self.top = 0
+        self._positions = {}
+        self._selected = set()
+        self._anchor = None
+        self._rows = []
+
+        self.canvas.bind("<Configure>", lambda event: self._render())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Control-Button-1>", lambda event: self._on_click(event, "toggle"))
+        self.canvas.bind("<Shift-Button-1>", lambda event: self._on_click(event, "range"))
+        self.canvas.bind("<MouseWheel>", lambda event: self.yview("scroll", -3 * (event.delta // 120 or 1), "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+
+    def _visible_rows(self):
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            height = int(self.canvas.cget("height"))
+        return max(1, height // self.row_height)
+
+    def _clamp_top(self):
+        self.top = max(0, min(self.top, len(self.items) - self._visible_rows()))
+
+    def _render(self):
+        self._clamp_top()
+        rows = self._visible_rows() + 1
+        background, foreground, selectbackground, selectforeground = self.colors
+        while len(self._rows) < rows:
+            rectangle = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+            text = self.canvas.create_text(0, 0, anchor="w", font=self.font)
+            self._rows.append((rectangle, text))
+        width = max(self.canvas.winfo_width(), int(self.canvas.cget("width")))
+        for row, (rectangle, text) in enumerate(self._rows):
+            index = self.top + row
+            if row < rows and index < len(self.items):
+                name = self.items[index]
+                selected = name in self._selected
+                y = row * self.row_height
+                self.canvas.coords(rectangle, 0, y, width, y + self.row_height)
+                self.canvas.itemconfigure(rectangle, fill=selectbackground if selected else background, state="normal")
+                self.canvas.coords(text, 3, y + self.row_height // 2)
+                self.canvas.itemconfigure(text, text=name, fill=selectforeground if selected else foreground,
+                                          state="normal")
+            else:
+                self.canvas.itemconfigure(rectangle, state="hidden")
+                self.canvas.itemconfigure(text, state="hidden")
+        if self.items:
+            self.scrollbar.set(self.top / len(self.items), min(1.0, (self.top + rows - 1) / len(self.items)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= max(1, self._visible_rows() - 1)
+            self.top += amount
+        self._render()
+
+    def see(self, index):
+        rows = self._visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self._render()
+
+    def _on_click(self, event, mode="set"):
+        self.canvas.focus_set()
+        index = self.top + event.y // self.row_height
+        if index >= len(self.items):
+            return
+        if self.selectmode in (tk.SINGLE, tk.BROWSE):
+            mode = "set"
+        name = self.items[index]
+        if mode == "toggle":
+            self._selected.symmetric_difference_update([name])
+            self._anchor = index
+        elif mode == "range" and self._anchor is not None:
+            first, last = sorted((self._anchor, index))
+            self._selected = set(self.items[first:last + 1])
+        else:
+            self._selected = {name}
+            self._anchor = index
+        self._render()
+        self.event_generate("<<ListboxSelect>>")
+
+    def set_items(self, items):
+        # Selection is kept by name, so it survives filtering and reordering.
+        items = list(items)
+        if items == self.items:
+            return
+        self.items = items
+        self._positions = {name: index for index, name in enumerate(items)}
+        self._anchor = None
+        self._render()
+
+    def curselection(self):
+        return tuple(sorted(self._positions[name] for name in self._selected if name in self._positions))
+
+    def get(self, first, last=None):
+        if isinstance(first, tuple):
+            if not first:
+                return ""
+            first = first[0]
+        if last is None:
+            return self.items[int(first)] if 0 <= int(first) < len(self.items) else ""
+        last = len(self.items) - 1 if last == tk.END else int(last)
+        return tuple(self.items[int(first):last + 1])
+
+    def size(self):
+        return len(self.items)
+
+    def selection_set(self, first, last=None):
+        last = first if last is None else (len(self.items) - 1 if last == tk.END else last)
+        self._selected.update(self.items[int(first):int(last) + 1])
+        self._render()
+
+    def selection_clear(self, first=0, last=tk.END):
+        last = len(self.items) - 1 if last == tk.END else int(last)
+        self._selected.difference_update(self.items[int(first):last + 1])
+        self._render()
+
+    def insert(self, index, *names):
+        position = len(self.items) if index == tk.END else int(index)
+        self.set_items(self.items[:position] + list(names) + self.items[position:])
+
+    def delete(self, first, last=None):
+        first = int(first)
+        last = first if last is None else (len(self.items) - 1 if last == tk.END else int(last))
+        removed = set(self.items[first:last + 1])
+        self._selected.difference_update(removed)
+        self.set_items(self.items[:first] + self.items[last + 1:])
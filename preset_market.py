@@ -0,0 +1,479 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+import http.client
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from preset_store import PRESET_SUFFIX
+
+MARKET_API = "/v1"
+MARKET_PORT = 8765
+MARKET_CACHE_DIR = "marketplace_cache"
+MARKET_CACHE_BYTES = 64 * 1024 * 1024
+# Requests in flight at once, which is also how many keep-alive connections are kept.
+MARKET_WORKERS = 8
+MARKET_TIMEOUT = 10
+# After the server can't be reached, requests are served from the cache for
+# this long before the network is tried again.
+OFFLINE_RETRY_SECONDS = 30
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+# Listing pages are reused for this long before being revalidated. Preset
+# bodies are always revalidated, except when the listing already names the
+# version in the cache.
+LISTING_MAX_AGE = 60
+# The reference server re-reads its directory at most this often.
+RESCAN_SECONDS = 2.0
+PROGRESS_EVERY = 100
+
+
+class MarketError(Exception):
+    pass
+
+
+# Reference registry: serves a directory of preset files over HTTP as a
+# local stand-in for a remote marketplace.
+#   GET /v1/presets?page=N&per_page=M  -> {"version", "page", "pages", "total", "presets": [summary]}
+#   GET /v1/presets/<name>             -> the preset file
+# Every response has an ETag and answers If-None-Match with 304. A preset's
+# ETag is the SHA-256 of its file, which the listing repeats as "digest".
+
+
+class _Registry:
+
+    def __init__(self, registry_dir):
+        self.registry_dir = registry_dir
+        self._entries = {}
+        self._snapshot = ("", [], {})
+        self._scanned = None
+        self._lock = threading.Lock()
+
+    def _read(self, path, name, signature):
+        with open(path, "rb") as file:
+            body = file.read()
+        preset_data = json.loads(body)
+        digest = hashlib.sha256(body).hexdigest()
+        summary = {"name": name, "digest": digest, "size": len(body)}
+        if isinstance(preset_data, dict):
+            for key in ("category", "notes"):
+                if isinstance(preset_data.get(key), str):
+                    summary[key] = preset_data[key]
+        return signature, body, summary
+
+    def snapshot(self):
+        # (version, [summary], {name: (signature, body, summary)}). Only files
+        # whose size or mtime changed since the last scan are read again.
+        with self._lock:
+            now = time.monotonic()
+            if self._scanned is not None and now - self._scanned < RESCAN_SECONDS:
+                return self._snapshot
+            self._scanned = now
+            entries = {}
+            changed = False
+            for dir_entry in os.scandir(self.registry_dir):
+                if not dir_entry.name.endswith(PRESET_SUFFIX) or not dir_entry.is_file():
+                    continue
+                name = dir_entry.name[:-len(PRESET_SUFFIX)]
+                stat_result = dir_entry.stat()
+                signature = (stat_result.st_size, stat_result.st_mtime_ns)
+                entry = self._entries.get(name)
+                if entry is None or entry[0] != signature:
+                    try:
+                        entry = self._read(dir_entry.path, name, signature)
+                    except (OSError, ValueError):
+                        continue
+                    changed = True
+                entries[name] = entry
+            if changed or len(entries) != len(self._entries):
+                self._entries = entries
+                listing = [entries[name][2] for name in sorted(entries)]
+                version = hashlib.sha256("\n".join(f"{entry['name']}\0{entry['digest']}"
+                                                   for entry in listing).encode("utf-8")).hexdigest()[:16]
+                self._snapshot = (version, listing, entries)
+            return self._snapshot
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    return any(candidate.strip() in (etag, "*") for candidate in header.split(","))
+
+
+class _RegistryHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep their connections open between requests.
+    # Headers and body go out as separate writes; without TCP_NODELAY each
+    # response on a kept-alive connection waits for the client's delayed ACK.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "PresetRegistry/1"
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        version, listing, entries = self.server.registry.snapshot()
+        if parts.path == f"{MARKET_API}/presets":
+            query = urllib.parse.parse_qs(parts.query)
+            try:
+                page = int(query.get("page", ["1"])[0])
+                per_page = min(int(query.get("per_page", [str(PAGE_SIZE)])[0]), MAX_PAGE_SIZE)
+            except ValueError:
+                return self._send_error(400, "page and per_page must be numbers")
+            if page < 1 or per_page < 1:
+                return self._send_error(400, "page and per_page must be positive")
+            pages = max(1, -(-len(listing) // per_page))
+            self._send(lambda: json.dumps({"version": version, "page": page, "pages": pages, "total": len(listing),
+                                           "presets": listing[(page - 1) * per_page:page * per_page]},
+                                          separators=(",", ":")).encode("utf-8"),
+                       f'"{version}-{page}-{per_page}"', f"max-age={LISTING_MAX_AGE}")
+        elif parts.path.startswith(f"{MARKET_API}/presets/"):
+            entry = entries.get(urllib.parse.unquote(parts.path[len(f"{MARKET_API}/presets/"):]))
+            if entry is None:
+                return self._send_error(404, "no such preset")
+            self._send(lambda: entry[1], f'"{entry[2]["digest"]}"', "no-cache")
+        else:
+            self._send_error(404, "not found")
+
+    def _send(self, body, etag, cache_control):
+        # body is only called when the client's copy is out of date.
+        not_modified = _etag_matches(self.headers.get("If-None-Match"), etag)
+        content = b"" if not_modified else body()
+        self.send_response(304 if not_modified else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control)
+        if not not_modified:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_error(self, status, message):
+        content = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RegistryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, registry_dir, host="127.0.0.1", port=MARKET_PORT):
+        if not os.path.isdir(registry_dir):
+            raise MarketError(f"{registry_dir} is not a directory.")
+        self.registry = _Registry(registry_dir)
+        super().__init__((host, port), _RegistryHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _ConnectionPool:
+    # Keep-alive connections to one server, shared by the client's threads.
+    # A connection whose server closed it while idle is retried once on a
+    # new connection, which is safe since every request is a GET.
+
+    def __init__(self, base_url, size=MARKET_WORKERS, timeout=MARKET_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise MarketError(f"Marketplace URL must be http:// or https://, not {base_url}.")
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connects = 0
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def get(self, path, headers):
+        # Returns (status, response headers, body).
+        for attempt in range(2):
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+            reused = connection.sock is not None
+            if not reused:
+                self.connects += 1
+            try:
+                connection.request("GET", self.prefix + path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+                return response.status, response.headers, body
+            try:
+                self._idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+            return response.status, response.headers, body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _max_age(cache_control):
+    for directive in (cache_control or "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age":
+            try:
+                return max(int(value), 0)
+            except ValueError:
+                return 0
+    return 0
+
+
+class ResponseCache:
+    # On-disk HTTP response cache. Bodies are files named by the hash of
+    # their URL; one index file keeps each URL's ETag, size and expiry in
+    # least-recently-used order, and the oldest bodies are evicted once the
+    # total passes max_bytes.
+
+    def __init__(self, cache_dir=MARKET_CACHE_DIR, max_bytes=MARKET_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_file, "r") as file:
+                self._entries = OrderedDict((key, entry) for key, entry in json.load(file).items())
+        except (OSError, ValueError):
+            pass
+        self._bytes = sum(entry[2] for entry in self._entries.values())
+        # The limit may have been lowered since the cache was written.
+        self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, url):
+        # (etag, body, expires) or None.
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._dirty = True
+        try:
+            with open(self._path(key), "rb") as file:
+                body = file.read()
+        except OSError:
+            body = None
+        if body is None or len(body) != entry[2]:
+            self._drop(key)
+            return None
+        return entry[1], body, entry[3]
+
+    def put(self, url, body, etag, expires):
+        if len(body) > self.max_bytes:
+            return
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_file = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(temp_file, "wb") as file:
+            file.write(body)
+        os.replace(temp_file, self._path(key))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = [url, etag, len(body), expires]
+            self._bytes += len(body)
+            self._dirty = True
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self._dirty = True
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def refresh(self, url, expires):
+        # After a 304: the cached body is current until `expires`.
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[3] = expires
+                self._dirty = True
+
+    def _drop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries, separators=(",", ":"))
+            self._dirty = False
+        with open(f"{self.index_file}.tmp", "w") as file:
+            file.write(data)
+        os.replace(f"{self.index_file}.tmp", self.index_file)
+
+
+class MarketplaceClient:
+    # Browses a preset registry. Listing pages and presets are fetched
+    # concurrently over pooled keep-alive connections and kept in a
+    # ResponseCache; cached responses are revalidated with If-None-Match, and
+    # a preset whose cached ETag matches the listing's digest is not
+    # requested at all. When the server can't be reached the client works
+    # from the cache alone (offline) for OFFLINE_RETRY_SECONDS, then tries
+    # the network again; offline=True keeps it on the cache for good.
+
+    def __init__(self, base_url, cache_dir=MARKET_CACHE_DIR, cache_bytes=MARKET_CACHE_BYTES, workers=MARKET_WORKERS,
+                 timeout=MARKET_TIMEOUT, offline=False):
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self.cache_only = offline
+        self._retry_at = 0.0
+        self.pool = _ConnectionPool(self.base_url, workers, timeout)
+        self.cache = ResponseCache(cache_dir, cache_bytes)
+        self.stats = {"requests": 0, "not_modified": 0, "from_cache": 0, "downloaded_bytes": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def offline(self):
+        return self.cache_only or time.monotonic() < self._retry_at
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _get(self, path, known_etag=None, revalidate=False):
+        url = self.base_url + path
+        offline = self.offline
+        cached = self.cache.get(url)
+        if cached is not None:
+            etag, body, expires = cached
+            if offline or (known_etag is not None and etag == known_etag) or \
+                    (not revalidate and time.time() < expires):
+                self._count("from_cache")
+                return body
+        elif offline:
+            raise MarketError(f"{path} is not in the marketplace cache.")
+        headers = {"Accept": "application/json"}
+        if cached is not None and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        try:
+            status, response_headers, body = self.pool.get(path, headers)
+        except (OSError, http.client.HTTPException) as error:
+            # The other requests of this listing or download skip the
+            # network rather than each waiting for its own timeout.
+            self._retry_at = time.monotonic() + OFFLINE_RETRY_SECONDS
+            if cached is None:
+                raise MarketError(f"Cannot reach the marketplace at {self.base_url}: {error}")
+            self._count("from_cache")
+            return cached[1]
+        self._count("requests")
+        cache_control = response_headers.get("Cache-Control", "")
+        expires = time.time() + _max_age(cache_control)
+        if status == 304 and cached is not None:
+            self._count("not_modified")
+            self.cache.refresh(url, expires)
+            return cached[1]
+        if status == 200:
+            self._count("downloaded_bytes", len(body))
+            if "no-store" not in cache_control:
+                self.cache.put(url, body, response_headers.get("ETag"), expires)
+            return body
+        if status == 404:
+            raise MarketError(f"{path} was not found on the marketplace.")
+        raise MarketError(f"The marketplace answered HTTP {status} for {path}.")
+
+    def _pages(self, per_page, revalidate):
+        def page(number):
+            return json.loads(self._get(f"{MARKET_API}/presets?page={number}&per_page={per_page}",
+                                        revalidate=revalidate))
+        first = page(1)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [first] + list(executor.map(page, range(2, first["pages"] + 1)))
+
+    def listing(self, per_page=PAGE_SIZE, revalidate=False, task=None):
+        # Every preset's summary ({"name", "digest", "size", ...}) in name order.
+        # revalidate checks cached pages with the server even while fresh.
+        pages = self._pages(per_page, revalidate)
+        if len({page["version"] for page in pages}) > 1 and not self.offline:
+            # The registry changed between pages, or some came from an earlier
+            # visit's cache; read them all again.
+            pages = self._pages(per_page, True)
+        self.cache.save()
+        if task is not None:
+            task.check()
+        return [entry for page in pages for entry in page["presets"]]
+
+    def fetch_presets(self, entries, task=None):
+        # Downloads the presets for listing entries. Returns ({name: preset_data},
+        # [(name, error)]).
+        def fetch(entry):
+            if task is not None and task.cancelled:
+                return entry["name"], None, None
+            try:
+                body = self._get(f"{MARKET_API}/presets/{urllib.parse.quote(entry['name'], safe='')}",
+                                 known_etag=f'"{entry["digest"]}"')
+                return entry["name"], json.loads(body), None
+            except (MarketError, ValueError) as error:
+                return entry["name"], None, str(error)
+        presets = {}
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for done, (name, preset_data, error) in enumerate(executor.map(fetch, entries), 1):
+                if error is not None:
+                    failures.append((name, error))
+                elif preset_data is not None:
+                    presets[name] = preset_data
+                if task is not None and done % PROGRESS_EVERY == 0:
+                    task.report(presets_fetched=done)
+        self.cache.save()
+        if task is not None:
+            task.check()
+        return presets, failures
+
+    def close(self):
+        self.pool.close()
+        self.cache.save()
+
+
+def format_stats(client):
+    stats = client.stats
+    offline = " Offline: served from the cache." if client.offline else ""
+    return (f"{stats['requests']} requests ({stats['not_modified']} not modified) over {client.pool.connects} "
+            f"connections, {stats['from_cache']} from cache, {stats['downloaded_bytes'] / 1024:.0f} KiB downloaded."
+            f"{offline}")
@@ -0,0 +1,252 @@
+import os
+import json
+import math
+import zlib
+import heapq
+
+from preset_compat import GIB, largest_model, model_paths_by_type
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RECOMMEND_INDEX_FILE = "recommend_index.json"
+FAMILY_BUCKETS = 16
+# How much a strong benchmark result can shrink a preset's distance (0..1).
+BENCHMARK_WEIGHT = 0.5
+
+# Preset parameters as (section, key, transform, default); each transform
+# maps the value to roughly 0..1 so no single parameter dominates.
+PARAM_FEATURES = [
+    ("load_params", "n_ctx", lambda value: math.log2(max(value, 1)) / 17, 2048),
+    ("load_params", "n_batch", lambda value: math.log2(max(value, 1)) / 12, 512),
+    ("load_params", "n_gpu_layers", lambda value: (81 if value < 0 else min(value, 81)) / 81, 0),
+    ("inference_params", "n_threads", lambda value: min(value, 64) / 64, 4),
+    ("inference_params", "temp", lambda value: min(value, 2) / 2, 0.8),
+    ("inference_params", "top_p", lambda value: value, 0.95),
+    ("inference_params", "top_k", lambda value: math.log2(max(value, 1)) / 8, 40),
+    ("inference_params", "repeat_penalty", lambda value: (value - 1) * 2, 1.1),
+]
+# Approximate bits per weight for the quantization names in gguf_metadata.FILE_TYPES.
+QUANT_BITS = {
+    "F32": 32, "F16": 16, "BF16": 16, "Q8_0": 8.5, "Q6_K": 6.6, "Q5_0": 5.5, "Q5_1": 6, "Q5_K_S": 5.5, "Q5_K_M": 5.7,
+    "Q4_0": 4.5, "Q4_1": 5, "Q4_K_S": 4.6, "Q4_K_M": 4.8, "IQ4_NL": 4.5, "IQ4_XS": 4.3, "Q3_K_S": 3.5,
+    "Q3_K_M": 3.9, "Q3_K_L": 4.3, "IQ3_XXS": 3.1, "IQ3_XS": 3.3, "IQ3_S": 3.4, "IQ3_M": 3.7, "Q2_K": 2.6,
+    "Q2_K_S": 2.5, "IQ2_XXS": 2.1, "IQ2_XS": 2.3, "IQ2_S": 2.5, "IQ2_M": 2.7, "IQ1_S": 1.6, "IQ1_M": 1.8,
+}
+# Model features: family buckets, then size and quantization, weighted above
+# the preset parameters since the model decides what settings make sense.
+FAMILY_WEIGHT = 2.0
+MODEL_WEIGHT = 1.5
+DIMENSIONS = len(PARAM_FEATURES) + FAMILY_BUCKETS + 2
+MODEL_COLUMNS = range(len(PARAM_FEATURES), DIMENSIONS)
+
+
+def _number(value, default):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def model_features(model_type, model_size=None, metadata=None):
+    # Family is hashed into buckets so unseen families need no vocabulary.
+    vector = [0.0] * (FAMILY_BUCKETS + 2)
+    vector[zlib.crc32(model_type.lower().encode("utf-8")) % FAMILY_BUCKETS] = FAMILY_WEIGHT
+    if model_size:
+        vector[FAMILY_BUCKETS] = MODEL_WEIGHT * math.log2(max(model_size / GIB, 0.125) * 8) / 10
+    quantization = (metadata or {}).get("quantization")
+    if quantization in QUANT_BITS:
+        vector[FAMILY_BUCKETS + 1] = MODEL_WEIGHT * math.log2(QUANT_BITS[quantization]) / 5
+    return vector
+
+
+def preset_features(preset_data, model_type, model_size=None, metadata=None):
+    vector = []
+    for section, key, transform, default in PARAM_FEATURES:
+        params = preset_data.get(section)
+        value = _number(params.get(key), default) if isinstance(params, dict) else default
+        vector.append(transform(value))
+    return vector + model_features(model_type, model_size, metadata)
+
+
+def benchmark_scores(history):
+    # Latest tokens/s per preset from preset_bench.load_results().
+    scores = {}
+    for name, runs in history.items():
+        rates = [run["tokens_per_second"] for run in runs if run.get("tokens_per_second")]
+        if rates:
+            scores[name] = rates[-1]
+    return scores
+
+
+class PresetRecommender:
+    # Nearest-neighbour index over preset feature vectors. Rows are updated in
+    # place and removed rows are recycled, so a rescan only recomputes the
+    # presets whose file or model changed. Distances are computed for the
+    # whole matrix at once with NumPy, or with a heap when it isn't installed.
+
+    def __init__(self):
+        self.names = []
+        self.signatures = []
+        self.rows = {}
+        self.free_rows = []
+        self.scores = {}
+        self._vectors = []
+        self._matrix = None
+        self._active = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _set_row(self, row, vector):
+        if np is None:
+            self._vectors[row] = vector
+            return
+        if self._matrix is None or row >= len(self._matrix):
+            capacity = max(64, 2 * (row + 1))
+            matrix = np.zeros((capacity, DIMENSIONS))
+            active = np.zeros(capacity, dtype=bool)
+            if self._matrix is not None:
+                matrix[:len(self._matrix)] = self._matrix
+                active[:len(self._active)] = self._active
+            self._matrix, self._active = matrix, active
+        self._matrix[row] = vector
+        self._active[row] = True
+
+    def update(self, name, vector, signature=None):
+        row = self.rows.get(name)
+        if row is None:
+            row = self.free_rows.pop() if self.free_rows else len(self.names)
+            if row == len(self.names):
+                self.names.append(name)
+                self.signatures.append(signature)
+                self._vectors.append(None)
+            else:
+                self.names[row] = name
+            self.rows[name] = row
+        self.signatures[row] = signature
+        self._set_row(row, vector)
+
+    def remove(self, name):
+        row = self.rows.pop(name, None)
+        if row is None:
+            return
+        self.names[row] = None
+        self.signatures[row] = None
+        self._vectors[row] = None
+        if self._active is not None:
+            self._active[row] = False
+        self.free_rows.append(row)
+
+    def signature(self, name):
+        row = self.rows.get(name)
+        return self.signatures[row] if row is not None else None
+
+    def set_scores(self, scores):
+        # scores maps preset name -> tokens/s; stored as 0..1 relative to the best.
+        best = max(scores.values(), default=0) or 1
+        self.scores = {name: score / best for name, score in scores.items() if score}
+
+    def nearest(self, vector, k=5, columns=None, exclude=(), weighted=True):
+        # Returns [(name, distance)] of the k closest presets. columns limits
+        # the comparison to some features, e.g. MODEL_COLUMNS for a model.
+        if not self.rows:
+            return []
+        excluded = set(exclude)
+        if np is not None:
+            query = np.asarray(vector, dtype=float)
+            matrix = self._matrix[:len(self.names)]
+            if columns is not None:
+                columns = list(columns)
+                matrix = matrix[:, columns]
+                query = query[columns]
+            distances = np.sqrt(((matrix - query) ** 2).sum(axis=1))
+            if weighted and self.scores:
+                weights = np.array([self.scores.get(name, 0) if name else 0 for name in self.names])
+                distances = distances * (1 - BENCHMARK_WEIGHT * weights)
+            distances[~self._active[:len(self.names)]] = np.inf
+            for name in excluded:
+                if name in self.rows:
+                    distances[self.rows[name]] = np.inf
+            count = min(k, len(distances))
+            candidates = np.argpartition(distances, count - 1)[:count]
+            ordered = candidates[np.argsort(distances[candidates])]
+            return [(self.names[row], float(distances[row])) for row in ordered if np.isfinite(distances[row])]
+        columns = list(columns) if columns is not None else range(DIMENSIONS)
+
+        def distance(row):
+            stored = self._vectors[row]
+            value = math.sqrt(sum((stored[column] - vector[column]) ** 2 for column in columns))
+            if weighted:
+                value *= 1 - BENCHMARK_WEIGHT * self.scores.get(self.names[row], 0)
+            return value
+        rows = (row for name, row in self.rows.items() if name not in excluded)
+        return [(self.names[row], value) for value, row in heapq.nsmallest(k, ((distance(row), row) for row in rows))]
+
+    def similar_presets(self, name, k=5):
+        row = self.rows.get(name)
+        if row is None:
+            return []
+        vector = self._matrix[row] if np is not None else self._vectors[row]
+        return self.nearest(vector, k, exclude=(name,))
+
+    def recommend_for_model(self, model_type, model_size=None, metadata=None, k=5, exclude=()):
+        query = [0.0] * len(PARAM_FEATURES) + model_features(model_type, model_size, metadata)
+        return self.nearest(query, k, columns=MODEL_COLUMNS, exclude=exclude)
+
+    def sync(self, database, load_preset, task=None):
+        # Brings the index up to date with the catalog. Only presets whose file
+        # (size, mtime) or model file changed are re-read. Returns how many
+        # rows were recomputed.
+        metadata_cache = database.setdefault("gguf_metadata", {})
+        models = model_paths_by_type(metadata_cache)
+        presets = database["presets"]
+        for name in [name for name in self.rows if name not in presets]:
+            self.remove(name)
+        updated = 0
+        for name, path in presets.items():
+            if task is not None and updated % 1000 == 0:
+                task.check()
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                self.remove(name)
+                continue
+            model_paths = models.get(name, [])
+            models_signature = sorted([model_path] + metadata_cache[model_path][:2] for model_path in model_paths)
+            signature = [stat_result.st_size, stat_result.st_mtime_ns, models_signature]
+            if self.signature(name) == signature:
+                continue
+            try:
+                preset_data = load_preset(path)
+            except (OSError, ValueError):
+                self.remove(name)
+                continue
+            found = largest_model(model_paths, metadata_cache)
+            model_size, _, metadata = found if found is not None else (None, None, None)
+            self.update(name, preset_features(preset_data, name, model_size, metadata), signature)
+            updated += 1
+        return updated
+
+    def save(self, index_file=RECOMMEND_INDEX_FILE):
+        rows = {}
+        for name, row in self.rows.items():
+            vector = self._matrix[row].tolist() if np is not None else self._vectors[row]
+            rows[name] = [self.signatures[row], vector]
+        with open(f"{index_file}.tmp", "w") as file:
+            json.dump({"dimensions": DIMENSIONS, "rows": rows}, file, separators=(",", ":"))
+        os.replace(f"{index_file}.tmp", index_file)
+
+    @classmethod
+    def load(cls, index_file=RECOMMEND_INDEX_FILE):
+        recommender = cls()
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, "r") as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                return recommender
+            # A changed feature layout makes the stored vectors meaningless.
+            if data.get("dimensions") == DIMENSIONS:
+                for name, (signature, vector) in data["rows"].items():
+                    recommender.update(name, vector, signature)
+        return recommender
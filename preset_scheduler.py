@@ -0,0 +1,607 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import calendar
+import threading
+import traceback
+import subprocess
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from preset_bench import PROMPT_SUITE, FakeBackend, OpenAIBackend
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+SCHEDULE_FILE = "schedule.json"
+SCHEDULE_RESULTS_FILE = "schedule_results.jsonl"
+SCHEDULER_WORKERS = 2
+WARM_POOL_SIZE = 2
+# A run this late is still made under the "skip" misfire policy.
+MISFIRE_GRACE_SECONDS = 300
+DEFAULT_RETRIES = 2
+RETRY_DELAY_SECONDS = 30
+# Longest the background loop sleeps; each pass rereads the schedule, so
+# jobs added by another process (the CLI) are noticed within this time.
+MAX_IDLE_SECONDS = 60
+# Wait before the background loop tries again after an unexpected error.
+ERROR_RETRY_SECONDS = 30
+MISFIRE_POLICIES = ("run_once", "skip")
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def _cron_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ScheduleError(f"Invalid cron step {step_text!r}.")
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            if not (start_text.isdigit() and end_text.isdigit()):
+                raise ScheduleError(f"Invalid cron range {part!r}.")
+            start, end = int(start_text), int(end_text)
+        elif part.isdigit():
+            start = int(part)
+            end = high if step > 1 else start
+        else:
+            raise ScheduleError(f"Invalid cron field {part!r}.")
+        if start < low or end > high or start > end:
+            raise ScheduleError(f"Cron value {part!r} is outside {low}-{high}.")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    # Five-field cron expression: minute hour day-of-month month day-of-week,
+    # in local time. As in cron, when both day fields are restricted a day
+    # matching either one fires.
+
+    def __init__(self, expression):
+        self.expression = CRON_ALIASES.get(expression.strip(), expression.strip())
+        fields = self.expression.split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Cron expression {expression!r} needs five fields.")
+        self.minutes = _cron_field(fields[0], 0, 59)
+        self.hours = _cron_field(fields[1], 0, 23)
+        self.days = _cron_field(fields[2], 1, 31)
+        self.months = _cron_field(fields[3], 1, 12)
+        # Sunday is 0 or 7.
+        self.weekdays = {day % 7 for day in _cron_field(fields[4], 0, 7)}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Skips whole months, days and hours that cannot match; five years
+        # covers every valid expression, including 29 February.
+        limit = moment + timedelta(days=5 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                days_in_month = calendar.monthrange(moment.year, moment.month)[1]
+                moment = moment.replace(day=1, hour=0, minute=0) + timedelta(days=days_in_month)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ScheduleError(f"Cron expression {self.expression!r} never fires.")
+
+
+class IntervalTrigger:
+    # Fires every `seconds`, aligned to the job's start so runs do not drift.
+
+    def __init__(self, seconds, start=None):
+        if seconds <= 0:
+            raise ScheduleError("Interval must be positive.")
+        self.seconds = seconds
+        self.start = start
+
+    def next_after(self, timestamp):
+        start = self.start if self.start is not None else timestamp
+        if timestamp < start:
+            return start
+        return start + (int((timestamp - start) // self.seconds) + 1) * self.seconds
+
+
+def parse_trigger(spec, start=None):
+    # "every 30m" / "every 2h" / "every 90s", or a cron expression or alias.
+    spec = spec.strip()
+    if spec.lower().startswith("every "):
+        amount = spec[6:].strip().lower()
+        unit = INTERVAL_UNITS.get(amount[-1:])
+        number = amount[:-1] if unit else amount
+        try:
+            seconds = float(number) * (unit or 1)
+        except ValueError:
+            raise ScheduleError(f"Invalid interval {spec!r}.")
+        return IntervalTrigger(seconds, start)
+    return CronTrigger(spec)
+
+
+class FakeRunner:
+    # Deterministic runner for tests. Loading and running only sleep for the
+    # configured times and are counted, so warm-pool hits and batching can be
+    # checked without LM Studio.
+    name = "fake"
+
+    def __init__(self, load_seconds=0.0, run_seconds=0.0, fail_presets=()):
+        self.load_seconds = load_seconds
+        self.run_seconds = run_seconds
+        self.fail_presets = set(fail_presets)
+        self.loads = 0
+        self.unloads = 0
+        self.runs = 0
+        self._backend = FakeBackend()
+        self._lock = threading.Lock()
+
+    def load(self, key, model_path, preset_data):
+        time.sleep(self.load_seconds)
+        with self._lock:
+            self.loads += 1
+        return key
+
+    def run(self, handle, preset_data, prompt):
+        time.sleep(self.run_seconds)
+        with self._lock:
+            self.runs += 1
+        if preset_data.get("name") in self.fail_presets:
+            raise RuntimeError(f"{preset_data.get('name')} failed")
+        return "".join(self._backend.stream(preset_data, prompt))
+
+    def unload(self, handle):
+        with self._lock:
+            self.unloads += 1
+
+
+class LmsRunner:
+    # Loads models with LM Studio's `lms` command under a per-preset
+    # identifier and sends prompts to its OpenAI-compatible server.
+    name = "lms"
+
+    def __init__(self, server_url="http://localhost:1234/v1", executable="lms"):
+        self.server_url = server_url
+        self.executable = executable
+
+    def _lms(self, *args):
+        result = subprocess.run([self.executable, *args], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"lms {args[0]} failed")
+
+    def load(self, key, model_path, preset_data):
+        if not model_path:
+            raise RuntimeError(f"No model file found for preset {preset_data.get('name')}.")
+        identifier = f"preset-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+        command = ["load", model_path, "--identifier", identifier, "--yes"]
+        n_ctx = preset_data.get("load_params", {}).get("n_ctx")
+        if n_ctx:
+            command += ["--context-length", str(n_ctx)]
+        self._lms(*command)
+        return identifier
+
+    def run(self, handle, preset_data, prompt):
+        return "".join(OpenAIBackend(self.server_url, model=handle).stream(preset_data, prompt))
+
+    def unload(self, handle):
+        self._lms("unload", handle)
+
+
+def make_runner(name, server_url=None):
+    if name == "fake":
+        return FakeRunner()
+    if name == "lms":
+        if not shutil.which("lms"):
+            raise ScheduleError("The lms command was not found; install LM Studio's CLI or use the fake runner.")
+        return LmsRunner(server_url) if server_url else LmsRunner()
+    raise ScheduleError(f"Unknown scheduler runner {name}.")
+
+
+class WarmPool:
+    # Keeps up to `size` model/preset pairs loaded, evicting the least
+    # recently used idle one. Models still in use by another job are never
+    # unloaded; the pool grows past `size` until they are released.
+
+    def __init__(self, runner, size=WARM_POOL_SIZE):
+        self.runner = runner
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._loaded = OrderedDict()
+        self._users = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, model_path, preset_data):
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        # One load per key; other jobs for the same model wait for it.
+        with key_lock:
+            with self._lock:
+                if key in self._loaded:
+                    self.hits += 1
+                    self._loaded.move_to_end(key)
+                    self._users[key] = self._users.get(key, 0) + 1
+                    return self._loaded[key]
+                self.misses += 1
+            handle = self.runner.load(key, model_path, preset_data)
+            with self._lock:
+                self._loaded[key] = handle
+                self._users[key] = self._users.get(key, 0) + 1
+                evicted = self._evict()
+        for old_handle in evicted:
+            self.runner.unload(old_handle)
+        return handle
+
+    def release(self, key):
+        with self._lock:
+            self._users[key] -= 1
+            evicted = self._evict()
+        for old_handle in evicted:
+            self.runner.unload(old_handle)
+
+    def _evict(self):
+        evicted = []
+        for key in list(self._loaded):
+            if len(self._loaded) <= self.size:
+                break
+            if not self._users.get(key):
+                evicted.append(self._loaded.pop(key))
+                self._users.pop(key, None)
+        return evicted
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def clear(self):
+        with self._lock:
+            handles = list(self._loaded.values())
+            self._loaded.clear()
+            self._users.clear()
+        for handle in handles:
+            self.runner.unload(handle)
+
+
+def catalog_resolver(database, load_preset):
+    # resolve(preset) -> (preset_data, model_key, model_path) for the catalog.
+    # The key ties the model file to the load parameters, so presets sharing
+    # both reuse one loaded model.
+    from preset_compat import largest_model, model_paths_by_type
+
+    def resolve(name):
+        preset_file = database["presets"].get(name)
+        if not preset_file:
+            raise ScheduleError(f"No preset found for {name}.")
+        preset_data = load_preset(preset_file)
+        metadata_cache = database.setdefault("gguf_metadata", {})
+        model = largest_model(model_paths_by_type(metadata_cache).get(name, []), metadata_cache)
+        model_path = model[1] if model is not None else None
+        load_params = json.dumps(preset_data.get("load_params", {}), sort_keys=True)
+        return preset_data, f"{model_path or name}|{hashlib.sha1(load_params.encode('utf-8')).hexdigest()[:12]}", model_path
+    return resolve
+
+
+class _FileLock:
+    # Exclusive lock between processes on a lock file next to the schedule.
+    # Where neither fcntl nor msvcrt exists it does nothing.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            while True:
+                try:
+                    # Gives up after about 10 seconds, so keep trying.
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class Scheduler:
+    # Persistent job scheduler. Jobs live in `schedule_file` with their next
+    # run time, so runs missed while the program was closed are handled by
+    # the misfire policy on the next start. Due jobs are grouped by model and
+    # each group runs back to back on one worker, holding its model in the
+    # warm pool; at most `max_concurrency` groups run at once. The schedule
+    # is reread under a file lock before every change, so other processes
+    # (the CLI) can add and remove jobs while it runs.
+
+    def __init__(self, runner, resolve, schedule_file=SCHEDULE_FILE, results_file=SCHEDULE_RESULTS_FILE,
+                 max_concurrency=SCHEDULER_WORKERS, pool_size=WARM_POOL_SIZE, clock=time.time, on_result=None,
+                 on_error=None):
+        self.runner = runner
+        self.resolve = resolve
+        self.schedule_file = schedule_file
+        self.results_file = results_file
+        self.clock = clock
+        self.on_result = on_result
+        # Called with exceptions the background loop survived; printed when None.
+        self.on_error = on_error
+        self.pool = WarmPool(runner, pool_size)
+        self.jobs = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._next_id = 1
+        with self._lock, self._file_lock():
+            self._reload()
+
+    def _file_lock(self):
+        return _FileLock(f"{self.schedule_file}.lock")
+
+    def _reload(self):
+        # Called with both locks held, before changing and saving the jobs.
+        if not os.path.exists(self.schedule_file):
+            return
+        with open(self.schedule_file, "r") as file:
+            stored = json.load(file)
+        self.jobs = {job["id"]: job for job in stored.get("jobs", [])}
+        # Kept in the file so an id is not reused after the newest job is removed.
+        self._next_id = max(stored.get("next_id", 1), max((int(job_id) for job_id in self.jobs), default=0) + 1)
+
+    def _save(self):
+        with open(f"{self.schedule_file}.tmp", "w") as file:
+            json.dump({"jobs": sorted(self.jobs.values(), key=lambda job: int(job["id"])), "next_id": self._next_id},
+                      file, indent=2)
+        os.replace(f"{self.schedule_file}.tmp", self.schedule_file)
+
+    def add_job(self, preset, trigger, prompts=None, misfire="run_once", retries=DEFAULT_RETRIES,
+                retry_delay=RETRY_DELAY_SECONDS):
+        if misfire not in MISFIRE_POLICIES:
+            raise ScheduleError(f"Misfire policy must be one of {', '.join(MISFIRE_POLICIES)}.")
+        now = self.clock()
+        parsed = parse_trigger(trigger, now)
+        with self._lock, self._file_lock():
+            self._reload()
+            job_id = str(self._next_id)
+            self._next_id += 1
+            self.jobs[job_id] = {
+                "id": job_id,
+                "preset": preset,
+                "trigger": trigger,
+                "start": now,
+                "prompts": list(prompts or PROMPT_SUITE[:1]),
+                "misfire": misfire,
+                "retries": retries,
+                "retry_delay": retry_delay,
+                "next_run": parsed.next_after(now),
+                "attempt": 0,
+                "last_run": None,
+                "last_status": None,
+            }
+            self._save()
+        self._wake.set()
+        return job_id
+
+    def remove_job(self, job_id):
+        with self._lock, self._file_lock():
+            self._reload()
+            if self.jobs.pop(job_id, None) is None:
+                return False
+            self._save()
+        return True
+
+    def next_run(self):
+        with self._lock:
+            return min((job["next_run"] for job in self.jobs.values() if job["id"] not in self._running),
+                       default=None)
+
+    def _reschedule(self, job, after):
+        job["attempt"] = 0
+        job["next_run"] = parse_trigger(job["trigger"], job["start"]).next_after(after)
+
+    def _record(self, result):
+        with open(self.results_file, "a") as file:
+            file.write(json.dumps(result, separators=(",", ":")) + "\n")
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _due(self, now):
+        # Applies the misfire policy and returns the jobs to run now.
+        due = []
+        skipped = []
+        with self._lock, self._file_lock():
+            self._reload()
+            for job in self.jobs.values():
+                if job["id"] in self._running or job["next_run"] > now:
+                    continue
+                late = now - job["next_run"]
+                if job["misfire"] == "skip" and job["attempt"] == 0 and late > MISFIRE_GRACE_SECONDS:
+                    skipped.append({"job": job["id"], "preset": job["preset"], "time": now, "status": "skipped",
+                                    "scheduled": job["next_run"]})
+                    self._reschedule(job, now)
+                    continue
+                self._running.add(job["id"])
+                due.append(dict(job))
+            if skipped:
+                self._save()
+        try:
+            for result in skipped:
+                self._record(result)
+        except BaseException:
+            self._release(due)
+            raise
+        return due
+
+    def _run_job(self, job, handle, preset_data, now):
+        outputs = []
+        start = time.perf_counter()
+        for prompt in job["prompts"]:
+            outputs.append(self.runner.run(handle, preset_data, prompt))
+        return {"job": job["id"], "preset": job["preset"], "time": now, "status": "ok", "attempt": job["attempt"] + 1,
+                "latency": time.perf_counter() - start, "output": outputs[0][:500] if outputs else ""}
+
+    def _run_batch(self, key, model_path, items):
+        # items: [(job, preset_data)] sharing one model; it stays acquired for the whole batch.
+        results = []
+        handle = load_error = None
+        try:
+            handle = self.pool.acquire(key, model_path, items[0][1])
+        except Exception as error:
+            load_error = error
+        try:
+            for job, preset_data in items:
+                now = self.clock()
+                if load_error is not None:
+                    result = {"job": job["id"], "preset": job["preset"], "time": now, "status": "failed",
+                              "attempt": job["attempt"] + 1, "error": f"load failed: {load_error}"}
+                else:
+                    try:
+                        result = self._run_job(job, handle, preset_data, now)
+                    except Exception as error:
+                        result = {"job": job["id"], "preset": job["preset"], "time": now, "status": "failed",
+                                  "attempt": job["attempt"] + 1, "error": str(error)}
+                self._finish(job, result)
+                results.append(result)
+        finally:
+            if load_error is None:
+                self.pool.release(key)
+            # Should a save fail, the rest of the batch is due again rather than stuck.
+            self._release([job for job, _ in items])
+        return results
+
+    def _release(self, jobs):
+        with self._lock:
+            self._running.difference_update(job["id"] for job in jobs)
+
+    def _finish(self, job, result):
+        with self._lock, self._file_lock():
+            self._running.discard(job["id"])
+            self._reload()
+            stored = self.jobs.get(job["id"])
+            if stored is not None:
+                stored["last_run"] = result["time"]
+                stored["last_status"] = result["status"]
+                if result["status"] == "failed" and stored["attempt"] < stored["retries"]:
+                    # Retries back off exponentially from retry_delay.
+                    stored["next_run"] = result["time"] + stored["retry_delay"] * 2 ** stored["attempt"]
+                    stored["attempt"] += 1
+                else:
+                    self._reschedule(stored, max(result["time"], stored["next_run"]))
+                self._save()
+        self._record(result)
+        self._wake.set()
+
+    def dispatch(self, now=None):
+        # Starts every due job and returns the futures of the batches started.
+        now = self.clock() if now is None else now
+        batches = OrderedDict()
+        due = sorted(self._due(now), key=lambda job: job["next_run"])
+        try:
+            for job in due:
+                try:
+                    preset_data, key, model_path = self.resolve(job["preset"])
+                except Exception as error:
+                    self._finish(job, {"job": job["id"], "preset": job["preset"], "time": now, "status": "failed",
+                                       "attempt": job["attempt"] + 1, "error": str(error)})
+                    continue
+                batches.setdefault(key, (model_path, []))[1].append((job, preset_data))
+        except BaseException:
+            self._release(due)
+            raise
+        return [self._executor.submit(self._run_batch, key, model_path, items)
+                for key, (model_path, items) in batches.items()]
+
+    def run_pending(self, now=None):
+        # Runs every due job and waits for them; returns their results.
+        results = []
+        for future in self.dispatch(now):
+            results.extend(future.result())
+        return results
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.dispatch()
+                next_run = self.next_run()
+                delay = MAX_IDLE_SECONDS if next_run is None else min(max(next_run - self.clock(), 0), MAX_IDLE_SECONDS)
+            except Exception as error:
+                # A failed save or record must not end the thread; try again later.
+                if self.on_error is not None:
+                    self.on_error(error)
+                else:
+                    traceback.print_exception(type(error), error, error.__traceback__)
+                delay = ERROR_RETRY_SECONDS
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="preset-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, unload=True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
+        if unload:
+            self.pool.clear()
+
+
+def format_job(job):
+    def when(timestamp):
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "never"
+    status = f", last {job['last_status']} at {when(job['last_run'])}" if job["last_status"] else ""
+    retry = f" (retry {job['attempt']}/{job['retries']})" if job["attempt"] else ""
+    return f"{job['id']:>3}  {job['preset']}  [{job['trigger']}]  next {when(job['next_run'])}{retry}{status}"
@@ -0,0 +1,38 @@
+import os
+
+from model_scanner import DEFAULT_EXCLUDE
+
+CONFIG_PRESETS_DIR = os.environ.get("LM_STUDIO_PRESETS_DIR", r"C:\Users\Admin\.cache\lm-studio\config-presets")
+INCREMENTAL_SCAN = True
+SCAN_WORKERS = 8
+SCAN_MAX_DEPTH = None
+SCAN_EXCLUDE = DEFAULT_EXCLUDE
+# "flat" copies preset files as-is, "dedup" also records them in the content-addressed preset store.
+PRESET_STORAGE = "flat"
+GITHUB_REPO_URL = "https://github.com/your-username/lmstudio.git"
+# The git work tree synced with GITHUB_REPO_URL, cloned on the first sync if missing.
+GITHUB_REPO_DIR = os.environ.get("LM_STUDIO_PRESETS_REPO", "lmstudio")
+# With SYNC_AUTO_COMMIT edited presets are committed in the background once this many are pending
+# or this many seconds have passed; otherwise they wait for "Push to GitHub".
+SYNC_AUTO_COMMIT = False
+SYNC_COMMIT_THRESHOLD = 20
+SYNC_COMMIT_INTERVAL = 60.0
+SYNC_AUTO_PUSH = False
+# "auto" benchmarks with llama-bench when it is installed, "simulated" uses the stand-in runner, "none" tunes from CPU topology only.
+TUNING_BACKEND = "auto"
+# "openai" benchmarks against an OpenAI-compatible server (LM Studio's local server), "fake" is deterministic.
+BENCH_BACKEND = "openai"
+BENCH_SERVER_URL = "http://localhost:1234/v1"
+# Model id sent to the server; None uses the model it has loaded.
+BENCH_MODEL = None
+# The server process whose peak memory is recorded, by pid or else by name; with neither it is not recorded.
+BENCH_SERVER_PID = None
+BENCH_SERVER_PROCESS = "LM Studio"
+# "lms" loads models through LM Studio's CLI for scheduled runs, "fake" only simulates them.
+SCHEDULE_RUNNER = "lms"
+# Scheduled job groups run at the same time, and models kept loaded between runs.
+SCHEDULE_WORKERS = 2
+SCHEDULE_WARM_MODELS = 2
+# Preset registry browsed by Browse Marketplace; `preset_cli.py market serve DIR` runs one locally.
+MARKETPLACE_URL = "http://127.0.0.1:8765"
+MARKETPLACE_CACHE_BYTES = 64 * 1024 * 1024
@@ -0,0 +1,151 @@
+import os
+import copy
+import json
+import hashlib
+
+STORE_DIR = "preset-store"
+PRESET_SUFFIX = ".preset.json"
+# Top-level fields that commonly differ between otherwise identical presets.
+# They are kept per preset; everything else goes into the shared body.
+OVERLAY_FIELDS = ("name", "category", "notes", "favorite")
+
+
+def split_preset(preset_data):
+    body = {key: value for key, value in preset_data.items() if key not in OVERLAY_FIELDS}
+    overlay = {key: value for key, value in preset_data.items() if key in OVERLAY_FIELDS}
+    # Hash a key-sorted form so key order doesn't split identical bodies, but
+    # store the body in its original order so materialized files look the same.
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return digest, json.dumps(body, separators=(",", ":")), overlay
+
+
+class PresetStore:
+    # Content-addressed preset storage: each distinct parameter body is stored
+    # once under objects/ and index.json maps preset names to (body, overlay).
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, "objects")
+        self.index_file = os.path.join(store_dir, "index.json")
+        self._bodies = {}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as file:
+                self.index = json.load(file)
+        else:
+            self.index = {"presets": {}}
+
+    def _object_file(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.json")
+
+    def save_index(self):
+        with open(f"{self.index_file}.tmp", "w") as file:
+            json.dump(self.index, file, separators=(",", ":"))
+        os.replace(f"{self.index_file}.tmp", self.index_file)
+
+    def add(self, name, preset_data, save=True):
+        digest, text, overlay = split_preset(preset_data)
+        object_file = self._object_file(digest)
+        if digest not in self._bodies and not os.path.exists(object_file):
+            os.makedirs(os.path.dirname(object_file), exist_ok=True)
+            with open(f"{object_file}.tmp", "w") as file:
+                file.write(text)
+            os.replace(f"{object_file}.tmp", object_file)
+        self.index["presets"][name] = {"body": digest, "overlay": overlay}
+        if save:
+            self.save_index()
+        return digest
+
+    def add_file(self, path, name=None, save=True):
+        with open(path, "r") as file:
+            preset_data = json.load(file)
+        if name is None:
+            name = os.path.basename(path)[:-len(PRESET_SUFFIX)] if path.endswith(PRESET_SUFFIX) else os.path.basename(path)
+        return self.add(name, preset_data, save)
+
+    def pack_directory(self, directory):
+        packed = 0
+        skipped = []
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(PRESET_SUFFIX):
+                try:
+                    self.add_file(os.path.join(directory, file_name), save=False)
+                    packed += 1
+                except (OSError, ValueError):
+                    skipped.append(file_name)
+        self.save_index()
+        return packed, skipped
+
+    def _body(self, digest):
+        body = self._bodies.get(digest)
+        if body is None:
+            with open(self._object_file(digest), "r") as file:
+                body = self._bodies[digest] = json.load(file)
+        return body
+
+    def __contains__(self, name):
+        return name in self.index["presets"]
+
+    def names(self):
+        return list(self.index["presets"])
+
+    def get(self, name):
+        entry = self.index["presets"][name]
+        preset_data = copy.deepcopy(self._body(entry["body"]))
+        preset_data.update(copy.deepcopy(entry["overlay"]))
+        # Keep LM Studio's usual key order: name first, then the parameters.
+        ordered = {key: preset_data.pop(key) for key in ("name",) if key in preset_data}
+        ordered.update(preset_data)
+        return ordered
+
+    def duplicate(self, name, new_name, overlay=None):
+        # overlay=None renames the copy to "<new_name> Preset"; {} keeps every overlay field.
+        entry = self.index["presets"][name]
+        new_overlay = dict(entry["overlay"])
+        new_overlay.update(overlay if overlay is not None else {"name": f"{new_name} Preset"})
+        self.index["presets"][new_name] = {"body": entry["body"], "overlay": new_overlay}
+        self.save_index()
+
+    def remove(self, name, save=True):
+        self.index["presets"].pop(name, None)
+        if save:
+            self.save_index()
+
+    def materialize(self, name, path):
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self.get(name), file, indent=2)
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def materialize_all(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        return [self.materialize(name, os.path.join(directory, f"{name}{PRESET_SUFFIX}")) for name in self.names()]
+
+    def garbage_collect(self):
+        referenced = {entry["body"] for entry in self.index["presets"].values()}
+        removed = 0
+        for shard in os.listdir(self.objects_dir):
+            shard_dir = os.path.join(self.objects_dir, shard)
+            for file_name in os.listdir(shard_dir):
+                if file_name[:-len(".json")] not in referenced:
+                    os.remove(os.path.join(shard_dir, file_name))
+                    self._bodies.pop(file_name[:-len(".json")], None)
+                    removed += 1
+        return removed
+
+    def stats(self, flat_directory=None):
+        store_bytes = os.path.getsize(self.index_file) if os.path.exists(self.index_file) else 0
+        objects = 0
+        for shard in os.listdir(self.objects_dir):
+            shard_dir = os.path.join(self.objects_dir, shard)
+            for file_name in os.listdir(shard_dir):
+                store_bytes += os.path.getsize(os.path.join(shard_dir, file_name))
+                objects += 1
+        stats = {"presets": len(self.index["presets"]), "objects": objects, "store_bytes": store_bytes}
+        if flat_directory is not None:
+            flat_bytes = sum(os.path.getsize(os.path.join(flat_directory, file_name))
+                             for file_name in os.listdir(flat_directory) if file_name.endswith(PRESET_SUFFIX))
+            stats["flat_bytes"] = flat_bytes
+            stats["saved_bytes"] = flat_bytes - store_bytes
+        return stats
@@ -0,0 +1,173 @@
+import os
+import json
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+SYNC_STATE_FILE = "sync_state.json"
+COMMIT_THRESHOLD = 20
+COMMIT_INTERVAL_SECONDS = 60.0
+COMMIT_MESSAGE = "Update presets"
+
+
+class SyncError(Exception):
+    pass
+
+
+class PresetSync:
+    # Keeps a list of preset files changed since the last sync and stages only
+    # those, instead of `git add --update` over the whole work tree. Changes
+    # are committed together once `commit_threshold` files are pending or
+    # `commit_interval` seconds after the first change (None turns either off;
+    # nothing is committed while repo_dir is not a work tree), and git runs on a
+    # single background thread so callers never wait on the network and two
+    # git commands never compete for the repository's index.lock.
+
+    def __init__(self, repo_dir, state_file=SYNC_STATE_FILE, commit_threshold=COMMIT_THRESHOLD,
+                 commit_interval=COMMIT_INTERVAL_SECONDS, auto_push=True, on_result=None, remote_url=None):
+        self.repo_dir = os.path.abspath(repo_dir)
+        self.state_file = state_file
+        self.commit_threshold = commit_threshold
+        self.commit_interval = commit_interval
+        self.auto_push = auto_push
+        self.on_result = on_result
+        self.remote_url = remote_url
+        self._lock = threading.Lock()
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = set()
+        if os.path.exists(state_file):
+            with open(state_file, "r") as file:
+                self._pending = set(json.load(file).get("pending", []))
+
+    def _git(self, *args):
+        result = subprocess.run(["git", "-C", self.repo_dir, *args], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SyncError(result.stderr.strip() or result.stdout.strip() or f"git {args[0]} failed")
+        return result.stdout
+
+    def is_work_tree(self):
+        result = subprocess.run(["git", "-C", self.repo_dir, "rev-parse", "--is-inside-work-tree"],
+                                capture_output=True, text=True)
+        return result.returncode == 0 and result.stdout.strip() == "true"
+
+    def _save_state(self):
+        with open(f"{self.state_file}.tmp", "w") as file:
+            json.dump({"pending": sorted(self._pending)}, file)
+        os.replace(f"{self.state_file}.tmp", self.state_file)
+
+    def pending(self):
+        with self._lock:
+            return sorted(self._pending)
+
+    def mark_changed(self, paths):
+        # Paths inside the repository work tree are recorded; if any are
+        # outside it, SyncError names them once the others are recorded.
+        added = 0
+        outside = []
+        with self._lock:
+            for path in paths:
+                try:
+                    relative = os.path.relpath(os.path.abspath(path), self.repo_dir)
+                except ValueError:
+                    # On another drive.
+                    relative = os.pardir
+                if relative.startswith(os.pardir) or os.path.isabs(relative):
+                    outside.append(path)
+                    continue
+                relative = relative.replace(os.sep, "/")
+                if relative not in self._pending:
+                    self._pending.add(relative)
+                    added += 1
+            if added:
+                self._save_state()
+            count = len(self._pending)
+            if count and self._timer is None and self.commit_interval is not None:
+                self._timer = threading.Timer(self.commit_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.commit_threshold is not None and count >= self.commit_threshold:
+            self.flush()
+        if outside:
+            raise SyncError(f"{len(outside)} changed presets are outside the repository {self.repo_dir} "
+                            f"and will not be synced, e.g. {outside[0]}")
+        return added
+
+    def commit_pending(self, message=COMMIT_MESSAGE):
+        # Stages and commits the pending files; returns how many were committed.
+        with self._lock:
+            paths = sorted(self._pending)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not paths:
+            return 0
+        # git add fails on a path that is neither on disk nor tracked, such as
+        # a preset created and deleted again before the sync, so paths gone
+        # from disk are staged as deletions instead; untracked ones are no-ops.
+        present = [path for path in paths if os.path.lexists(os.path.join(self.repo_dir, path))]
+        missing = sorted(set(paths).difference(present))
+        if present:
+            self._git("add", "-A", "--", *present)
+        if missing:
+            self._git("rm", "--cached", "--ignore-unmatch", "-q", "--", *missing)
+        staged = self._git("diff", "--cached", "--name-only", "-z", "--", *paths).split("\0")
+        staged = [path for path in staged if path]
+        if staged:
+            self._git("commit", "-m", message, "--", *staged)
+        with self._lock:
+            self._pending.difference_update(paths)
+            self._save_state()
+        return len(staged)
+
+    def pull(self):
+        if self.remote_url and not os.path.exists(self.repo_dir):
+            result = subprocess.run(["git", "clone", self.remote_url, self.repo_dir], capture_output=True, text=True)
+            if result.returncode != 0:
+                raise SyncError(result.stderr.strip() or "git clone failed")
+            return
+        self._git("pull", "--no-edit")
+
+    def push(self):
+        self._git("push")
+
+    def sync(self, push=True):
+        committed = self.commit_pending()
+        self.pull()
+        if push:
+            self.push()
+        return committed
+
+    def _background_sync(self, push):
+        # Pending files are kept, not committed, until repo_dir is a work tree.
+        if not self.is_work_tree():
+            return 0
+        return self.sync(push)
+
+    def flush(self, push=None):
+        # Commits and syncs in the background; returns a Future.
+        push = self.auto_push if push is None else push
+        future = self._executor.submit(self._background_sync, push)
+        if self.on_result is not None:
+            future.add_done_callback(self.on_result)
+        return future
+
+    def pull_async(self):
+        future = self._executor.submit(self.pull)
+        if self.on_result is not None:
+            future.add_done_callback(self.on_result)
+        return future
+
+    def submit(self, func, *args):
+        # Runs func(*args) on the sync thread after the git work already
+        # queued there; returns a Future. on_result is not called.
+        return self._executor.submit(func, *args)
+
+    def close(self, flush=True):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if flush and self._pending:
+            self.flush()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,294 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import hashlib
+import platform
+import subprocess
+
+from preset_compat import GIB, detect_host_profile, estimate_memory, fit_load_params, largest_model, model_paths_by_type
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TUNING_RESULTS_FILE = "tuning_results.json"
+BATCH_SIZES = (128, 256, 512, 1024)
+# Keep this share of available memory free before pinning a model with mlock.
+MLOCK_HEADROOM = 0.8
+BENCH_PROMPT_TOKENS = 512
+BENCH_GEN_TOKENS = 128
+# Model size the simulated backend assumes when the preset's model has no
+# cached metadata: a 7B model at 4-bit quantization.
+SIMULATED_MODEL_BYTES = 4 * 1024 ** 3
+
+
+def _read_text(path):
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_topology():
+    # Cores this process may run on, physical cores and NUMA nodes.
+    logical = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    physical = psutil.cpu_count(logical=False) if psutil is not None else None
+    if not physical:
+        cores = set()
+        for topology in glob.glob("/sys/devices/system/cpu/cpu[0-9]*/topology"):
+            package = _read_text(os.path.join(topology, "physical_package_id"))
+            core = _read_text(os.path.join(topology, "core_id"))
+            if core is not None:
+                cores.add((package, core))
+        physical = len(cores) or None
+    if not physical and sys.platform == "darwin":
+        try:
+            # Performance cores only; llama.cpp runs slower when it spills onto efficiency cores.
+            output = subprocess.run(["sysctl", "-n", "hw.perflevel0.physicalcpu"], capture_output=True, text=True).stdout
+            physical = int(output.strip() or 0) or None
+        except (OSError, ValueError):
+            physical = None
+    physical = min(physical or logical, logical)
+    numa_nodes = len(glob.glob("/sys/devices/system/node/node[0-9]*")) or 1
+    cpu_model = platform.processor()
+    cpuinfo = _read_text("/proc/cpuinfo") or ""
+    for line in cpuinfo.splitlines():
+        if line.startswith("model name"):
+            cpu_model = line.split(":", 1)[1].strip()
+            break
+    return {"logical": logical, "physical": physical, "numa_nodes": numa_nodes, "cpu_model": cpu_model}
+
+
+def available_memory():
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    meminfo = _read_text("/proc/meminfo") or ""
+    for line in meminfo.splitlines():
+        if line.startswith("MemAvailable:"):
+            return int(line.split()[1]) * 1024
+    return detect_host_profile()["ram_bytes"]
+
+
+def host_key(topology, profile):
+    # Identifies the machine a tuning result was measured on.
+    host = {
+        "node": platform.node(),
+        "cpu_model": topology["cpu_model"],
+        "logical": topology["logical"],
+        "physical": topology["physical"],
+        "numa_nodes": topology["numa_nodes"],
+        "ram_gib": round(profile["ram_bytes"] / GIB),
+        "gpu_vram_bytes": profile.get("gpu_vram_bytes") or [],
+    }
+    return hashlib.sha256(json.dumps(host, sort_keys=True).encode("utf-8")).hexdigest()[:16], host
+
+
+def load_tuning_results(results_file=TUNING_RESULTS_FILE):
+    if os.path.exists(results_file):
+        try:
+            with open(results_file, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_tuning_results(results, results_file=TUNING_RESULTS_FILE):
+    with open(f"{results_file}.tmp", "w") as file:
+        json.dump(results, file, indent=2)
+    os.replace(f"{results_file}.tmp", results_file)
+
+
+class SimulatedBackend:
+    # Deterministic stand-in for a real runner. Generation is bound by memory
+    # bandwidth over the weights left on the CPU, prompt processing by compute.
+    # Threads beyond the physical cores, or spread over NUMA nodes, cost
+    # throughput the way they do in llama.cpp, so the tuner can be exercised
+    # without inference hardware.
+    name = "simulated"
+
+    def __init__(self, topology, model_size, block_count=32, memory_bandwidth_gbs=50.0, gpu_bandwidth_gbs=400.0,
+                 core_gflops=60.0):
+        self.topology = topology
+        self.model_size = model_size
+        self.block_count = block_count
+        self.memory_bandwidth = memory_bandwidth_gbs * 1e9
+        self.gpu_bandwidth = gpu_bandwidth_gbs * 1e9
+        self.core_flops = core_gflops * 1e9
+        self.runs = 0
+
+    def _thread_efficiency(self, threads):
+        physical = self.topology["physical"]
+        per_node = max(physical // self.topology["numa_nodes"], 1)
+        efficiency = min(threads, physical) / physical
+        if threads > physical:
+            # Hyperthreads fight over the same cores.
+            efficiency *= 1 - 0.15 * (threads - physical) / physical
+        if threads > per_node:
+            efficiency *= 0.8
+        return efficiency
+
+    def measure(self, load_params, inference_params):
+        self.runs += 1
+        threads = inference_params.get("n_threads") or 1
+        batch = load_params.get("n_batch") or 512
+        total_layers = self.block_count + 1
+        gpu_layers = max(min(load_params.get("n_gpu_layers") or 0, total_layers), 0)
+        cpu_bytes = self.model_size * (total_layers - gpu_layers) / total_layers
+        gpu_bytes = self.model_size - cpu_bytes
+        # Memory bandwidth saturates well before all cores are busy.
+        bandwidth = self.memory_bandwidth * min(1.0, 2.5 * self._thread_efficiency(threads))
+        seconds_per_token = cpu_bytes / bandwidth + gpu_bytes / self.gpu_bandwidth
+        if not load_params.get("use_mmap", True):
+            seconds_per_token *= 1.01
+        flops_per_token = 2 * self.model_size * 2
+        batch_efficiency = batch / (batch + 96) * (1 - max(batch - 512, 0) / 4096)
+        prompt_rate = self.core_flops * self.topology["physical"] * self._thread_efficiency(threads) * batch_efficiency
+        return {"tokens_per_second": 1 / seconds_per_token, "prompt_tokens_per_second": prompt_rate / flops_per_token}
+
+
+class LlamaBenchBackend:
+    # Times the real model with llama.cpp's llama-bench.
+    name = "llama-bench"
+
+    def __init__(self, model_path, executable="llama-bench", repetitions=3):
+        self.model_path = model_path
+        self.executable = executable
+        self.repetitions = repetitions
+
+    def measure(self, load_params, inference_params):
+        command = [self.executable, "-m", self.model_path, "-o", "json", "-r", str(self.repetitions),
+                   "-p", str(BENCH_PROMPT_TOKENS), "-n", str(BENCH_GEN_TOKENS),
+                   "-t", str(inference_params.get("n_threads") or 1),
+                   "-b", str(load_params.get("n_batch") or 512),
+                   "-ngl", str(max(load_params.get("n_gpu_layers") or 0, 0)),
+                   "-mmp", "1" if load_params.get("use_mmap", True) else "0"]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "llama-bench failed")
+        rates = {}
+        for run in json.loads(result.stdout):
+            key = "tokens_per_second" if run.get("n_gen") else "prompt_tokens_per_second"
+            rates[key] = run["avg_ts"]
+        return rates
+
+
+def make_backend(name, model_path, topology, model_size, metadata):
+    # "auto" uses llama-bench when it is installed and otherwise tunes from
+    # topology alone; "none" always does.
+    if name == "auto":
+        name = "llama-bench" if shutil.which("llama-bench") and model_path else "none"
+    if name == "llama-bench":
+        return LlamaBenchBackend(model_path)
+    if name == "simulated":
+        return SimulatedBackend(topology, model_size or SIMULATED_MODEL_BYTES, metadata.get("block_count") or 32)
+    return None
+
+
+def thread_candidates(topology):
+    physical = topology["physical"]
+    candidates = {physical, max(physical // 2, 1), topology["logical"]}
+    if physical > 2:
+        candidates.add(physical - 1)
+    if topology["numa_nodes"] > 1:
+        candidates.add(max(physical // topology["numa_nodes"], 1))
+    return sorted(candidates)
+
+
+def tune_preset(preset_data, model, topology, profile, free_memory, backend=None, batch_sizes=BATCH_SIZES, task=None):
+    # model is (size, path, metadata) from preset_compat.largest_model, or
+    # None. Returns {"load_params": ..., "inference_params": ..., "rates": ...,
+    # "measurements": [...]} holding only the fields the tuner sets.
+    load_params = dict(preset_data.get("load_params", {}))
+    inference_params = dict(preset_data.get("inference_params", {}))
+    measurements = []
+
+    if model is not None:
+        model_size, _, metadata = model
+        fitted = fit_load_params(metadata, model_size, load_params, profile, maximize_offload=True)
+        if fitted:
+            load_params.update(fitted)
+        estimate = estimate_memory(metadata, model_size, load_params)
+        # Pin the model only when it fits comfortably; otherwise let mmap page it.
+        load_params["use_mmap"] = True
+        load_params["use_mlock"] = estimate.ram_bytes < free_memory * MLOCK_HEADROOM
+    n_ctx = load_params.get("n_ctx") or 2048
+    batch_sizes = [size for size in batch_sizes if size <= n_ctx] or [min(batch_sizes)]
+
+    def run(threads, batch):
+        if task is not None:
+            task.check()
+        trial_load = dict(load_params, n_batch=batch)
+        rates = backend.measure(trial_load, dict(inference_params, n_threads=threads))
+        measurements.append({"n_threads": threads, "n_batch": batch, **rates})
+        if task is not None:
+            task.report(benchmark_runs=len(measurements))
+        return rates
+
+    if backend is None:
+        # Without measurements: one thread per physical core on a single NUMA
+        # node, since llama.cpp's generation is memory bound.
+        threads = max(topology["physical"] // topology["numa_nodes"], 1)
+        batch = 512 if 512 in batch_sizes else max(batch_sizes)
+        rates = {}
+    else:
+        # Threads decide generation speed; the batch size mostly affects prompt processing.
+        batch = 512 if 512 in batch_sizes else max(batch_sizes)
+        by_threads = {threads: run(threads, batch) for threads in thread_candidates(topology)}
+        threads = max(by_threads, key=lambda candidate: (by_threads[candidate]["tokens_per_second"],
+                                                         by_threads[candidate].get("prompt_tokens_per_second", 0)))
+        by_batch = {batch: by_threads[threads]}
+        for size in batch_sizes:
+            if size not in by_batch:
+                by_batch[size] = run(threads, size)
+        batch = max(by_batch, key=lambda size: by_batch[size].get("prompt_tokens_per_second", 0))
+        rates = by_batch[batch]
+
+    load_params["n_batch"] = batch
+    tuned_load = {key: load_params[key] for key in ("n_batch", "n_gpu_layers", "use_mmap", "use_mlock")
+                  if key in load_params}
+    return {"load_params": tuned_load, "inference_params": {"n_threads": threads}, "rates": rates,
+            "measurements": measurements}
+
+
+def optimize_preset(name, preset_data, database, backend_name="auto", force=False, results_file=TUNING_RESULTS_FILE,
+                    profile=None, task=None):
+    # Tunes a catalog preset for this machine. Results are stored per host and
+    # model file, so asking again is answered from the store unless force is
+    # set. Returns (result, cached).
+    from preset_compat import load_host_profile
+
+    profile = profile or load_host_profile()
+    topology = cpu_topology()
+    key, host = host_key(topology, profile)
+    metadata_cache = database.setdefault("gguf_metadata", {})
+    model = largest_model(model_paths_by_type(metadata_cache).get(name, []), metadata_cache)
+    if model is not None:
+        size, path, _ = model
+        result_key = f"{name}|{path}|{size}|{metadata_cache[path][1]}|{backend_name}"
+    else:
+        result_key = f"{name}||{backend_name}"
+
+    results = load_tuning_results(results_file)
+    host_results = results.setdefault(key, {"host": host, "presets": {}})
+    if not force and result_key in host_results["presets"]:
+        return host_results["presets"][result_key], True
+
+    size, path, metadata = model if model is not None else (0, None, {})
+    backend = make_backend(backend_name, path, topology, size, metadata)
+    result = tune_preset(preset_data, model, topology, profile, available_memory(), backend, task=task)
+    result["backend"] = backend.name if backend is not None else "none"
+    host_results["presets"][result_key] = result
+    save_tuning_results(results, results_file)
+    return result, False
+
+
+def tuned_fields(result):
+    # The result as dotted preset fields for preset_batch.apply_patch.
+    fields = {f"load_params.{key}": value for key, value in result["load_params"].items()}
+    fields.update({f"inference_params.{key}": value for key, value in result["inference_params"].items()})
+    return fields
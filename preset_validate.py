@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRESET_SUFFIX = ".preset.json"
+MAX_GPUS = 16
+NAN = float("nan")
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_UNREADABLE = 2
+
+NUMERIC_COLUMNS = {
+    "n_ctx": ("load_params", "n_ctx"),
+    "n_batch": ("load_params", "n_batch"),
+    "n_gpu_layers": ("load_params", "n_gpu_layers"),
+    "main_gpu": ("load_params", "main_gpu"),
+    "n_threads": ("inference_params", "n_threads"),
+    "top_k": ("inference_params", "top_k"),
+    "top_p": ("inference_params", "top_p"),
+    "temp": ("inference_params", "temp"),
+    "repeat_penalty": ("inference_params", "repeat_penalty"),
+    "mirostat": ("inference_params", "mirostat"),
+    "mirostat_tau": ("inference_params", "mirostat_tau"),
+    "mirostat_eta": ("inference_params", "mirostat_eta"),
+}
+
+# Each rule is evaluated on whole columns at once. Missing values are NaN, and
+# every comparison with NaN is false, so a missing parameter never fails a
+# range check on its own. The same expressions also work on plain floats,
+# which is how rules run when NumPy isn't installed.
+RULES = [
+    ("error", "top_p", "top_p must be in (0, 1]",
+     lambda c: (c["top_p"] <= 0) | (c["top_p"] > 1)),
+    ("error", "n_batch", "n_batch must not exceed n_ctx",
+     lambda c: c["n_batch"] > c["n_ctx"]),
+    ("error", "n_ctx", "n_ctx must be positive",
+     lambda c: c["n_ctx"] <= 0),
+    ("error", "n_gpu_layers", "n_gpu_layers must be >= 0",
+     lambda c: c["n_gpu_layers"] < 0),
+    ("error", "tensor_split", f"tensor_split must have between 1 and {MAX_GPUS} entries",
+     lambda c: (c["tensor_split_len"] < 1) | (c["tensor_split_len"] > MAX_GPUS)),
+    ("error", "main_gpu", "main_gpu must index into tensor_split",
+     lambda c: (c["tensor_split_len"] > 1) & (c["main_gpu"] >= c["tensor_split_len"])),
+    ("error", "mirostat", "mirostat must be 0, 1 or 2",
+     lambda c: (c["mirostat"] == c["mirostat"]) & (c["mirostat"] != 0) & (c["mirostat"] != 1)
+     & (c["mirostat"] != 2)),
+    ("error", "mirostat_tau", "mirostat_tau must be positive when mirostat is enabled",
+     lambda c: (c["mirostat"] > 0) & ((c["mirostat_tau"] <= 0) | (c["mirostat_tau"] != c["mirostat_tau"]))),
+    ("error", "mirostat_eta", "mirostat_eta must be in (0, 1] when mirostat is enabled",
+     lambda c: (c["mirostat"] > 0) & ((c["mirostat_eta"] <= 0) | (c["mirostat_eta"] > 1)
+                                      | (c["mirostat_eta"] != c["mirostat_eta"]))),
+    ("warning", "temp", "temp is negative",
+     lambda c: c["temp"] < 0),
+    ("warning", "top_k", "top_k is negative",
+     lambda c: c["top_k"] < 0),
+    ("warning", "n_threads", "n_threads should be positive",
+     lambda c: c["n_threads"] <= 0),
+    ("warning", "repeat_penalty", "repeat_penalty below 1 encourages repetition",
+     lambda c: c["repeat_penalty"] < 1),
+]
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return NAN
+    return float(value)
+
+
+def _load(path):
+    try:
+        with open(path, "rb") as file:
+            preset_data = json.loads(file.read())
+        if not isinstance(preset_data, dict):
+            return path, None, "preset is not a JSON object"
+        return path, preset_data, None
+    except (OSError, ValueError) as error:
+        return path, None, str(error)
+
+
+def preset_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(PRESET_SUFFIX))
+        else:
+            files.append(path)
+    return files
+
+
+def build_table(presets):
+    # presets is a list of parsed preset dicts; returns one column per parameter.
+    columns = {name: [] for name in NUMERIC_COLUMNS}
+    columns["tensor_split_len"] = []
+    for preset_data in presets:
+        for name, (section, key) in NUMERIC_COLUMNS.items():
+            params = preset_data.get(section)
+            columns[name].append(_number(params.get(key)) if isinstance(params, dict) else NAN)
+        load_params = preset_data.get("load_params")
+        tensor_split = load_params.get("tensor_split") if isinstance(load_params, dict) else None
+        columns["tensor_split_len"].append(float(len(tensor_split)) if isinstance(tensor_split, list) else NAN)
+    if np is not None:
+        columns = {name: np.array(values, dtype=np.float64) for name, values in columns.items()}
+    return columns
+
+
+def check_table(columns, count):
+    # Returns a list of (row, severity, code, message).
+    issues = []
+    if np is not None:
+        with np.errstate(invalid="ignore"):
+            for severity, code, message, rule in RULES:
+                for row in np.flatnonzero(rule(columns)):
+                    issues.append((int(row), severity, code, message))
+    else:
+        for row in range(count):
+            values = {name: column[row] for name, column in columns.items()}
+            for severity, code, message, rule in RULES:
+                if rule(values):
+                    issues.append((row, severity, code, message))
+    issues.sort(key=lambda issue: issue[0])
+    return issues
+
+
+def validate_presets(presets):
+    return check_table(build_table(presets), len(presets))
+
+
+def validate_files(paths, max_workers=8):
+    # Returns (issues, unreadable): issues as (path, severity, code, message),
+    # unreadable as (path, error).
+    files = preset_files(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        loaded = list(executor.map(_load, files))
+    valid = [(path, preset_data) for path, preset_data, error in loaded if error is None]
+    unreadable = [(path, error) for path, preset_data, error in loaded if error is not None]
+    issues = [(valid[row][0], severity, code, message)
+              for row, severity, code, message in validate_presets([preset_data for _, preset_data in valid])]
+    return issues, unreadable
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate LM Studio preset files.")
+    parser.add_argument("paths", nargs="+", help="preset files or directories of *.preset.json files")
+    parser.add_argument("--strict", action="store_true", help="treat warnings as errors")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+
+    issues, unreadable = validate_files(args.paths)
+    if not args.quiet:
+        for path, error in unreadable:
+            print(f"{path}: unreadable: {error}")
+        for path, severity, code, message in issues:
+            print(f"{path}: {severity}: {code}: {message}")
+    errors = sum(1 for issue in issues if issue[1] == "error")
+    warnings = len(issues) - errors
+    print(f"{len(unreadable)} unreadable, {errors} errors, {warnings} warnings", file=sys.stderr)
+    if unreadable:
+        return EXIT_UNREADABLE
+    if errors or (args.strict and warnings):
+        return EXIT_INVALID
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
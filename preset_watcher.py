@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+from collections import namedtuple
+
+from model_scanner import MODEL_EXTENSION, scan_directory
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+PRESET_EXTENSION = ".preset.json"
+DEBOUNCE_SECONDS = 0.5
+MAX_DEBOUNCE_SECONDS = 3.0
+POLL_INTERVAL_SECONDS = 2.0
+LATENCY_SAMPLES = 1000
+
+# kind is "created", "deleted", "modified" or "moved"; changed_at is the wall
+# clock time the change is believed to have happened, used for latency.
+WatchEvent = namedtuple("WatchEvent", ["kind", "path", "dest_path", "changed_at"])
+
+
+def _coalesce(previous, event):
+    if previous is None:
+        return event
+    if previous.kind == "created" and event.kind == "modified":
+        return previous._replace(changed_at=event.changed_at)
+    if previous.kind == "created" and event.kind == "deleted":
+        return None
+    if previous.kind == "deleted" and event.kind == "created":
+        return event._replace(kind="modified")
+    # A pending move is keyed by its destination, so later events there follow it.
+    if previous.kind == "moved" and event.kind == "modified":
+        return previous._replace(changed_at=event.changed_at)
+    if previous.kind == "moved" and event.kind == "deleted":
+        return event._replace(path=previous.path)
+    if previous.kind == "moved" and event.kind == "moved":
+        return event._replace(path=previous.path)
+    return event
+
+
+class _Debouncer:
+    # Collects events per path and hands them over as one batch once the
+    # watched trees have been quiet for `delay` seconds (or after `max_delay`
+    # during a continuous burst).
+
+    def __init__(self, callback, delay=DEBOUNCE_SECONDS, max_delay=MAX_DEBOUNCE_SECONDS):
+        self.callback = callback
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._first_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        with self._lock:
+            key = event.path
+            merged = _coalesce(self._pending.pop(key, None), event)
+            if merged is not None:
+                self._pending[merged.dest_path or key] = merged
+            now = time.monotonic()
+            if self._first_at is None:
+                self._first_at = now
+            if self._timer is not None:
+                self._timer.cancel()
+            delay = min(self.delay, max(0.0, self._first_at + self.max_delay - now))
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            batch = list(self._pending.values())
+            self._pending.clear()
+            self._first_at = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if batch:
+            self.callback(batch)
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending.clear()
+
+
+class _NativeHandler(FileSystemEventHandler):
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ("created", "deleted", "modified", "moved"):
+            return
+        dest_path = getattr(event, "dest_path", None) or None
+        self.watcher.emit(WatchEvent(event.event_type, event.src_path, dest_path, time.time()))
+
+
+class CatalogWatcher:
+    # Watches model directories and the preset directory and calls on_changes
+    # with coalesced batches of WatchEvents from a background thread. Uses
+    # watchdog when it is installed, otherwise polls with the stat-cache scanner.
+
+    def __init__(self, model_dirs, presets_dir, on_changes, debounce=DEBOUNCE_SECONDS,
+                 poll_interval=POLL_INTERVAL_SECONDS, native=True):
+        self.model_dirs = [os.path.abspath(path) for path in model_dirs]
+        self.presets_dir = os.path.abspath(presets_dir)
+        self.on_changes = on_changes
+        self.poll_interval = poll_interval
+        self.native = native and Observer is not None
+        self.latencies = []
+        self._debouncer = _Debouncer(on_changes, debounce)
+        self._observer = None
+        self._poll_thread = None
+        self._stop = threading.Event()
+        self._poll_cache = {"version": 1, "roots": {}}
+
+    @property
+    def mode(self):
+        return "native" if self.native else "polling"
+
+    def _relevant(self, path):
+        return path.endswith(MODEL_EXTENSION) or path.endswith(PRESET_EXTENSION)
+
+    def emit(self, event):
+        if self._relevant(event.path) or (event.dest_path and self._relevant(event.dest_path)):
+            self._debouncer.add(event)
+
+    def start(self):
+        self._stop.clear()
+        if self.native:
+            self._observer = Observer()
+            handler = _NativeHandler(self)
+            for path in self.model_dirs:
+                self._observer.schedule(handler, path, recursive=True)
+            self._observer.schedule(handler, self.presets_dir, recursive=False)
+            self._observer.start()
+        else:
+            # The first poll only records the current state.
+            self._poll(initial=True)
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="catalog-watcher", daemon=True)
+            self._poll_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
+        self._debouncer.flush()
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self._poll()
+
+    def _poll(self, initial=False):
+        roots = [(path, None, MODEL_EXTENSION) for path in self.model_dirs]
+        roots.append((self.presets_dir, 0, PRESET_EXTENSION))
+        for root, max_depth, extension in roots:
+            if not os.path.isdir(root):
+                continue
+            old_dirs = self._poll_cache["roots"].get(root, {})
+            old_signatures = {os.path.join(path, name): signature
+                              for path, entry in old_dirs.items() for name, signature in entry["files"].items()}
+            result = scan_directory(root, self._poll_cache, max_depth=max_depth, extension=extension)
+            if initial:
+                continue
+            self._emit_poll_result(result, old_signatures)
+
+    def _emit_poll_result(self, result, old_signatures):
+        added = {path: self._signature(path) for path in result.added}
+        # A removed and an added file with the same size and inode is a rename.
+        moved_from = {}
+        for path in result.removed:
+            size, mtime_ns, inode = old_signatures[path]
+            moved_from[(size, inode)] = path
+        for path, signature in added.items():
+            source = moved_from.pop((signature[0], signature[2]), None) if signature else None
+            changed_at = signature[1] / 1e9 if signature else time.time()
+            if source is not None:
+                self.emit(WatchEvent("moved", source, path, changed_at))
+            else:
+                self.emit(WatchEvent("created", path, None, changed_at))
+        for path in moved_from.values():
+            self.emit(WatchEvent("deleted", path, None, time.time()))
+        for path in result.modified:
+            signature = self._signature(path)
+            self.emit(WatchEvent("modified", path, None, signature[1] / 1e9 if signature else time.time()))
+
+    def _signature(self, path):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+    def record_applied(self, events):
+        # Called once a batch has reached the UI; keeps change-to-UI latencies.
+        now = time.time()
+        self.latencies.extend(max(0.0, now - event.changed_at) for event in events)
+        del self.latencies[:-LATENCY_SAMPLES]
+
+    def latency_report(self):
+        if not self.latencies:
+            return {"mode": self.mode, "events": 0}
+        samples = sorted(self.latencies)
+        return {
+            "mode": self.mode,
+            "events": len(samples),
+            "p50_ms": samples[len(samples) // 2] * 1000,
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
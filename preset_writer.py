@@ -0,0 +1,159 @@
+import os
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+PRESET_WRITE_BATCH = 256
+PRESET_WRITE_WORKERS = 8
+
+DEFAULT_PRESET = {
+    "name": "",
+    "load_params": {
+        "n_ctx": 1500,
+        "n_batch": 512,
+        "rope_freq_base": 0,
+        "rope_freq_scale": 0,
+        "n_gpu_layers": 10,
+        "use_mlock": True,
+        "main_gpu": 0,
+        "tensor_split": [0],
+        "seed": -1,
+        "f16_kv": True,
+        "use_mmap": True
+    },
+    "inference_params": {
+        "n_threads": 4,
+        "n_predict": -1,
+        "top_k": 40,
+        "top_p": 0.95,
+        "temp": 0.8,
+        "repeat_penalty": 1.1,
+        "input_prefix": "### Instruction:\n",
+        "input_suffix": "\n### Response:\n",
+        "antiprompt": ["### Instruction:"],
+        "pre_prompt": "You are a helpful AI assistant.",
+        "seed": -1,
+        "tfs_z": 1,
+        "typical_p": 1,
+        "repeat_last_n": 64,
+        "frequency_penalty": 0,
+        "presence_penalty": 0,
+        "n_keep": 0,
+        "logit_bias": {},
+        "mirostat": 0,
+        "mirostat_tau": 5,
+        "mirostat_eta": 0.1,
+        "memory_f16": True,
+        "multiline_input": False,
+        "penalize_nl": True
+    }
+}
+
+_NAME_PLACEHOLDER = "@@preset-name@@"
+
+
+def _template_parts():
+    # Serialize the template once and split it around the name so each preset
+    # only costs one small json.dumps of its name.
+    text = json.dumps(dict(DEFAULT_PRESET, name=_NAME_PLACEHOLDER), indent=2)
+    head, tail = text.split(json.dumps(_NAME_PLACEHOLDER), 1)
+    return head, tail
+
+
+def preset_text(name, overrides=None, template_parts=None):
+    # overrides is {section: {field: value}} laid over DEFAULT_PRESET, e.g.
+    # values derived from model metadata. Without it the cached template is used.
+    if not overrides:
+        head, tail = template_parts or _template_parts()
+        return head + json.dumps(name) + tail
+    preset_data = copy.deepcopy(DEFAULT_PRESET)
+    preset_data["name"] = name
+    for section, values in overrides.items():
+        preset_data[section].update(values)
+    return json.dumps(preset_data, indent=2)
+
+
+def _sync_directory(directory):
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path, text):
+    # Only this file is flushed; the workers sync the batch in parallel.
+    temp_file = f"{path}.tmp"
+    with open(temp_file, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    return temp_file
+
+
+def write_presets(presets, max_workers=PRESET_WRITE_WORKERS, overrides=None):
+    # presets maps preset file path -> preset name, overrides optionally maps
+    # path -> preset_text overrides. Files are written to a temporary name and
+    # flushed to disk, then renamed into place once the whole batch is
+    # written, so a crash never leaves a half-written preset behind.
+    if not presets:
+        return []
+    template_parts = _template_parts()
+    overrides = overrides or {}
+    return _write_batch(list(presets), lambda path: preset_text(presets[path], overrides.get(path), template_parts),
+                        max_workers)
+
+
+def write_preset_texts(texts, max_workers=PRESET_WRITE_WORKERS):
+    # Like write_presets for already serialized presets: texts maps path -> text.
+    if not texts:
+        return []
+    return _write_batch(list(texts), texts.__getitem__, max_workers)
+
+
+def _write_batch(paths, text_for, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(lambda path: _write_temp(path, text_for(path)), path) for path in paths]
+    try:
+        temp_files = [future.result() for future in futures]
+    except BaseException:
+        # A failed batch changes nothing: no preset is replaced and no temporary file is left.
+        for path in paths:
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+        raise
+    for temp_file, path in zip(temp_files, paths):
+        os.replace(temp_file, path)
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+        _sync_directory(directory)
+    return paths
+
+
+class PresetBatchWriter:
+
+    def __init__(self, batch_size=PRESET_WRITE_BATCH, max_workers=PRESET_WRITE_WORKERS):
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.pending = {}
+        self.overrides = {}
+        self.written = {}
+
+    def add(self, model_type, preset_file, overrides=None):
+        if preset_file in self.pending or model_type in self.written:
+            return
+        self.pending[preset_file] = model_type
+        if overrides:
+            self.overrides[preset_file] = overrides
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        write_presets({path: f"{model_type} Preset" for path, model_type in self.pending.items()}, self.max_workers,
+                      self.overrides)
+        for path, model_type in self.pending.items():
+            self.written[model_type] = path
+        self.pending.clear()
+        self.overrides.clear()
+        return self.written
@@ -0,0 +1,135 @@
+import queue
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL_MS = 100
+TASK_WORKERS = 2
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    # Handed to background work so it can report progress and notice cancellation.
+    # It never touches Tk; progress is delivered through the executor's queue.
+
+    def __init__(self, task_id, name, events=None):
+        self.id = task_id
+        self.name = name
+        self.progress = {}
+        self._cancel_event = threading.Event()
+        self._events = events
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check(self):
+        if self._cancel_event.is_set():
+            raise TaskCancelled(self.name)
+
+    def report(self, **counters):
+        self.progress.update(counters)
+        if self._events is not None:
+            self._events.put(("progress", self, dict(self.progress)))
+
+
+class TaskExecutor:
+    # Runs long operations on a thread pool and delivers their progress and
+    # results back on the Tk thread by polling a queue with root.after.
+
+    def __init__(self, root, max_workers=TASK_WORKERS, poll_interval_ms=POLL_INTERVAL_MS, on_status=None):
+        self.root = root
+        self.poll_interval_ms = poll_interval_ms
+        self.on_status = on_status
+        self.tasks = {}
+        self._events = queue.Queue()
+        self._callbacks = {}
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._after_id = self.root.after(self.poll_interval_ms, self._poll)
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_cancelled=None, **kwargs):
+        # func is called as func(task, *args, **kwargs) on a worker thread.
+        task = Task(next(self._ids), name, self._events)
+        self.tasks[task.id] = task
+        self._callbacks[task.id] = (on_done, on_error, on_cancelled)
+        self._executor.submit(self._run, task, func, args, kwargs)
+        self._status()
+        return task
+
+    def _run(self, task, func, args, kwargs):
+        try:
+            task.check()
+            result = func(task, *args, **kwargs)
+        except TaskCancelled:
+            self._events.put(("cancelled", task, None))
+        except Exception as error:
+            self._events.put(("error", task, error))
+        else:
+            self._events.put(("done", task, result))
+
+    def call_soon(self, func, *args):
+        # Safe to call from any thread; func runs on the Tk thread at the next poll.
+        self._events.put(("call", func, args))
+
+    def cancel(self, task_id=None):
+        for task in list(self.tasks.values()):
+            if task_id is None or task.id == task_id:
+                task.cancel()
+
+    def _poll(self):
+        latest_progress = {}
+        finished = []
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "call":
+                finished.append((kind, task, payload))
+            elif kind == "progress":
+                # Only the most recent progress per task matters for display.
+                latest_progress[task.id] = (task, payload)
+            else:
+                finished.append((kind, task, payload))
+        for task, progress in latest_progress.values():
+            if task.id in self.tasks:
+                self._status(task, progress)
+        for kind, task, payload in finished:
+            if kind == "call":
+                task(*payload)
+                continue
+            self.tasks.pop(task.id, None)
+            on_done, on_error, on_cancelled = self._callbacks.pop(task.id)
+            self._status()
+            if kind == "done" and on_done is not None:
+                on_done(payload)
+            elif kind == "error" and on_error is not None:
+                on_error(payload)
+            elif kind == "cancelled" and on_cancelled is not None:
+                on_cancelled()
+        self._after_id = self.root.after(self.poll_interval_ms, self._poll)
+
+    def _status(self, task=None, progress=None):
+        if self.on_status is None:
+            return
+        if task is None:
+            running = list(self.tasks.values())
+            if not running:
+                self.on_status("")
+                return
+            task = running[-1]
+            progress = task.progress
+        details = ", ".join(f"{key.replace('_', ' ')}: {value}" for key, value in progress.items())
+        self.on_status(f"{task.name}... {details}" if details else f"{task.name}...")
+
+    def shutdown(self):
+        self.cancel()
+        self.root.after_cancel(self._after_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The project has no general test suite. These tests cover only the git
+# sync (preset_sync) and the revision log (preset_history), whose bugs were
+# found in review and are easy to reintroduce: staging vanished paths, presets
+# outside the repository, and history files for names that differ only in
+# characters replaced on disk.
+# The modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+from preset_history import PresetHistory, apply_patch, make_patch
+
+
+def test_names_that_escape_alike_keep_separate_histories(tmp_path):
+    history = PresetHistory(str(tmp_path))
+    history.record("a b", {"name": "a b", "temp": 0.1})
+    history.record("a_b", {"name": "a_b", "temp": 0.9})
+    history.record("a b", {"name": "a b", "temp": 0.2})
+
+    assert history.get("a b") == {"name": "a b", "temp": 0.2}
+    assert history.get("a_b") == {"name": "a_b", "temp": 0.9}
+    assert history.latest_revision("a b") == 2
+    assert history.latest_revision("a_b") == 1
+    # A fresh instance reads them back from disk just the same.
+    reopened = PresetHistory(str(tmp_path))
+    assert reopened.get("a b", 1) == {"name": "a b", "temp": 0.1}
+    assert reopened.get("a_b") == {"name": "a_b", "temp": 0.9}
+
+
+def test_restore_writes_only_the_named_preset(tmp_path):
+    history = PresetHistory(str(tmp_path / "history"))
+    history.record("a b", {"name": "a b", "n_ctx": 2048})
+    history.record("a_b", {"name": "a_b", "n_ctx": 8192})
+    preset_file = tmp_path / "a b.preset.json"
+
+    restored = history.restore("a b", history.latest_revision("a b"), str(preset_file))
+    assert restored == {"name": "a b", "n_ctx": 2048}
+
+
+def test_patch_round_trip():
+    old = {"name": "x", "load_params": {"n_ctx": 2048, "a/b": 1}, "tags": ["q"]}
+    new = {"name": "x", "load_params": {"n_ctx": 4096}, "tags": ["q", "r"], "notes": "~"}
+    assert apply_patch(old, make_patch(old, new)) == new
@@ -0,0 +1,113 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from preset_sync import PresetSync, SyncError
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo_dir, *args):
+    return subprocess.run(["git", "-C", str(repo_dir), *args], check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    # A clone of a local bare repository with one committed preset.
+    remote = tmp_path / "remote.git"
+    work = tmp_path / "work"
+    subprocess.run(["git", "init", "-q", "--bare", str(remote)], check=True)
+    subprocess.run(["git", "clone", "-q", str(remote), str(work)], check=True, capture_output=True)
+    git(work, "config", "user.email", "test@example.com")
+    git(work, "config", "user.name", "Test")
+    (work / "llama.preset.json").write_text("{}")
+    git(work, "add", "llama.preset.json")
+    git(work, "commit", "-q", "-m", "Initial presets")
+    git(work, "push", "-q", "origin", "HEAD")
+    return work
+
+
+@pytest.fixture
+def preset_sync(repo, tmp_path):
+    preset_sync = PresetSync(repo, state_file=str(tmp_path / "sync_state.json"), commit_interval=None)
+    yield preset_sync
+    preset_sync.close(flush=False)
+
+
+def committed_files(repo):
+    return git(repo, "show", "--name-only", "--format=", "HEAD").split()
+
+
+def test_commits_only_marked_files(repo, preset_sync):
+    (repo / "llama.preset.json").write_text('{"name": "llama"}')
+    (repo / "qwen.preset.json").write_text("{}")
+    (repo / "unrelated.txt").write_text("not a preset")
+    preset_sync.mark_changed([repo / "llama.preset.json", repo / "qwen.preset.json"])
+
+    assert preset_sync.commit_pending() == 2
+    assert sorted(committed_files(repo)) == ["llama.preset.json", "qwen.preset.json"]
+    assert git(repo, "status", "--porcelain").split() == ["??", "unrelated.txt"]
+    assert preset_sync.pending() == []
+
+
+def test_created_then_deleted_file_does_not_block_sync(repo, preset_sync):
+    (repo / "temp.preset.json").write_text("{}")
+    preset_sync.mark_changed([repo / "temp.preset.json"])
+    os.remove(repo / "temp.preset.json")
+
+    assert preset_sync.commit_pending() == 0
+    assert preset_sync.pending() == []
+    (repo / "qwen.preset.json").write_text("{}")
+    preset_sync.mark_changed([repo / "qwen.preset.json"])
+    assert preset_sync.commit_pending() == 1
+
+
+def test_deleted_tracked_file_is_committed(repo, preset_sync):
+    os.remove(repo / "llama.preset.json")
+    preset_sync.mark_changed([repo / "llama.preset.json"])
+
+    assert preset_sync.commit_pending() == 1
+    assert git(repo, "ls-files").split() == []
+
+
+def test_sync_pushes_to_remote(repo, preset_sync, tmp_path):
+    (repo / "qwen.preset.json").write_text("{}")
+    preset_sync.mark_changed([repo / "qwen.preset.json"])
+
+    assert preset_sync.submit(preset_sync.sync, True).result() == 1
+    remote_files = git(tmp_path / "remote.git", "ls-tree", "--name-only", "HEAD").split()
+    assert sorted(remote_files) == ["llama.preset.json", "qwen.preset.json"]
+
+
+def test_paths_outside_the_repository_are_reported(repo, preset_sync, tmp_path):
+    outside = tmp_path / "elsewhere.preset.json"
+    with pytest.raises(SyncError):
+        preset_sync.mark_changed([outside, repo / "llama.preset.json"])
+    assert preset_sync.pending() == ["llama.preset.json"]
+
+
+def test_pending_paths_survive_a_restart(repo, preset_sync, tmp_path):
+    (repo / "qwen.preset.json").write_text("{}")
+    preset_sync.mark_changed([repo / "qwen.preset.json"])
+
+    restarted = PresetSync(repo, state_file=str(tmp_path / "sync_state.json"), commit_interval=None)
+    try:
+        assert restarted.pending() == ["qwen.preset.json"]
+    finally:
+        restarted.close(flush=False)
+
+
+def test_background_sync_skips_directory_that_is_not_a_work_tree(tmp_path):
+    presets = tmp_path / "presets"
+    presets.mkdir()
+    (presets / "llama.preset.json").write_text("{}")
+    preset_sync = PresetSync(presets, state_file=str(tmp_path / "sync_state.json"), commit_threshold=1,
+                             commit_interval=None)
+    try:
+        preset_sync.mark_changed([presets / "llama.preset.json"])
+        assert preset_sync.flush().result() == 0
+        assert preset_sync.pending() == ["llama.preset.json"]
+    finally:
+        preset_sync.close(flush=False)